@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 import os
 import sys
 from pathlib import Path
+from urllib.parse import parse_qsl, unquote, urlparse
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -60,6 +62,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # Кэш страниц для анонимных посетителей: после сессий, CSRF и сообщений, чтобы видеть их состояние.
+    'landing.middleware.AnonymousPageCacheMiddleware',
 ]
 
 ROOT_URLCONF = 'Gourmand.urls'
@@ -91,12 +95,57 @@ WSGI_APPLICATION = 'Gourmand.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# База задаётся переменной DATABASE_URL: postgres://пользователь:пароль@хост:порт/имя (нужен пакет
+# psycopg[binary,pool]). Без неё — файл SQLite (SQLITE_PATH, по умолчанию db.sqlite3 в корне проекта).
+DATABASE_URL = os.getenv('DATABASE_URL')
+# Пул соединений psycopg внутри каждого воркера (DB_POOL=True) либо постоянные соединения на DB_CONN_MAX_AGE секунд.
+DB_POOL = os.getenv('DB_POOL') == 'True'
+DB_POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', 2))
+DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', 8))
+DB_CONN_MAX_AGE = int(os.getenv('DB_CONN_MAX_AGE', 60))
+# Сколько секунд SQLite ждёт снятия блокировки записи, прежде чем ответить «database is locked».
+SQLITE_BUSY_TIMEOUT = float(os.getenv('SQLITE_BUSY_TIMEOUT', 20))
+# Режим WAL записывается в сам файл базы и остаётся после первого подключения, поэтому включается
+# только явно на сервере (SQLITE_WAL=True), а не при любом manage.py над db.sqlite3 из репозитория.
+SQLITE_WAL = os.getenv('SQLITE_WAL') == 'True'
+
+if DATABASE_URL:
+    _database_url = urlparse(DATABASE_URL)
+    if _database_url.scheme not in ('postgres', 'postgresql'):
+        raise ImproperlyConfigured(f'DATABASE_URL: поддерживается только PostgreSQL, а не {_database_url.scheme!r}')
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': unquote(_database_url.path.lstrip('/')),
+            'USER': unquote(_database_url.username or ''),
+            'PASSWORD': unquote(_database_url.password or ''),
+            'HOST': _database_url.hostname or '',
+            'PORT': _database_url.port or '',
+            # Пул не совместим с постоянными соединениями: соединение возвращается в пул в конце запроса.
+            'CONN_MAX_AGE': 0 if DB_POOL else DB_CONN_MAX_AGE,
+            # Постоянное соединение проверяется перед запросом, если прошлый запрос завершился ошибкой.
+            'CONN_HEALTH_CHECKS': not DB_POOL,
+            'OPTIONS': {
+                **dict(parse_qsl(_database_url.query)),  # Например, ?sslmode=require
+                **({'pool': {'min_size': DB_POOL_MIN_SIZE, 'max_size': DB_POOL_MAX_SIZE}} if DB_POOL else {}),
+            },
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': {
+                'timeout': SQLITE_BUSY_TIMEOUT,
+                # Транзакция сразу берёт блокировку записи: иначе две транзакции, начавшие с чтения,
+                # не могут обе перейти к записи, и одна из них сразу получает «database is locked».
+                'transaction_mode': 'IMMEDIATE',
+                # WAL: чтение не ждёт записи; synchronous=NORMAL в WAL не теряет целостность при сбое процесса.
+                **({'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL'} if SQLITE_WAL else {}),
+            },
+        }
     }
-}
 
 
 # Password validation
@@ -196,9 +245,39 @@ YANDEX_CAPTCHA_SERVER_KEY = os.getenv('YANDEX_CAPTCHA_SERVER_KEY')
 
 OPENAI_API_KEY = os.getenv('your-openai-api-key')
 
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-snowflake',
+# Клиент языковой модели для сводок отзывов: 'openrouter' (по умолчанию) или 'fake' — локальная замена для тестов.
+LLM_BACKEND = os.getenv('LLM_BACKEND', 'openrouter')
+# Таймаут одного запроса к языковой модели (секунды).
+LLM_REQUEST_TIMEOUT = float(os.getenv('LLM_REQUEST_TIMEOUT', 60))
+# Срок одного вызова языковой модели вместе с повторами (секунды).
+LLM_CALL_DEADLINE = float(os.getenv('LLM_CALL_DEADLINE', 90))
+# Размер пула HTTP-соединений с OpenRouter в одном процессе.
+LLM_MAX_CONNECTIONS = int(os.getenv('LLM_MAX_CONNECTIONS', 8))
+# Сколько заданий на сводку отзывов выполняется одновременно (всеми обработчиками run_summary_jobs).
+SUMMARY_JOB_CONCURRENCY = int(os.getenv('SUMMARY_JOB_CONCURRENCY', 2))
+# Сколько частей большого набора отзывов конспектируется параллельно в одной сводке.
+SUMMARY_MAP_CONCURRENCY = int(os.getenv('SUMMARY_MAP_CONCURRENCY', 4))
+
+# Подсказки поиска (/api/suggest/): наибольшее число названий в памяти каждого воркера
+# (порядка 1 КБ на название вместе с ключами) и период проверки изменений от других воркеров (секунды).
+SUGGEST_MAX_ENTRIES = int(os.getenv('SUGGEST_MAX_ENTRIES', 50000))
+SUGGEST_SYNC_INTERVAL = float(os.getenv('SUGGEST_SYNC_INTERVAL', 5))
+
+# Кэш общий для всех воркеров Gunicorn: при заданном REDIS_URL — Redis (или совместимый сервер,
+# например локальный Valkey/KeyDB; нужен пакет redis), иначе — файловый кэш в CACHE_DIR.
+REDIS_URL = os.getenv('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
     }
-}
\ No newline at end of file
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.getenv('CACHE_DIR', os.path.join(BASE_DIR, 'cache')),
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
\ No newline at end of file
@@ -0,0 +1,261 @@
+# cache.py
+# Этот файл содержит версионированный кэш производных данных заведений и гурманов.
+# У каждой сущности (и у каждого вида сущностей целиком) есть ключ версии; версия входит
+# в ключи закэшированных значений. Запись отзыва, голоса или ответа NPS меняет версию,
+# после чего старые значения просто перестают читаться и истекают сами — без перебора ключей.
+
+# Импортируем hashlib для короткого ключа фрагмента по значениям vary_on.
+import hashlib
+# Импортируем threading для защиты счётчиков попаданий в текущем процессе.
+import threading
+# Импортируем time для значения версии.
+import time
+# Импортируем Counter для накопления счётчиков попаданий и промахов.
+from collections import Counter
+
+# Импортируем общий кэш Django (файловый или Redis, см. CACHES в settings.py).
+from django.core.cache import cache
+# Импортируем transaction, чтобы сбрасывать версии только после фиксации изменений.
+from django.db import transaction
+
+# Виды сущностей с версиями.
+PLACE = 'place'
+GOURMAND = 'gourmand'
+REVIEW = 'review'
+EVENT = 'event'
+KINDS = (PLACE, GOURMAND, REVIEW, EVENT)
+# Время жизни производных данных по умолчанию (секунды).
+DEFAULT_TIMEOUT = 60 * 60
+# Через сколько событий счётчики попаданий процесса сбрасываются в общий кэш.
+FRAGMENT_STATS_FLUSH_EVERY = 100
+# Префикс ключей версий.
+VERSION_PREFIX = 'ver'
+# Идентификатор версии вида сущностей целиком.
+ALL = '*'
+# Идентификатор версии набора сущностей вида: растёт при изменении любой из них (для страниц-списков).
+COLLECTION = 'list'
+
+
+def _version_key(kind, object_id=ALL):
+    return f"{VERSION_PREFIX}:{kind}:{object_id}"
+
+
+def _initial_version():
+    # Версия, вытесненная из кэша, не должна вернуться к старому значению: начинаем с текущего времени.
+    return time.time_ns()
+
+
+def get_versions(kind, object_ids):
+    """
+    Возвращает текущие версии сущностей одним обращением к кэшу.
+
+    Args:
+        kind: Вид сущности (PLACE, GOURMAND).
+        object_ids: Идентификаторы сущностей.
+
+    Returns:
+        Словарь {object_id: строка версии}; в версию входит и версия вида целиком.
+    """
+    keys = {object_id: _version_key(kind, object_id) for object_id in object_ids}
+    kind_key = _version_key(kind)
+    found = _get_or_create_versions([kind_key, *keys.values()])
+    return {object_id: f"{found[kind_key]}.{found[key]}" for object_id, key in keys.items()}
+
+
+def collection_versions(kinds):
+    """
+    Возвращает версии наборов сущностей (растут при изменении любой сущности вида).
+
+    Args:
+        kinds: Виды сущностей (PLACE, GOURMAND, REVIEW, EVENT).
+
+    Returns:
+        Словарь {вид: версия набора}.
+    """
+    keys = {kind: _version_key(kind, COLLECTION) for kind in kinds}
+    found = _get_or_create_versions(keys.values())
+    return {kind: found[key] for kind, key in keys.items()}
+
+
+def _get_or_create_versions(keys):
+    # Читаем версии одним обращением и создаём отсутствующие.
+    found = cache.get_many(keys)
+    for key in set(keys) - found.keys():
+        version = _initial_version()
+        # add не перезапишет версию, которую успел создать другой процесс.
+        if not cache.add(key, version, timeout=None):
+            version = cache.get(key, version)
+        found[key] = version
+    return found
+
+
+def get_many(kind, object_ids, name, compute, timeout=DEFAULT_TIMEOUT):
+    """
+    Возвращает закэшированные значения для набора сущностей, досчитывая отсутствующие.
+
+    Ключи строятся до вычисления, поэтому значение, посчитанное во время параллельной
+    записи, сохраняется под уже устаревшей версией и не будет прочитано.
+
+    Args:
+        kind: Вид сущности (PLACE, GOURMAND).
+        object_ids: Идентификаторы сущностей.
+        name: Имя значения (например, 'nps-metrics:...').
+        compute: Функция, принимающая список отсутствующих id и возвращающая {object_id: значение}.
+        timeout: Время жизни значений в секундах.
+
+    Returns:
+        Словарь {object_id: значение}.
+    """
+    object_ids = list(object_ids)
+    keys = {
+        object_id: f"{kind}:{object_id}:{version}:{name}"
+        for object_id, version in get_versions(kind, object_ids).items()
+    }
+    found = cache.get_many(keys.values())
+    result = {object_id: found[key] for object_id, key in keys.items() if key in found}
+    missing = [object_id for object_id in object_ids if object_id not in result]
+    if missing:
+        computed = compute(missing)
+        cache.set_many({keys[object_id]: computed[object_id] for object_id in missing}, timeout)
+        result.update(computed)
+    return result
+
+
+def get_or_set(kind, object_id, name, compute, timeout=DEFAULT_TIMEOUT):
+    """
+    Возвращает закэшированное значение одной сущности, вычисляя его при отсутствии.
+
+    Args:
+        kind: Вид сущности (PLACE, GOURMAND).
+        object_id: Идентификатор сущности.
+        name: Имя значения.
+        compute: Функция без аргументов, вычисляющая значение.
+        timeout: Время жизни значения в секундах.
+
+    Returns:
+        Значение из кэша или только что вычисленное.
+    """
+    return get_many(kind, [object_id], name, lambda ids: {object_id: compute()}, timeout)[object_id]
+
+
+def _bump(key):
+    # Новая версия — текущее время, а не incr: в файловом кэше incr — это get и set, и два процесса,
+    # увеличивающие версию одновременно, записали бы одно значение. Запись без чтения всегда
+    # даёт версию, отличную от прежней, в том числе если ключ вытеснен из кэша.
+    cache.set(key, _initial_version(), timeout=None)
+
+
+def invalidate(kind, *object_ids):
+    """
+    Сбрасывает закэшированные данные сущностей, меняя их версии после фиксации транзакции.
+
+    Args:
+        kind: Вид сущности (PLACE, GOURMAND).
+        *object_ids: Идентификаторы сущностей.
+    """
+    keys = [_version_key(kind, object_id) for object_id in object_ids if object_id is not None]
+    if not keys:
+        return
+    # Вместе с сущностями меняется и их набор (страницы-списки).
+    keys.append(_version_key(kind, COLLECTION))
+
+    def bump_all():
+        for key in keys:
+            _bump(key)
+    transaction.on_commit(bump_all)
+
+
+def invalidate_kind(kind):
+    """
+    Сбрасывает закэшированные данные всех сущностей вида после фиксации транзакции.
+
+    Args:
+        kind: Вид сущности (PLACE, GOURMAND).
+    """
+    def bump_all():
+        _bump(_version_key(kind))
+        _bump(_version_key(kind, COLLECTION))
+    transaction.on_commit(bump_all)
+
+
+def fragment_key(kind, object_id, vary_on=()):
+    """
+    Возвращает ключ HTML-фрагмента (карточки) сущности для её текущей версии.
+
+    Args:
+        kind: Вид сущности (PLACE, GOURMAND, REVIEW, EVENT).
+        object_id: Идентификатор сущности.
+        vary_on: Дополнительные значения, от которых зависит фрагмент (например, id пользователя).
+
+    Returns:
+        Строка ключа кэша.
+    """
+    version = get_versions(kind, [object_id])[object_id]
+    digest = hashlib.md5(':'.join(str(value) for value in vary_on).encode()).hexdigest()
+    return f"fragment:{kind}:{object_id}:{version}:{digest}"
+
+
+# Попадания и промахи кэша фрагментов в текущем процессе, ещё не сброшенные в общий кэш.
+_fragment_stats = Counter()
+_fragment_stats_lock = threading.Lock()
+
+
+def _stats_key(kind, outcome):
+    return f"stats:fragments:{kind}:{outcome}"
+
+
+def _flush_fragment_stats(pending):
+    for (kind, outcome), delta in pending.items():
+        key = _stats_key(kind, outcome)
+        # add создаёт счётчик только если его ещё нет, incr атомарен в Redis.
+        cache.add(key, 0, timeout=None)
+        try:
+            cache.incr(key, delta)
+        except ValueError:
+            cache.set(key, delta, timeout=None)
+
+
+def record_fragment(kind, hit):
+    """
+    Учитывает попадание или промах кэша фрагментов.
+
+    Счётчики копятся в памяти процесса и сбрасываются в общий кэш пачкой,
+    чтобы не добавлять запись в кэш на каждую карточку.
+
+    Args:
+        kind: Вид сущности фрагмента.
+        hit: True — фрагмент найден в кэше, False — отрисован заново.
+    """
+    pending = None
+    with _fragment_stats_lock:
+        _fragment_stats[(kind, 'hits' if hit else 'misses')] += 1
+        if sum(_fragment_stats.values()) >= FRAGMENT_STATS_FLUSH_EVERY:
+            pending = dict(_fragment_stats)
+            _fragment_stats.clear()
+    if pending:
+        _flush_fragment_stats(pending)
+
+
+def fragment_stats():
+    """
+    Возвращает суммарные попадания и промахи кэша фрагментов по всем процессам.
+
+    Returns:
+        Словарь {вид сущности: {'hits': int, 'misses': int, 'hit_ratio': float | None}}.
+    """
+    # Сначала сбрасываем накопленное текущим процессом, чтобы оно попало в ответ.
+    with _fragment_stats_lock:
+        pending = dict(_fragment_stats)
+        _fragment_stats.clear()
+    if pending:
+        _flush_fragment_stats(pending)
+
+    keys = {(kind, outcome): _stats_key(kind, outcome) for kind in KINDS for outcome in ('hits', 'misses')}
+    found = cache.get_many(keys.values())
+    stats = {}
+    for kind in KINDS:
+        hits = found.get(keys[(kind, 'hits')], 0)
+        misses = found.get(keys[(kind, 'misses')], 0)
+        total = hits + misses
+        stats[kind] = {'hits': hits, 'misses': misses, 'hit_ratio': hits / total if total else None}
+    return stats
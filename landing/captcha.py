@@ -0,0 +1,49 @@
+# captcha.py
+# Этот файл содержит проверку токена Yandex SmartCaptcha.
+# Библиотека requests импортируется при первой проверке, а не при загрузке форм:
+# формы импортируются каждым воркером Gunicorn и каждой командой manage.py,
+# а капча нужна только при отправке формы регистрации.
+
+# Импортируем настройки для серверного ключа капчи.
+from django.conf import settings
+
+# Адрес проверки токена.
+CAPTCHA_VALIDATE_URL = 'https://smartcaptcha.yandexcloud.net/validate'
+# Таймаут запроса проверки (секунды).
+CAPTCHA_TIMEOUT = 5
+
+
+class CaptchaUnavailable(Exception):
+    """
+    Сервер капчи не ответил или вернул ошибку.
+    """
+
+
+def validate_captcha(token):
+    """
+    Проверяет токен капчи на сервере Yandex.
+
+    Args:
+        token: Токен, переданный виджетом капчи из формы.
+
+    Returns:
+        Ответ сервера капчи (словарь); токен принят, если его status равен 'ok'.
+
+    Raises:
+        CaptchaUnavailable: Ошибка сети или HTTP-ошибка сервера капчи.
+    """
+    import requests
+    try:
+        response = requests.post(
+            CAPTCHA_VALIDATE_URL,
+            data={
+                'secret': settings.YANDEX_CAPTCHA_SERVER_KEY,  # Секретный ключ из настроек.
+                'token': token,  # Токен капчи, переданный из формы.
+            },
+            timeout=CAPTCHA_TIMEOUT,
+        )
+        # Проверяем, нет ли HTTP-ошибок в ответе.
+        response.raise_for_status()
+        return response.json()
+    except requests.RequestException as exc:
+        raise CaptchaUnavailable(str(exc)) from exc
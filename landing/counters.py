@@ -0,0 +1,113 @@
+# counters.py
+# Этот файл содержит сверку денормализованных счётчиков с фактическими данными.
+# В обычной работе счётчики отзывов и NPS заведений и гурманов сдвигаются при записи
+# отзывов и ответов NPS (см. Review.save, NPSResponse.save и signals.py); здесь они
+# считаются с нуля сгруппированными запросами, чтобы найти и исправить расхождения.
+
+# Импортируем dataclass для описания найденного расхождения.
+from dataclasses import dataclass
+
+# Импортируем transaction для атомарной записи исправлений.
+from django.db import transaction
+# Импортируем Count и Q для условной агрегации.
+from django.db.models import Count, Q
+
+# Импортируем версионированный кэш для сброса производных данных исправленных сущностей.
+from landing import cache as versioned_cache
+# Импортируем модели с денормализованными счётчиками.
+from landing.models import Place, GourmandProfile, Review, NPSResponse
+
+# Счётчики заведения.
+PLACE_COUNTERS = ('review_count', 'nps_count', 'promoter_count', 'detractor_count')
+# Счётчики профиля гурмана.
+GOURMAND_COUNTERS = ('review_count',)
+# Размер пачки при массовом обновлении.
+BATCH_SIZE = 2000
+
+
+@dataclass
+class CounterDrift:
+    """
+    Расхождение между сохранёнными и фактическими счётчиками одного объекта.
+    """
+    model: str
+    object_id: int
+    stored: dict
+    expected: dict
+
+
+def _place_counters():
+    # Фактические счётчики заведений: {place_id: {имя счётчика: значение}}.
+    expected = {
+        place_id: dict.fromkeys(PLACE_COUNTERS, 0)
+        for place_id in Place.objects.values_list('id', flat=True)
+    }
+    for place_id, review_count in Review.objects.values('place_id').annotate(
+        n=Count('id')
+    ).values_list('place_id', 'n').order_by():
+        expected[place_id]['review_count'] = review_count
+    nps_rows = NPSResponse.objects.values('review__place_id').annotate(
+        total=Count('id'),
+        promoters=Count('id', filter=Q(score__gte=NPSResponse.PROMOTER_MIN_SCORE)),
+        detractors=Count('id', filter=Q(score__lte=NPSResponse.DETRACTOR_MAX_SCORE)),
+    ).values_list('review__place_id', 'total', 'promoters', 'detractors').order_by()
+    for place_id, total, promoters, detractors in nps_rows:
+        expected[place_id].update(nps_count=total, promoter_count=promoters, detractor_count=detractors)
+    return expected
+
+
+def _gourmand_counters():
+    # Фактические счётчики гурманов: {profile_id: {имя счётчика: значение}}.
+    review_counts = dict(
+        Review.objects.values('gourmand_id').annotate(n=Count('id')).values_list('gourmand_id', 'n').order_by()
+    )
+    return {
+        profile_id: {'review_count': review_counts.get(user_id, 0)}
+        for profile_id, user_id in GourmandProfile.objects.values_list('id', 'user_id')
+    }
+
+
+def _drifts(model, counters, expected):
+    drifts = []
+    for row in model.objects.values('id', *counters):
+        object_id = row.pop('id')
+        if row != expected[object_id]:
+            drifts.append(CounterDrift(model.__name__, object_id, row, expected[object_id]))
+    return drifts
+
+
+def reconcile_counters(fix=True):
+    """
+    Сверяет счётчики заведений и гурманов с фактическими данными.
+
+    Каждая таблица проверяется несколькими сгруппированными запросами,
+    расхождения записываются пачками через bulk_update.
+
+    Args:
+        fix: Если True, расхождения записываются в базу; иначе только возвращаются.
+
+    Returns:
+        Список CounterDrift для объектов, у которых счётчики разошлись.
+    """
+    place_drifts = _drifts(Place, PLACE_COUNTERS, _place_counters())
+    gourmand_drifts = _drifts(GourmandProfile, GOURMAND_COUNTERS, _gourmand_counters())
+
+    if fix:
+        with transaction.atomic():
+            Place.objects.bulk_update(
+                [Place(id=drift.object_id, **drift.expected) for drift in place_drifts],
+                PLACE_COUNTERS,
+                batch_size=BATCH_SIZE,
+            )
+            GourmandProfile.objects.bulk_update(
+                [GourmandProfile(id=drift.object_id, **drift.expected) for drift in gourmand_drifts],
+                GOURMAND_COUNTERS,
+                batch_size=BATCH_SIZE,
+            )
+            versioned_cache.invalidate(versioned_cache.PLACE, *(drift.object_id for drift in place_drifts))
+            # Версии гурманов привязаны к id пользователя, а расхождения найдены по id профиля.
+            user_ids = GourmandProfile.objects.filter(
+                id__in=[drift.object_id for drift in gourmand_drifts]
+            ).values_list('user_id', flat=True)
+            versioned_cache.invalidate(versioned_cache.GOURMAND, *user_ids)
+    return place_drifts + gourmand_drifts
@@ -0,0 +1,53 @@
+# covers.py
+# Этот файл содержит выбор обложки (первого изображения) для карточек заведений, отзывов и мероприятий.
+# В списках путь к обложке добавляется к основному запросу подзапросом (Subquery),
+# поэтому шаблону не нужны images.exists и images.first на каждую карточку.
+
+# Импортируем OuterRef и Subquery для коррелированного подзапроса, Q — для отбора изображений с файлом.
+from django.db.models import OuterRef, Q, Subquery
+
+# Имя аннотации с путём к файлу обложки.
+COVER_ANNOTATION = 'cover_image'
+
+
+def _images_with_file(images):
+    # Изображения без файла обложкой не считаются.
+    return images.exclude(Q(image='') | Q(image__isnull=True)).order_by('id')
+
+
+def with_cover_image(queryset, image_model, fk_name):
+    """
+    Добавляет к выборке путь к файлу первого изображения объекта.
+
+    Args:
+        queryset: Выборка заведений, отзывов или мероприятий.
+        image_model: Модель изображений (PlaceImage, ReviewImage, EventImage).
+        fk_name: Имя поля внешнего ключа изображения на объект.
+
+    Returns:
+        Выборка с аннотацией cover_image (None, если изображений нет).
+    """
+    first_image = _images_with_file(image_model.objects.filter(**{fk_name: OuterRef('pk')})).values('image')[:1]
+    return queryset.annotate(**{COVER_ANNOTATION: Subquery(first_image)})
+
+
+def cover_image_url(obj):
+    """
+    Возвращает адрес обложки объекта с изображениями (related_name='images').
+
+    Если объект получен через with_cover_image, запросов к базе нет;
+    иначе первое изображение читается отдельным запросом.
+
+    Args:
+        obj: Заведение, отзыв или мероприятие.
+
+    Returns:
+        URL файла обложки или None, если изображений нет.
+    """
+    if hasattr(obj, COVER_ANNOTATION):
+        name = getattr(obj, COVER_ANNOTATION)
+    else:
+        name = _images_with_file(obj.images.all()).values_list('image', flat=True).first()
+    if not name:
+        return None
+    return obj.images.model._meta.get_field('image').storage.url(name)
@@ -0,0 +1,216 @@
+# dashboards.py
+# Этот файл содержит снимки профиля владельца (OwnerDashboardSnapshot).
+# Профиль открывается часто, а цифры в нём достаточно обновлять почти в реальном времени,
+# поэтому NPS, теги и динамика считаются заранее для каждого заведения и периода анализа.
+# Снимок помнит версию данных заведения (см. cache.py): запись отзыва или ответа NPS меняет
+# версию, и снимок считается устаревшим. Устаревший снимок показывается, пока он не старше
+# SNAPSHOT_MAX_STALENESS, затем пересобирается при открытии профиля или командой refresh_owner_dashboards.
+# Окна 1/3/6 месяцев сдвигаются каждый день и без новых отзывов, поэтому снимок старше
+# SNAPSHOT_MAX_AGE пересобирается, даже если версия заведения не менялась.
+
+# Импортируем timedelta для возраста снимков и окна периода.
+from datetime import timedelta
+
+# Импортируем Count для группировки упоминаний тегов.
+from django.db.models import Count
+# Импортируем утилиты для работы с часовыми поясами.
+from django.utils import timezone
+
+# Импортируем версионированный кэш: версия заведения показывает, изменились ли его данные.
+from landing import cache as versioned_cache
+# Импортируем модели снимков, заведений и ответов NPS.
+from landing.models import OwnerDashboardSnapshot, Place, NPSResponse
+# Импортируем расчёт NPS-метрик по набору заведений.
+from landing.nps import metrics_for_places, month_periods
+
+# Период анализа по умолчанию.
+DEFAULT_PERIOD = '1m'
+# Сколько устаревший снимок ещё можно показывать, прежде чем пересобрать его при открытии профиля.
+SNAPSHOT_MAX_STALENESS = timedelta(minutes=5)
+# Наибольший возраст снимка: отзывы, вышедшие из окна периода, перестают учитываться не позже чем через сутки.
+SNAPSHOT_MAX_AGE = timedelta(days=1)
+# Размер пачки при записи снимков.
+BATCH_SIZE = 500
+
+
+def _period_tag_stats(place_ids, days, now):
+    # Упоминания тегов в отзывах за последние days дней одним сгруппированным запросом: {place_id: {метка: количество}}.
+    stats = {place_id: {} for place_id in place_ids}
+    rows = NPSResponse.objects.filter(
+        review__place_id__in=place_ids,
+        review__review_date__range=(now - timedelta(days=days), now),
+        tags__isnull=False,
+    ).values('review__place_id', 'tags__label').annotate(n=Count('id')).order_by('review__place_id', '-n', 'tags__label')
+    for place_id, label, count in rows.values_list('review__place_id', 'tags__label', 'n'):
+        stats[place_id][label] = count
+    return stats
+
+
+def build_snapshots(place_ids, period, now=None):
+    """
+    Считает снимки профиля владельца для набора заведений (без записи в базу).
+
+    Args:
+        place_ids: Идентификаторы заведений.
+        period: Период анализа ('1m', '3m', '6m').
+        now: Момент расчёта (по умолчанию timezone.now()).
+
+    Returns:
+        Список несохранённых OwnerDashboardSnapshot.
+    """
+    place_ids = list(place_ids)
+    now = now or timezone.now()
+    # Версии читаются до расчёта: запись, попавшая между ними, оставит снимок устаревшим.
+    versions = versioned_cache.get_versions(versioned_cache.PLACE, place_ids)
+    periods = month_periods(now)
+    metrics = metrics_for_places(place_ids, periods)
+    period_tag_stats = _period_tag_stats(place_ids, OwnerDashboardSnapshot.PERIOD_DAYS[period], now)
+
+    snapshots = []
+    for place_id in place_ids:
+        place_metrics = metrics[place_id]
+        data = {
+            'month_start': periods['current'].start.isoformat(), # Начало месяца, для которого посчитана динамика
+            'nps': place_metrics.nps, # Общий NPS
+            'total_responses': place_metrics.total, # Общее количество NPS ответов
+            'current_nps': place_metrics.period_nps('current'), # NPS за текущий месяц
+            'last_nps': place_metrics.period_nps('last'), # NPS за прошлый месяц
+            'tag_stats': place_metrics.top_tags, # Топ-3 тегов за все время
+            'tag_dynamics': place_metrics.tag_dynamics(), # Динамика тегов (текущий vs прошлый месяц)
+            'period_tag_stats': period_tag_stats[place_id], # Статистика тегов за выбранный период
+        }
+        snapshots.append(OwnerDashboardSnapshot(
+            place_id=place_id, period=period, data=data, place_version=versions[place_id], computed_at=now,
+        ))
+    return snapshots
+
+
+def save_snapshots(snapshots):
+    """
+    Записывает снимки, заменяя существующие для тех же заведения и периода.
+
+    Args:
+        snapshots: Несохранённые OwnerDashboardSnapshot.
+
+    Returns:
+        Те же снимки.
+    """
+    # Вставка с обновлением при конфликте: одна команда на пачку вместо get + save на каждый снимок.
+    OwnerDashboardSnapshot.objects.bulk_create(
+        snapshots,
+        batch_size=BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=['place', 'period'],
+        update_fields=['data', 'place_version', 'computed_at'],
+    )
+    return snapshots
+
+
+def is_expired(snapshot, month_start, now):
+    """
+    Проверяет, неверны ли цифры снимка независимо от изменений данных заведения.
+
+    Args:
+        snapshot: OwnerDashboardSnapshot или None.
+        month_start: Начало текущего месяца в формате ISO.
+        now: Текущий момент.
+
+    Returns:
+        True, если снимка нет, он посчитан в прошлом месяце или старше SNAPSHOT_MAX_AGE
+        (окно периода с тех пор сдвинулось).
+    """
+    return (
+        snapshot is None
+        or snapshot.data.get('month_start') != month_start
+        or now - snapshot.computed_at > SNAPSHOT_MAX_AGE
+    )
+
+
+def is_stale(snapshot, version, month_start, now):
+    """
+    Проверяет, отстал ли снимок от данных заведения.
+
+    Args:
+        snapshot: OwnerDashboardSnapshot или None.
+        version: Текущая версия данных заведения.
+        month_start: Начало текущего месяца в формате ISO.
+        now: Текущий момент.
+
+    Returns:
+        True, если снимок истёк (is_expired) или посчитан для старой версии заведения.
+    """
+    return is_expired(snapshot, month_start, now) or snapshot.place_version != version
+
+
+def snapshots_for_places(place_ids, period, now=None):
+    """
+    Возвращает снимки профиля владельца, пересобирая отсутствующие и слишком старые.
+
+    Устаревший снимок, посчитанный не раньше чем SNAPSHOT_MAX_STALENESS назад,
+    возвращается как есть (кроме смены месяца и снимков старше SNAPSHOT_MAX_AGE).
+
+    Args:
+        place_ids: Идентификаторы заведений.
+        period: Период анализа ('1m', '3m', '6m').
+        now: Текущий момент (по умолчанию timezone.now()).
+
+    Returns:
+        Словарь {place_id: OwnerDashboardSnapshot}.
+    """
+    place_ids = list(place_ids)
+    now = now or timezone.now()
+    snapshots = {
+        snapshot.place_id: snapshot
+        for snapshot in OwnerDashboardSnapshot.objects.filter(place_id__in=place_ids, period=period)
+    }
+    versions = versioned_cache.get_versions(versioned_cache.PLACE, place_ids)
+    month_start = month_periods(now)['current'].start.isoformat()
+    expired = []
+    for place_id in place_ids:
+        snapshot = snapshots.get(place_id)
+        # Снимка нет, месяц сменился или окно периода сдвинулось — без пересборки цифры неверны.
+        if is_expired(snapshot, month_start, now):
+            expired.append(place_id)
+        # Данные заведения изменились — терпим отставание не дольше SNAPSHOT_MAX_STALENESS.
+        elif snapshot.place_version != versions[place_id] and now - snapshot.computed_at > SNAPSHOT_MAX_STALENESS:
+            expired.append(place_id)
+    if expired:
+        snapshots.update({snapshot.place_id: snapshot for snapshot in save_snapshots(build_snapshots(expired, period, now))})
+    return snapshots
+
+
+def refresh_snapshots(place_ids=None, periods=None, stale_only=False):
+    """
+    Пересобирает снимки профиля владельца (для периодического запуска).
+
+    Args:
+        place_ids: Идентификаторы заведений; по умолчанию все заведения, у которых есть владелец.
+        periods: Периоды анализа; по умолчанию все.
+        stale_only: Если True, пересобираются только отсутствующие и устаревшие снимки.
+
+    Returns:
+        Количество пересобранных снимков.
+    """
+    if place_ids is None:
+        place_ids = Place.objects.filter(owner__isnull=False).values_list('id', flat=True)
+    place_ids = list(place_ids)
+    periods = periods or [code for code, _ in OwnerDashboardSnapshot.PERIOD_CHOICES]
+    now = timezone.now()
+    month_start = month_periods(now)['current'].start.isoformat()
+    versions = versioned_cache.get_versions(versioned_cache.PLACE, place_ids) if stale_only else {}
+
+    refreshed = 0
+    for period in periods:
+        targets = place_ids
+        if stale_only:
+            existing = {
+                snapshot.place_id: snapshot
+                for snapshot in OwnerDashboardSnapshot.objects.filter(place_id__in=place_ids, period=period)
+            }
+            targets = [
+                place_id for place_id in place_ids
+                if is_stale(existing.get(place_id), versions[place_id], month_start, now)
+            ]
+        if targets:
+            refreshed += len(save_snapshots(build_snapshots(targets, period, now)))
+    return refreshed
@@ -1,12 +1,12 @@
+# Импорт logging для отладочных сообщений проверки капчи.
+import logging
+
 # Импорт модуля forms из Django для создания форм.
 from django import forms
 
 # Импорт стандартных форм Django для изменения и создания пользователей.
 from django.contrib.auth.forms import UserChangeForm, UserCreationForm
 
-# Импорт библиотеки requests для отправки HTTP-запросов (например, для проверки капчи).
-import requests
-
 # Импорт исключения ValidationError для обработки ошибок валидации.
 from django.core.exceptions import ValidationError
 
@@ -15,6 +15,12 @@ from django.conf import settings
 
 # Импорт моделей из приложения landing для использования в формах.
 from landing.models import User, Review, Place, Event, OwnerProfile, GourmandProfile, NPSTag, NPSResponse
+# Импорт сервиса создания отзыва (отзыв, NPS, теги и изображения в одной транзакции).
+from landing.reviews import create_review
+# Импорт проверки капчи (библиотека requests загружается только при проверке).
+from landing.captcha import validate_captcha, CaptchaUnavailable
+
+logger = logging.getLogger(__name__)
 
 
 # Класс YandexCaptchaField — кастомное поле формы для интеграции капчи Yandex SmartCaptcha.
@@ -32,30 +38,20 @@ class YandexCaptchaField(forms.Field):
         super().validate(value)
         # Проверяем, что токен капчи не пустой.
         if not value:
-            print("DEBUG: Captcha value is empty")
+            logger.debug("CAPTCHA: Token is empty")
             raise forms.ValidationError("Пожалуйста, пройдите проверку капчи.")
         try:
-            # Отправляем POST-запрос на сервер Yandex для проверки токена.
-            response = requests.post(
-                'https://smartcaptcha.yandexcloud.net/validate',
-                data={
-                    'secret': settings.YANDEX_CAPTCHA_SERVER_KEY,  # Секретный ключ из настроек.
-                    'token': value,  # Токен капчи, переданный из формы.
-                },
-                timeout=5  # Устанавливаем таймаут в 5 секунд для запроса.
-            )
-            # Проверяем, нет ли HTTP-ошибок в ответе.
-            response.raise_for_status()
-            # Парсим JSON-ответ от сервера капчи.
-            result = response.json()
-            print("DEBUG: CAPTCHA API response:", result)
+            # Отправляем токен на сервер Yandex и парсим JSON-ответ.
+            result = validate_captcha(value)
+            # Ответ сервера целиком не пишем: в логе достаточно статуса проверки.
+            logger.debug(f"CAPTCHA: Validation status {result.get('status')!r}")
             # Проверяем, что статус ответа 'ok', иначе капча не пройдена.
             if result.get('status') != 'ok':
-                print("DEBUG: CAPTCHA validation failed")
+                logger.debug("CAPTCHA: Validation failed")
                 raise forms.ValidationError("Ошибка проверки капчи. Попробуйте снова.")
-        except requests.RequestException as e:
+        except CaptchaUnavailable as e:
             # Обрабатываем ошибки запроса (например, проблемы с сетью).
-            print("DEBUG: CAPTCHA API request failed:", str(e))
+            logger.warning(f"CAPTCHA: API request failed: {e}")
             raise forms.ValidationError("Ошибка связи с сервером капчи.")
 
 
@@ -236,18 +232,18 @@ class ReviewCreateForm(forms.ModelForm):
         }
 
     # Метод save сохраняет отзыв и создаёт связанный объект NPS.
-    def save(self, commit=True):
+    # images — загруженные изображения, которые сохраняются в той же транзакции.
+    def save(self, commit=True, images=()):
         # Получаем объект отзыва без сохранения в базе.
         review = super().save(commit=False)
-        # Если commit=True, сохраняем отзыв и создаём NPS.
+        # Если commit=True, сохраняем отзыв, NPS, теги и изображения одной транзакцией.
         if commit:
-            review.save()
-            # Создаём объект NPSResponse с оценкой и тегами.
-            nps = NPSResponse.objects.create(
-                review=review,
-                score=self.cleaned_data['nps_score'],
+            create_review(
+                review,
+                self.cleaned_data['nps_score'],
+                self.cleaned_data['nps_tags'],
+                images,
             )
-            nps.tags.set(self.cleaned_data['nps_tags'])
         return review
 
 
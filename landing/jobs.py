@@ -0,0 +1,188 @@
+# jobs.py
+# Этот файл содержит фоновые задания на сводку отзывов (SummaryJob).
+# Запрос к языковой модели длится секунды, поэтому представление только ставит задание в очередь,
+# а выполняет его обработчик run_summary_jobs в отдельном процессе. Одновременно выполняется не больше
+# SUMMARY_JOB_CONCURRENCY заданий, повторный запрос той же сводки получает уже стоящее в очереди задание.
+
+# Импортируем logging для записи ошибок заданий.
+import logging
+# Импортируем ThreadPoolExecutor для параллельного выполнения пачки заданий.
+from concurrent.futures import ThreadPoolExecutor
+# Импортируем timedelta для таймаута зависших заданий.
+from datetime import timedelta
+
+# Импортируем настройки для предела одновременных заданий.
+from django.conf import settings
+# Импортируем connection, IntegrityError и transaction для захвата заданий и закрытия соединений потоков.
+from django.db import connection, IntegrityError, transaction
+# Импортируем OuterRef и Subquery для незавершённого задания в выборке заведений.
+from django.db.models import OuterRef, Subquery
+# Импортируем reverse для адреса статуса задания.
+from django.urls import reverse
+# Импортируем утилиты для работы с часовыми поясами.
+from django.utils import timezone
+
+# Импортируем модели заданий и снимков (длительность периодов).
+from landing.models import SummaryJob, OwnerDashboardSnapshot
+# Импортируем хранилище сводок.
+from landing.summaries import summarize_reviews, latest_summary
+# Импортируем подготовку текста отзывов и сообщение об ошибке модели.
+from landing.utils import get_reviews_for_last_month, prepare_reviews_data, SUMMARY_ERROR_MESSAGE, REVIEW_ITERATOR_CHUNK_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Задание, выполняющееся дольше, считается брошенным (обработчик упал) и возвращается в очередь.
+SUMMARY_JOB_TIMEOUT = timedelta(minutes=10)
+# Пометка задания, завершённого предыдущей сводкой из-за недоступности языковой модели.
+STALE_SUMMARY_NOTE = "Языковая модель недоступна, показана предыдущая сводка."
+
+
+def enqueue_summary_job(place, period):
+    """
+    Ставит задание на сводку отзывов в очередь или возвращает уже стоящее.
+
+    Args:
+        place: Заведение.
+        period: Период анализа ('1m', '3m', '6m').
+
+    Returns:
+        Кортеж (SummaryJob, True, если задание только что создано).
+    """
+    active = SummaryJob.objects.filter(place=place, period=period, status__in=SummaryJob.ACTIVE_STATUSES).first()
+    if active is not None:
+        return active, False
+    try:
+        with transaction.atomic():
+            return SummaryJob.objects.create(place=place, period=period), True
+    except IntegrityError:
+        # Параллельный запрос поставил задание раньше — возвращаем его.
+        return enqueue_summary_job(place, period)
+
+
+def claim_jobs(limit=None):
+    """
+    Забирает задания из очереди на выполнение с учётом предела одновременных заданий.
+
+    Args:
+        limit: Предел одновременно выполняющихся заданий (по умолчанию SUMMARY_JOB_CONCURRENCY).
+
+    Returns:
+        Список заданий, переведённых в состояние running.
+    """
+    limit = settings.SUMMARY_JOB_CONCURRENCY if limit is None else limit
+    now = timezone.now()
+    with transaction.atomic():
+        # Брошенные задания возвращаются в очередь.
+        SummaryJob.objects.filter(
+            status=SummaryJob.STATUS_RUNNING, started_at__lt=now - SUMMARY_JOB_TIMEOUT,
+        ).update(status=SummaryJob.STATUS_QUEUED, started_at=None)
+        available = limit - SummaryJob.objects.filter(status=SummaryJob.STATUS_RUNNING).count()
+        if available <= 0:
+            return []
+        # skip_locked: параллельные обработчики на PostgreSQL не ждут друг друга и не берут одно задание дважды.
+        job_ids = list(
+            SummaryJob.objects.select_for_update(skip_locked=True).filter(
+                status=SummaryJob.STATUS_QUEUED,
+            ).order_by('created_at').values_list('id', flat=True)[:available]
+        )
+        SummaryJob.objects.filter(id__in=job_ids, status=SummaryJob.STATUS_QUEUED).update(
+            status=SummaryJob.STATUS_RUNNING, started_at=now,
+        )
+    return list(SummaryJob.objects.filter(id__in=job_ids).select_related('place'))
+
+
+def run_job(job):
+    """
+    Выполняет задание: готовит текст отзывов и получает сводку (сохранённую или новую).
+
+    Args:
+        job: Задание в состоянии running.
+
+    Returns:
+        То же задание с итоговым состоянием.
+    """
+    summary, error = None, ''
+    try:
+        days = OwnerDashboardSnapshot.PERIOD_DAYS[job.period]
+        # Отзывы читаются пачками: окно в полгода у популярного заведения может быть большим.
+        reviews_data = prepare_reviews_data(get_reviews_for_last_month(job.place, days=days), chunk_size=REVIEW_ITERATOR_CHUNK_SIZE)
+        summary, _ = summarize_reviews(job.place, job.period, reviews_data)
+        if summary is None:
+            # Модель не ответила — отдаём последнюю сохранённую сводку, если она есть.
+            summary = latest_summary(job.place, job.period)
+            error = STALE_SUMMARY_NOTE if summary is not None else SUMMARY_ERROR_MESSAGE
+    except Exception as exc:
+        logger.exception(f"SUMMARY_JOB: Job {job.pk} for place {job.place_id} failed")
+        error = str(exc) or exc.__class__.__name__
+
+    job.status = SummaryJob.STATUS_DONE if summary is not None else SummaryJob.STATUS_FAILED
+    job.summary = summary
+    job.error = error
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'summary', 'error', 'finished_at'])
+    return job
+
+
+def _run_job_in_thread(job):
+    try:
+        return run_job(job)
+    finally:
+        # Каждый поток открывает своё соединение с базой — закрываем его после задания.
+        connection.close()
+
+
+def run_pending_jobs(limit=None):
+    """
+    Забирает доступные задания и выполняет их параллельно.
+
+    Args:
+        limit: Предел одновременно выполняющихся заданий (по умолчанию SUMMARY_JOB_CONCURRENCY).
+
+    Returns:
+        Список выполненных заданий.
+    """
+    jobs = claim_jobs(limit)
+    if not jobs:
+        return []
+    with ThreadPoolExecutor(max_workers=len(jobs)) as executor:
+        return list(executor.map(_run_job_in_thread, jobs))
+
+
+def job_status(job):
+    """
+    Возвращает состояние задания для JSON-ответа.
+
+    Args:
+        job: Задание на сводку отзывов.
+
+    Returns:
+        Словарь с состоянием, сводкой (если готова) и адресом для опроса.
+    """
+    return {
+        'id': job.pk,
+        'place': job.place_id,
+        'period': job.period,
+        'status': job.status,
+        'summary': job.summary.summary if job.summary_id else None,
+        'error': job.error or None,
+        'created_at': job.created_at,
+        'finished_at': job.finished_at,
+        'status_url': reverse('summary_job_status', args=[job.pk]),
+    }
+
+
+def with_active_summary_job(queryset, period):
+    """
+    Добавляет к выборке заведений id незавершённого задания на сводку за период.
+
+    Args:
+        queryset: Выборка заведений.
+        period: Период анализа ('1m', '3m', '6m').
+
+    Returns:
+        Выборка с аннотацией active_summary_job (None, если задания нет).
+    """
+    active = SummaryJob.objects.filter(
+        place=OuterRef('pk'), period=period, status__in=SummaryJob.ACTIVE_STATUSES,
+    ).values('id')[:1]
+    return queryset.annotate(active_summary_job=Subquery(active))
@@ -0,0 +1,392 @@
+# llm.py
+# Этот файл содержит шлюз к языковой модели (OpenRouter) и его локальную замену для тестов.
+# Шлюз держит один клиент с пулом HTTP-соединений и добавляет к каждому вызову срок (deadline),
+# повторы с экспоненциальной задержкой в пределах общего бюджета повторов, предохранитель
+# (circuit breaker), который при сбоях OpenRouter сразу отказывает вместо ожидания таймаутов,
+# и счётчики задержек и ошибок. Состояние предохранителя и счётчики хранятся в общем кэше,
+# поэтому их видят все воркеры (в том числе веб-воркеры, которые сами модель не вызывают).
+# FakeLLMClient повторяет интерфейс client.chat.completions.create клиента OpenAI,
+# но отвечает сразу и детерминированно, без сети и без платных запросов (LLM_BACKEND=fake).
+
+# Импортируем os для ключа API.
+import os
+# Импортируем random для разброса задержки между повторами.
+import random
+# Импортируем threading для защиты общего состояния при работе из нескольких потоков.
+import threading
+# Импортируем time для сроков, задержек и замера длительности вызовов.
+import time
+# Импортируем deque для окна бюджета повторов.
+from collections import deque
+# Импортируем SimpleNamespace для объектов ответа в формате OpenAI.
+from types import SimpleNamespace
+
+# Импортируем настройки для выбора клиента, таймаутов и размера пула.
+from django.conf import settings
+# Импортируем общий кэш Django для состояния предохранителя и счётчиков.
+from django.core.cache import cache
+
+# Модель OpenRouter для сводок отзывов.
+LLM_MODEL = "mistralai/mistral-7b-instruct"
+# Базовый адрес API OpenRouter.
+OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+# Дополнительные заголовки запросов к OpenRouter.
+OPENROUTER_HEADERS = {
+    "HTTP-Referer": "http://212.192.217.30/",
+    "X-Title": "Gourmand",
+}
+# Таймаут установки соединения (секунды).
+CONNECT_TIMEOUT = 5.0
+# Количество попыток одного вызова (первая и повторы).
+MAX_ATTEMPTS = 4
+# Задержка перед первым повтором и её предел (секунды); каждая следующая вдвое больше.
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 8.0
+# Бюджет повторов: за окно не больше RETRY_BUDGET_RATIO повторов на вызов, но не меньше RETRY_BUDGET_MIN.
+RETRY_BUDGET_RATIO = 0.2
+RETRY_BUDGET_MIN = 3
+RETRY_BUDGET_WINDOW = 60.0
+# Предохранитель размыкается после стольких неудачных вызовов подряд и остаётся разомкнутым столько секунд.
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_RESET_TIMEOUT = 30
+# Границы корзин гистограммы длительности вызовов (секунды).
+LATENCY_BUCKETS = (1, 2, 5, 10, 30, 60)
+# Префикс ключей общего кэша.
+CACHE_PREFIX = 'llm'
+
+
+class LLMUnavailable(Exception):
+    """
+    Языковая модель недоступна: предохранитель разомкнут или исчерпан срок вызова.
+    """
+
+
+class RetryBudget:
+    """
+    Общий для всех вызовов процесса бюджет повторов в скользящем окне.
+
+    Повторы не должны умножать нагрузку на уже перегруженный OpenRouter: их доля
+    ограничена RETRY_BUDGET_RATIO от числа вызовов за окно.
+    """
+
+    def __init__(self, ratio=RETRY_BUDGET_RATIO, minimum=RETRY_BUDGET_MIN, window=RETRY_BUDGET_WINDOW):
+        self.ratio = ratio
+        self.minimum = minimum
+        self.window = window
+        self._calls = deque()
+        self._retries = deque()
+        self._lock = threading.Lock()
+
+    def _trim(self, now):
+        for events in (self._calls, self._retries):
+            while events and events[0] < now - self.window:
+                events.popleft()
+
+    # Учитывает новый вызов.
+    def record_call(self):
+        with self._lock:
+            now = time.monotonic()
+            self._trim(now)
+            self._calls.append(now)
+
+    # Забирает повтор из бюджета; False, если бюджет исчерпан.
+    def try_acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            self._trim(now)
+            if len(self._retries) >= max(self.minimum, self.ratio * len(self._calls)):
+                return False
+            self._retries.append(now)
+            return True
+
+
+class CircuitBreaker:
+    """
+    Предохранитель в общем кэше: после серии сбоев вызовы сразу отказывают,
+    через BREAKER_RESET_TIMEOUT секунд один пробный вызов проверяет, восстановился ли сервис.
+    """
+
+    def __init__(self, threshold=BREAKER_FAILURE_THRESHOLD, reset_timeout=BREAKER_RESET_TIMEOUT):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+
+    @staticmethod
+    def _key(name):
+        return f"{CACHE_PREFIX}:breaker:{name}"
+
+    # Состояние для мониторинга: closed, open или half-open.
+    @property
+    def state(self):
+        open_until = cache.get(self._key('open_until'))
+        if open_until is None:
+            return 'closed'
+        return 'open' if time.time() < open_until else 'half-open'
+
+    # Можно ли выполнить вызов сейчас (в полуоткрытом состоянии — только одному процессу).
+    def allow(self):
+        open_until = cache.get(self._key('open_until'))
+        if open_until is None:
+            return True
+        if time.time() < open_until:
+            return False
+        # add атомарен: пробный вызов получает только один процесс.
+        return cache.add(self._key('trial'), 1, timeout=self.reset_timeout)
+
+    def record_success(self):
+        cache.delete_many([self._key('open_until'), self._key('failures'), self._key('trial')])
+
+    def record_failure(self):
+        cache.add(self._key('failures'), 0, timeout=None)
+        try:
+            failures = cache.incr(self._key('failures'))
+        except ValueError:
+            failures = 1
+            cache.set(self._key('failures'), failures, timeout=None)
+        if failures >= self.threshold:
+            cache.set(self._key('open_until'), time.time() + self.reset_timeout, timeout=None)
+            cache.delete(self._key('trial'))
+
+
+def _metric_key(name):
+    return f"{CACHE_PREFIX}:metrics:{name}"
+
+
+def _count(name, delta=1):
+    key = _metric_key(name)
+    # add создаёт счётчик, только если его ещё нет; incr в Redis атомарен.
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        cache.set(key, delta, timeout=None)
+
+
+def _latency_bucket(seconds):
+    for bound in LATENCY_BUCKETS:
+        if seconds < bound:
+            return f"lt_{bound}s"
+    return f"ge_{LATENCY_BUCKETS[-1]}s"
+
+
+# Виды ошибок для счётчиков; повторяются все, кроме 'client' и 'other'.
+ERROR_KINDS = ('timeout', 'connection', 'rate_limit', 'server', 'client', 'other')
+RETRYABLE_ERROR_KINDS = ('timeout', 'connection', 'rate_limit', 'server')
+
+
+def _error_kind(exc):
+    # Временные сбои (таймауты, обрывы соединения, 429 и 5xx) отделяем от ошибок запроса.
+    import openai
+    if isinstance(exc, (TimeoutError, openai.APITimeoutError)):
+        return 'timeout'
+    if isinstance(exc, (ConnectionError, openai.APIConnectionError)):
+        return 'connection'
+    if isinstance(exc, openai.RateLimitError):
+        return 'rate_limit'
+    if isinstance(exc, openai.APIStatusError):
+        return 'server' if exc.status_code >= 500 else 'client'
+    return 'other'
+
+
+class LLMGateway:
+    """
+    Шлюз к языковой модели: пул соединений, сроки, повторы, предохранитель и метрики.
+
+    Args:
+        client: Готовый клиент с интерфейсом OpenAI (для тестов); по умолчанию создаётся при первом вызове.
+    """
+
+    def __init__(self, client=None):
+        self._client = client
+        self._client_lock = threading.Lock()
+        self.retry_budget = RetryBudget()
+        self.breaker = CircuitBreaker()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self._build_client()
+        return self._client
+
+    @staticmethod
+    def _build_client():
+        if settings.LLM_BACKEND == 'fake':
+            return FakeLLMClient()
+        import httpx
+        from openai import OpenAI
+        # Один httpx.Client на процесс: соединения с OpenRouter переиспользуются между вызовами.
+        http_client = httpx.Client(
+            limits=httpx.Limits(
+                max_connections=settings.LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.LLM_MAX_CONNECTIONS,
+            ),
+            timeout=httpx.Timeout(settings.LLM_REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT),
+        )
+        return OpenAI(
+            api_key=os.getenv("OPENROUTER_API_KEY"),
+            base_url=OPENROUTER_BASE_URL,
+            http_client=http_client,
+            # Повторы выполняет шлюз (с бюджетом и предохранителем), а не клиент.
+            max_retries=0,
+        )
+
+    # Доступна ли модель (предохранитель не разомкнут).
+    def is_available(self):
+        return self.breaker.state != 'open'
+
+    def complete(self, messages, max_tokens, temperature=0.7, deadline=None):
+        """
+        Выполняет запрос к модели с повторами временных сбоев в пределах срока.
+
+        Args:
+            messages: Сообщения чата в формате OpenAI.
+            max_tokens: Предел токенов ответа.
+            temperature: Температура генерации.
+            deadline: Момент time.monotonic(), после которого повторов не будет
+                (по умолчанию через LLM_CALL_DEADLINE секунд).
+
+        Returns:
+            Текст ответа модели.
+
+        Raises:
+            LLMUnavailable: Предохранитель разомкнут или срок вызова исчерпан.
+            Exception: Ошибка модели, которую нельзя или уже некогда повторять.
+        """
+        if deadline is None:
+            deadline = time.monotonic() + settings.LLM_CALL_DEADLINE
+        if not self.breaker.allow():
+            _count('short_circuits')
+            raise LLMUnavailable("Предохранитель разомкнут: OpenRouter недавно не отвечал")
+
+        self.retry_budget.record_call()
+        _count('calls')
+        attempt = 0
+        while True:
+            attempt += 1
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                _count('deadline_exceeded')
+                self.breaker.record_failure()
+                raise LLMUnavailable("Истёк срок вызова языковой модели")
+            started = time.monotonic()
+            try:
+                response = self.client.chat.completions.create(
+                    model=LLM_MODEL,
+                    messages=messages,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    timeout=min(settings.LLM_REQUEST_TIMEOUT, remaining),
+                    extra_headers=OPENROUTER_HEADERS,
+                )
+            except Exception as exc:
+                elapsed = time.monotonic() - started
+                kind = _error_kind(exc)
+                _count(f"errors:{kind}")
+                _count(f"latency:{_latency_bucket(elapsed)}")
+                # Экспоненциальная задержка со случайным разбросом, чтобы воркеры не повторяли хором.
+                delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+                can_retry = (
+                    kind in RETRYABLE_ERROR_KINDS
+                    and attempt < MAX_ATTEMPTS
+                    and time.monotonic() + delay < deadline
+                )
+                if can_retry and not self.retry_budget.try_acquire():
+                    _count('retry_budget_exhausted')
+                    can_retry = False
+                if not can_retry:
+                    _count('failures')
+                    # Ошибки самого запроса (4xx) не говорят о сбое OpenRouter и предохранитель не размыкают.
+                    if kind in RETRYABLE_ERROR_KINDS:
+                        self.breaker.record_failure()
+                    raise
+                _count('retries')
+                time.sleep(delay)
+                continue
+
+            elapsed = time.monotonic() - started
+            _count('successes')
+            _count(f"latency:{_latency_bucket(elapsed)}")
+            _count('latency_ms_total', int(elapsed * 1000))
+            self.breaker.record_success()
+            return response.choices[0].message.content.strip()
+
+    def stats(self):
+        """
+        Возвращает счётчики шлюза по всем процессам.
+
+        Returns:
+            Словарь с числом вызовов, успехов, отказов, повторов, ошибками по типам,
+            гистограммой и средней длительностью успешных вызовов и состоянием предохранителя.
+        """
+        names = ['calls', 'successes', 'failures', 'retries', 'short_circuits', 'retry_budget_exhausted',
+                 'deadline_exceeded', 'latency_ms_total']
+        buckets = [f"lt_{bound}s" for bound in LATENCY_BUCKETS] + [f"ge_{LATENCY_BUCKETS[-1]}s"]
+        keys = {name: _metric_key(name) for name in names}
+        keys.update({f"latency:{bucket}": _metric_key(f"latency:{bucket}") for bucket in buckets})
+        keys.update({f"errors:{kind}": _metric_key(f"errors:{kind}") for kind in ERROR_KINDS})
+        # Все счётчики одним запросом к кэшу.
+        found = cache.get_many(keys.values())
+        values = {name: found.get(key, 0) for name, key in keys.items()}
+        latency_total = values['latency_ms_total']
+        return {
+            **{name: values[name] for name in names if name != 'latency_ms_total'},
+            'errors': {kind: values[f"errors:{kind}"] for kind in ERROR_KINDS},
+            'latency': {bucket: values[f"latency:{bucket}"] for bucket in buckets},
+            'avg_latency_ms': latency_total / values['successes'] if values['successes'] else None,
+            'circuit': self.breaker.state,
+        }
+
+
+class FakeLLMClient:
+    """
+    Клиент языковой модели без сети: возвращает короткую сводку по тексту запроса.
+
+    Args:
+        delay: Задержка ответа в секундах (для проверки таймаутов и очереди заданий).
+        reply: Текст ответа; по умолчанию строится из количества отзывов в запросе.
+        failures: Сколько первых вызовов завершаются ошибкой (для проверки повторов и предохранителя).
+        error: Исключение этих вызовов; по умолчанию ConnectionError.
+    """
+
+    def __init__(self, delay=0.0, reply=None, failures=0, error=None):
+        self.delay = delay
+        self.reply = reply
+        self.failures = failures
+        self.error = error
+        # Аргументы всех вызовов create, для проверок в тестах.
+        self.calls = []
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model, messages, **kwargs):
+        with self._lock:
+            self.calls.append({'model': model, 'messages': messages, **kwargs})
+            fail = len(self.calls) <= self.failures
+        if self.delay:
+            time.sleep(self.delay)
+        if fail:
+            raise self.error or ConnectionError("FakeLLMClient: имитация сбоя соединения")
+        prompt = messages[-1]['content']
+        content = self.reply or f"Сводка: отзывов в запросе — {prompt.count('Отзыв:')}."
+        message = SimpleNamespace(role='assistant', content=content)
+        return SimpleNamespace(model=model, choices=[SimpleNamespace(index=0, message=message, finish_reason='stop')])
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway():
+    """
+    Возвращает общий для процесса шлюз к языковой модели.
+
+    Returns:
+        LLMGateway.
+    """
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = LLMGateway()
+    return _gateway
@@ -0,0 +1,162 @@
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.models import Permission
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections, transaction
+from django.db.migrations.executor import MigrationExecutor
+
+from landing import cache as versioned_cache
+from landing import search
+
+# Псевдоним подключения к исходному файлу SQLite (регистрируется на время команды).
+SOURCE_ALIAS = 'sqlite_source'
+# Число строк в одной пачке чтения и вставки.
+BATCH_SIZE = 2000
+# Таблицы, которые migrate заполняет сам; в целевой базе они заменяются копией с исходными id.
+REPLACED_MODELS = (Permission, ContentType)
+
+
+def register_source(path):
+    # Подключение к исходной базе только для чтения (Django открывает SQLite с uri=True).
+    source = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': f'file:{path}?mode=ro'}
+    connections.settings[SOURCE_ALIAS] = connections.configure_settings({DEFAULT_DB_ALIAS: source})[DEFAULT_DB_ALIAS]
+    return connections[SOURCE_ALIAS]
+
+
+def unapplied_migrations(connection):
+    # Миграции, не применённые к базе.
+    executor = MigrationExecutor(connection)
+    return executor.migration_plan(executor.loader.graph.leaf_nodes())
+
+
+def copy_order(models):
+    """
+    Упорядочивает модели так, чтобы связанные модели копировались раньше ссылающихся на них.
+
+    Args:
+        models: Модели для копирования.
+
+    Returns:
+        Список моделей в порядке копирования.
+    """
+    models = set(models)
+    ordered = []
+    visited = set()
+
+    def visit(model):
+        if model in visited:
+            return
+        visited.add(model)
+        for field in model._meta.concrete_fields:
+            related = field.related_model if field.is_relation else None
+            if related is not None and related is not model and related in models:
+                visit(related)
+        ordered.append(model)
+
+    for model in sorted(models, key=lambda model: model._meta.label):
+        visit(model)
+    return ordered
+
+
+def copy_model(model, source, target, batch_size):
+    """
+    Копирует строки таблицы модели как есть (с исходными id, без save() и сигналов).
+
+    Значения читаются из исходной базы полями модели и приводятся к формату целевой
+    (get_db_prep_save), поэтому даты, десятичные числа и флаги переносятся между СУБД без потерь.
+
+    Returns:
+        Число скопированных строк.
+    """
+    fields = model._meta.concrete_fields
+    quote = target.ops.quote_name
+    sql = (
+        f'INSERT INTO {quote(model._meta.db_table)} ({", ".join(quote(field.column) for field in fields)}) '
+        f'VALUES ({", ".join(["%s"] * len(fields))})'
+    )
+    rows = model._base_manager.using(source.alias).order_by('pk').values_list(*[field.attname for field in fields])
+    copied = 0
+    batch = []
+    with target.cursor() as cursor:
+        for row in rows.iterator(chunk_size=batch_size):
+            batch.append([field.get_db_prep_save(value, connection=target) for field, value in zip(fields, row)])
+            if len(batch) >= batch_size:
+                cursor.executemany(sql, batch)
+                copied += len(batch)
+                batch = []
+        if batch:
+            cursor.executemany(sql, batch)
+            copied += len(batch)
+    return copied
+
+
+class Command(BaseCommand):
+    help = 'Копирует все данные из файла SQLite в базу по умолчанию (например, PostgreSQL из DATABASE_URL)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', default=str(settings.BASE_DIR / 'db.sqlite3'),
+                            help='Путь к исходному файлу SQLite (по умолчанию db.sqlite3 в корне проекта)')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                            help='Число строк в одной пачке вставки')
+
+    def handle(self, *args, **options):
+        path = Path(options['source']).resolve()
+        if not path.is_file():
+            raise CommandError(f'Файл {path} не найден')
+        target = connections[DEFAULT_DB_ALIAS]
+        if target.vendor == 'sqlite' and Path(target.settings_dict['NAME']).resolve() == path:
+            raise CommandError('Исходный файл совпадает с базой по умолчанию: задайте DATABASE_URL целевой базы')
+        source = register_source(path)
+
+        # Схемы обеих баз должны совпадать с моделями: копирование идёт по столбцам моделей.
+        if unapplied_migrations(source):
+            raise CommandError(f'К {path} применены не все миграции: выполните migrate с SQLITE_PATH={path}')
+        if unapplied_migrations(target):
+            raise CommandError('К целевой базе применены не все миграции: выполните migrate')
+
+        models = [
+            model for model in apps.get_models(include_auto_created=True)
+            if model._meta.managed and not model._meta.proxy
+        ]
+        filled = [
+            model._meta.label for model in models
+            if model not in REPLACED_MODELS and model._base_manager.using(target.alias).exists()
+        ]
+        if filled:
+            raise CommandError(f'Целевая база не пуста ({", ".join(filled)}): очистите её командой flush')
+
+        self.stdout.write(f'Копирование {path} → {target.vendor} ({target.settings_dict["NAME"]})')
+        counts = {}
+        with transaction.atomic(using=target.alias):
+            # Типы содержимого и права migrate создал со своими id; заменяем их исходными,
+            # чтобы ссылки на них (права пользователей, журнал админки) остались верными.
+            for model in REPLACED_MODELS:
+                model._base_manager.using(target.alias).all().delete()
+            for model in copy_order(models):
+                try:
+                    counts[model] = copy_model(model, source, target, options['batch_size'])
+                except DatabaseError as exc:
+                    raise CommandError(f'{model._meta.label}: {exc}') from exc
+                self.stdout.write(f'{model._meta.label}: {counts[model]}')
+            # Строки вставлены с явными id: счётчики последовательностей (PostgreSQL) сдвигаются за максимум.
+            with target.cursor() as cursor:
+                for statement in target.ops.sequence_reset_sql(no_style(), list(counts)):
+                    cursor.execute(statement)
+
+        mismatched = [
+            model._meta.label for model, count in counts.items()
+            if model._base_manager.using(source.alias).count() != count
+        ]
+        if mismatched:
+            raise CommandError(f'Число строк не совпадает: {", ".join(mismatched)}')
+
+        # Поисковый индекс FTS5 не модель: на SQLite он строится заново, на других СУБД не нужен.
+        search.rebuild_index()
+        # Кэш страниц и карточек построен по прежней базе.
+        for kind in versioned_cache.KINDS:
+            versioned_cache.invalidate_kind(kind)
+        self.stdout.write(self.style.SUCCESS(f'Скопировано строк: {sum(counts.values())} в {len(counts)} таблицах'))
@@ -0,0 +1,210 @@
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.utils import timezone
+
+from landing import views
+from landing.dashboards import _period_tag_stats
+from landing.models import Event, GourmandProfile, Place, Review
+from landing.nps import metrics_for_places, month_periods
+from landing.pagination import page_queryset, read_rows
+from landing.utils import get_reviews_for_last_month
+
+# Виды проблем плана: полный просмотр таблицы и сортировка строк вне индекса.
+FULL_SCAN = 'scan'
+SORT = 'sort'
+# Признаки проблем в плане SQLite и PostgreSQL.
+SQLITE_FULL_SCAN = 'SCAN '
+SQLITE_TEMP_SORT = 'USE TEMP B-TREE FOR ORDER BY'
+POSTGRES_FULL_SCAN = 'Seq Scan'
+POSTGRES_SORT = 'Sort'
+# На маленьких таблицах планировщик справедливо предпочитает полный просмотр: проблемы не считаются.
+DEFAULT_MIN_ROWS = 1000
+
+
+@contextmanager
+def capture_queries(statements):
+    # Запоминает SQL и параметры всех запросов, выполненных внутри блока.
+    def wrapper(execute, sql, params, many, context):
+        statements.append((sql, params))
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(wrapper):
+        yield
+
+
+def listing_queries():
+    """
+    Запросы страниц списков в том виде, в каком их строят представления.
+
+    Для каждой сортировки — первая страница, страница от курсора (значения первой строки)
+    и подсчёт для приблизительного числа объектов; для отзывов и мероприятий — и с фильтром по заведению.
+
+    Returns:
+        Список троек (название, функция, выполняющая запросы, допустимые виды проблем).
+    """
+    factory = RequestFactory()
+    sample_place = Place.objects.order_by('id').first()
+    listings = [
+        ('places', views._places_list, views.PLACE_ORDERINGS, {}),
+        ('reviews', views._reviews_list, views.REVIEW_ORDERINGS, {'place': sample_place and str(sample_place.id)}),
+        ('events', views._events_list, views.EVENT_ORDERINGS, {'place': sample_place and sample_place.slug}),
+        ('gourmands', views._gourmands_list, views.GOURMAND_ORDERINGS, {}),
+    ]
+    queries = []
+    for name, build, orderings, place_filter in listings:
+        filters = [{}] + ([place_filter] if sample_place and place_filter else [])
+        for extra in filters:
+            suffix = f' place={extra["place"]}' if extra else ''
+            for sort, ordering in orderings.items():
+                queryset = build(factory.get('/', {'sort': sort, **extra}))[0]
+                first_row = page_queryset(queryset, ordering).first()
+                label = f'{name} sort={sort}{suffix}'
+                # Первая страница без фильтра в порядке первичного ключа читает таблицу по порядку до LIMIT.
+                allowed = {FULL_SCAN} if sort == 'id' and not extra else set()
+                queries.append((label, lambda q=queryset, o=ordering: read_rows(
+                    q, o, views.LIST_PAGE_SIZE + 1), allowed))
+                if first_row is not None:
+                    values = ordering.values(first_row)
+                    queries.append((f'{label} cursor', lambda q=queryset, o=ordering, v=values: read_rows(
+                        q, o, views.LIST_PAGE_SIZE + 1, values=v), set()))
+            queryset = build(factory.get('/', extra))[0]
+            # Число объектов всего списка требует просмотра таблицы; поэтому оно кэшируется (cached_count).
+            queries.append((f'{name} count{suffix}', lambda q=queryset: q.order_by().count(), set() if extra else {FULL_SCAN}))
+    return queries
+
+
+def analytics_queries():
+    """
+    Запросы профиля владельца и страниц гурмана: NPS-метрики, теги за период, отзывы за месяц.
+
+    Returns:
+        Список троек (название, функция, выполняющая запросы, допустимые виды проблем).
+    """
+    place = Place.objects.filter(owner__isnull=False).order_by('id').first() or Place.objects.order_by('id').first()
+    if place is None:
+        return []
+    place_ids = [place.id]
+    queries = [
+        ('nps metrics', lambda: metrics_for_places(place_ids, month_periods()), set()),
+        # Сгруппированные счётчики тегов сортируются после группировки — это несколько строк на заведение.
+        ('nps tags 30d', lambda: _period_tag_stats(place_ids, 30, timezone.now()), {SORT}),
+        ('reviews last month', lambda: list(get_reviews_for_last_month(place)), set()),
+        ('place reviews', lambda: list(Review.objects.filter(place=place)), set()),
+        ('place events upcoming', lambda: list(
+            Event.objects.filter(place=place, event_date__gte=timezone.now() - timedelta(days=1)).order_by('event_date')), set()),
+    ]
+    if place.owner_id:
+        queries.append(('owner places', lambda: list(Place.objects.filter(owner_id=place.owner_id)), set()))
+    profile = GourmandProfile.objects.order_by('id').first()
+    if profile is not None:
+        queries.append(('gourmand reviews', lambda: list(Review.objects.filter(gourmand_id=profile.user_id)), set()))
+    return queries
+
+
+def explain(sql, params):
+    # План запроса в текстовом виде (строки с отступом по вложенности).
+    with connection.cursor() as cursor:
+        cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}', params)
+        rows = cursor.fetchall()
+    if connection.vendor != 'sqlite':
+        return [row[0] for row in rows]
+    # Строки EXPLAIN QUERY PLAN SQLite: (id, parent, -, описание); вложенность — по parent.
+    depth = {0: -1}
+    lines = []
+    for node_id, parent_id, _, detail in rows:
+        depth[node_id] = depth.get(parent_id, -1) + 1
+        lines.append('  ' * depth[node_id] + detail)
+    return lines
+
+
+def plan_problems(lines):
+    # Полные просмотры таблиц и сортировки вне индекса в плане: список пар (вид, строка плана).
+    problems = []
+    for line in lines:
+        text = line.strip()
+        if connection.vendor == 'sqlite':
+            if text.startswith(SQLITE_FULL_SCAN) and ' INDEX ' not in text:
+                problems.append((FULL_SCAN, text))
+            elif text.startswith(SQLITE_TEMP_SORT):
+                problems.append((SORT, text))
+        else:
+            text = text.lstrip('-> ')
+            if text.startswith(POSTGRES_FULL_SCAN):
+                problems.append((FULL_SCAN, text))
+            elif text.startswith(POSTGRES_SORT):
+                problems.append((SORT, text))
+    return problems
+
+
+def largest_table_rows(lines, row_counts):
+    # Число строк самой большой таблицы, упомянутой в плане; row_counts — {таблица: строк или None, пока не подсчитано}.
+    largest = 0
+    for line in lines:
+        for word in line.replace('(', ' ').split():
+            if word in row_counts:
+                if row_counts[word] is None:
+                    with connection.cursor() as cursor:
+                        cursor.execute(f'SELECT COUNT(*) FROM {connection.ops.quote_name(word)}')
+                        row_counts[word] = cursor.fetchone()[0]
+                largest = max(largest, row_counts[word])
+    return largest
+
+
+class Command(BaseCommand):
+    help = 'Печатает планы выполнения частых запросов списков и аналитики, чтобы были видны регрессии индексов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--only', action='append', default=[],
+                            help='Показать только запросы, в названии которых есть эта строка (можно повторять)')
+        parser.add_argument('--sql', action='store_true',
+                            help='Печатать текст SQL перед планом')
+        parser.add_argument('--check', action='store_true',
+                            help='Завершиться с ошибкой, если в плане есть полный просмотр таблицы или сортировка вне индекса')
+        parser.add_argument('--min-rows', type=int, default=DEFAULT_MIN_ROWS,
+                            help='Не считать проблемами планы, в которых все таблицы меньше этого числа строк')
+        parser.add_argument('--analyze', action='store_true',
+                            help='Обновить статистику планировщика (ANALYZE) перед построением планов')
+
+    def handle(self, *args, **options):
+        if options['analyze']:
+            # Без статистики SQLite выбирает индекс по «равенству», даже если оно отбирает почти всю таблицу.
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+        queries = listing_queries() + analytics_queries()
+        if options['only']:
+            queries = [query for query in queries if any(part in query[0] for part in options['only'])]
+        if not queries:
+            raise CommandError('Нет запросов для проверки (база пуста или фильтр --only ничего не выбрал)')
+
+        failed = []
+        row_counts = dict.fromkeys(connection.introspection.table_names())
+        for label, run, allowed in queries:
+            statements = []
+            with capture_queries(statements):
+                run()
+            self.stdout.write(self.style.MIGRATE_HEADING(f'\n== {label}'))
+            seen = set()
+            for sql, params in statements:
+                if sql in seen:
+                    continue
+                seen.add(sql)
+                if options['sql']:
+                    self.stdout.write(sql)
+                lines = explain(sql, params)
+                self.stdout.write('\n'.join(lines))
+                problems = [text for kind, text in plan_problems(lines) if kind not in allowed]
+                if problems and largest_table_rows(lines, row_counts) >= options['min_rows']:
+                    failed.append(label)
+                    self.stdout.write(self.style.WARNING(f'  ! {"; ".join(problems)}'))
+
+        if not failed:
+            self.stdout.write(self.style.SUCCESS(f'\nЗапросов: {len(queries)}, все читают таблицы по индексам'))
+            return
+        message = f'Полный просмотр или сортировка вне индекса: {", ".join(dict.fromkeys(failed))}'
+        if options['check']:
+            raise CommandError(message)
+        self.stdout.write(self.style.WARNING(f'\n{message}'))
@@ -0,0 +1,85 @@
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Тяжёлые клиенты, которые должны загружаться при первом использовании, а не при старте воркера.
+LAZY_MODULES = ('openai', 'httpx', 'requests')
+
+# Скрипт дочернего процесса: настройка Django и импорт модулей, которые загружает воркер.
+PROFILE_SCRIPT = '''
+import importlib, sys
+import django
+django.setup()
+for name in sys.argv[1:]:
+    importlib.import_module(name)
+print(' '.join(sorted({name.split('.')[0] for name in sys.modules})))
+'''
+
+
+def parse_importtime(output):
+    # Строки -X importtime: "import time: self [us] | cumulative | имя" (вложенность — отступом имени).
+    rows = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append({
+            'name': name.strip(),
+            'depth': (len(name) - len(name.lstrip()) - 1) // 2,
+            'self': int(self_us),
+            'cumulative': int(cumulative_us),
+        })
+    return rows
+
+
+class Command(BaseCommand):
+    help = 'Показывает время импорта модулей при старте воркера (python -X importtime) и проверяет ленивую загрузку клиентов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--module', action='append', dest='modules',
+                            help='Модуль для импорта после django.setup() (по умолчанию ROOT_URLCONF и WSGI-приложение)')
+        parser.add_argument('--top', type=int, default=20,
+                            help='Сколько самых долгих импортов показать')
+        parser.add_argument('--check', action='store_true',
+                            help=f'Завершиться с ошибкой, если при старте загружены {", ".join(LAZY_MODULES)}')
+
+    def handle(self, *args, **options):
+        modules = options['modules'] or [settings.ROOT_URLCONF, settings.WSGI_APPLICATION.rsplit('.', 1)[0]]
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'Gourmand.settings')}
+        # Отдельный процесс: в текущем многие модули уже загружены и их время не измерить.
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', PROFILE_SCRIPT, *modules],
+            capture_output=True, text=True, env=env, cwd=settings.BASE_DIR,
+        )
+        if result.returncode != 0:
+            raise CommandError(f'Импорт завершился ошибкой:\n{result.stderr.splitlines()[-1] if result.stderr else ""}')
+
+        rows = parse_importtime(result.stderr)
+        total = sum(row['cumulative'] for row in rows if row['depth'] == 0)
+        self.stdout.write(f'Модулей: {len(rows)}, время импорта: {total / 1000:.1f} мс ({", ".join(modules)})')
+
+        self.stdout.write('\nСамые долгие импорты (с вложенными), мс:')
+        for row in sorted(rows, key=lambda row: row['cumulative'], reverse=True)[:options['top']]:
+            self.stdout.write(f'{row["cumulative"] / 1000:10.1f}  {row["self"] / 1000:8.1f}  {row["name"]}')
+
+        packages = {}
+        for row in rows:
+            if row['depth'] == 0:
+                package = row['name'].split('.')[0]
+                packages[package] = packages.get(package, 0) + row['cumulative']
+        self.stdout.write('\nПакеты верхнего уровня, мс:')
+        for package, cumulative in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:options['top']]:
+            self.stdout.write(f'{cumulative / 1000:10.1f}  {package}')
+
+        loaded = set(result.stdout.split())
+        eager = [name for name in LAZY_MODULES if name in loaded]
+        if eager:
+            message = f'\nПри старте загружены тяжёлые клиенты: {", ".join(eager)}'
+            if options['check']:
+                raise CommandError(message.strip())
+            self.stdout.write(self.style.WARNING(message))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'\nКлиенты {", ".join(LAZY_MODULES)} при старте не загружаются'))
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+from landing.ratings import process_rating_queue
+
+
+class Command(BaseCommand):
+    help = 'Обрабатывает очередь пересчёта рейтингов заведений и гурманов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Количество записей очереди за одну пачку')
+        parser.add_argument('--loop', action='store_true',
+                            help='Работать постоянно как фоновый обработчик')
+        parser.add_argument('--interval', type=float, default=5.0,
+                            help='Пауза в секундах между проверками очереди в режиме --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            # Разбираем очередь пачками, пока в ней есть свободные записи
+            # (записи, забранные другими обработчиками, не ждём).
+            while True:
+                result = process_rating_queue(batch_size=options['batch_size'])
+                if not (result.gourmands or result.places):
+                    break
+                self.stdout.write(self.style.SUCCESS(
+                    f"Гурманов: {result.gourmands} (изменилось {result.changed_gourmands}), "
+                    f"заведений: {result.places} (каскадом {result.cascaded_places})"
+                ))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from landing.ratings import rebuild_place_ratings
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает накопленные рейтинги заведений с нуля и проверяет расхождения'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--place', type=int, action='append', dest='place_ids',
+                            help='ID заведения (можно указать несколько раз); по умолчанию — все заведения')
+        parser.add_argument('--check', action='store_true',
+                            help='Только проверить расхождения, ничего не записывая')
+
+    def handle(self, *args, **options):
+        drifts = rebuild_place_ratings(place_ids=options['place_ids'], fix=not options['check'])
+
+        for drift in drifts:
+            self.stdout.write(self.style.WARNING(
+                f"Заведение {drift.place_id}: рейтинг {drift.stored_rating} → {drift.expected_rating}, "
+                f"сумма {drift.stored_weighted_sum:.6f} → {drift.expected_weighted_sum:.6f}, "
+                f"вес {drift.stored_weight_total:.6f} → {drift.expected_weight_total:.6f}"
+            ))
+
+        if not drifts:
+            self.stdout.write(self.style.SUCCESS('Расхождений не найдено'))
+        elif options['check']:
+            self.stdout.write(self.style.ERROR(f'Найдено расхождений: {len(drifts)} (изменения не записаны)'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Исправлено заведений: {len(drifts)}'))
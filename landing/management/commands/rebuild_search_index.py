@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from landing import search
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает поисковый индекс заведений, отзывов и мероприятий (после массовой загрузки данных)'
+
+    def handle(self, *args, **options):
+        if not search.is_supported():
+            self.stdout.write(self.style.WARNING('Индекс FTS5 доступен только на SQLite: используется поиск без индекса'))
+            return
+        counts = search.rebuild_index()
+        for kind, count in counts.items():
+            self.stdout.write(f'{search.SearchHit.KIND_LABELS[kind]}: {count}')
+        self.stdout.write(self.style.SUCCESS(f'Проиндексировано документов: {sum(counts.values())}'))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from landing.ratings import recompute_gourmand_ratings
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает рейтинги всех гурманов одним сгруппированным запросом'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids',
+                            help='ID пользователя-гурмана (можно указать несколько раз)')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только показать изменения, не записывая их в базу')
+
+    def handle(self, *args, **options):
+        result = recompute_gourmand_ratings(user_ids=options['user_ids'], fix=not options['dry_run'])
+        changed = len(result.changed_user_ids)
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(
+                f"Проверено профилей: {result.total}, изменилось бы: {changed} ({result.elapsed:.2f} с)"
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"Проверено профилей: {result.total}, обновлено: {changed} ({result.elapsed:.2f} с)"
+            ))
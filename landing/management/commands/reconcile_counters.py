@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from landing.counters import reconcile_counters
+
+
+class Command(BaseCommand):
+    help = 'Сверяет счётчики отзывов и NPS заведений и гурманов с фактическими данными'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Только проверить расхождения, ничего не записывая')
+
+    def handle(self, *args, **options):
+        drifts = reconcile_counters(fix=not options['check'])
+
+        for drift in drifts:
+            changes = ', '.join(
+                f"{name} {drift.stored[name]} → {value}"
+                for name, value in drift.expected.items() if drift.stored[name] != value
+            )
+            self.stdout.write(self.style.WARNING(f"{drift.model} {drift.object_id}: {changes}"))
+
+        if not drifts:
+            self.stdout.write(self.style.SUCCESS('Расхождений не найдено'))
+        elif options['check']:
+            self.stdout.write(self.style.ERROR(f'Найдено расхождений: {len(drifts)} (изменения не записаны)'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Исправлено объектов: {len(drifts)}'))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from landing.dashboards import refresh_snapshots
+from landing.models import OwnerDashboardSnapshot
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает снимки профиля владельца (NPS, теги, динамика) для заведений с владельцем'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--place', type=int, action='append', dest='place_ids',
+                            help='ID заведения (можно указать несколько раз)')
+        parser.add_argument('--period', action='append', dest='periods',
+                            choices=[code for code, _ in OwnerDashboardSnapshot.PERIOD_CHOICES],
+                            help='Период анализа (по умолчанию все)')
+        parser.add_argument('--stale', action='store_true',
+                            help='Пересобрать только отсутствующие и устаревшие снимки')
+
+    def handle(self, *args, **options):
+        refreshed = refresh_snapshots(
+            place_ids=options['place_ids'],
+            periods=options['periods'],
+            stale_only=options['stale'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'Пересобрано снимков: {refreshed}'))
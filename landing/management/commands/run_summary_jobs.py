@@ -0,0 +1,33 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from landing.jobs import run_pending_jobs
+from landing.models import SummaryJob
+
+
+class Command(BaseCommand):
+    help = 'Выполняет задания на сводку отзывов (запросы к языковой модели) из очереди'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=settings.SUMMARY_JOB_CONCURRENCY,
+                            help='Сколько заданий выполняется одновременно (по умолчанию SUMMARY_JOB_CONCURRENCY)')
+        parser.add_argument('--loop', action='store_true',
+                            help='Работать постоянно как фоновый обработчик')
+        parser.add_argument('--interval', type=float, default=2.0,
+                            help='Пауза в секундах между проверками очереди в режиме --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            # Выполняем задания пачками, пока очередь не опустеет.
+            while SummaryJob.objects.filter(status=SummaryJob.STATUS_QUEUED).exists():
+                jobs = run_pending_jobs(limit=options['concurrency'])
+                if not jobs:
+                    # Все места заняты другими обработчиками — ждём освобождения.
+                    break
+                for job in jobs:
+                    style = self.style.SUCCESS if job.status == SummaryJob.STATUS_DONE else self.style.ERROR
+                    self.stdout.write(style(f"Задание {job.pk} ({job.place}, {job.period}): {job.get_status_display()}"))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,132 @@
+# middleware.py
+# Этот файл содержит кэш целых страниц для анонимных посетителей.
+# Публичные страницы (главная, списки и карточки заведений, отзывов, мероприятий и гурманов)
+# одинаковы для всех анонимных посетителей, поэтому готовый HTML хранится в общем кэше.
+# ETag страницы строится из версий наборов сущностей, от которых она зависит (см. cache.py):
+# любая запись отзыва, голоса или заведения меняет версию, и страница строится заново,
+# а браузер с актуальной копией получает 304 без тела.
+
+# Импортируем hashlib для ETag и ключа страницы.
+import hashlib
+
+# Импортируем настройки для имени cookie сессии.
+from django.conf import settings
+# Импортируем общий кэш Django.
+from django.core.cache import cache
+# Импортируем HttpResponse для ответа из кэша.
+from django.http import HttpResponse
+# Импортируем resolve и Resolver404 для определения имени маршрута.
+from django.urls import resolve, Resolver404
+# Импортируем функции для условных запросов и заголовков кэширования.
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+
+# Импортируем версионированный кэш для версий наборов сущностей.
+from landing import cache as versioned_cache
+
+# Время жизни закэшированной страницы (секунды); ограничивает и устаревание данных, не привязанных к версиям (даты).
+PAGE_CACHE_TIMEOUT = 10 * 60
+# Заголовок с результатом обращения к кэшу страниц (для отладки и мониторинга).
+PAGE_CACHE_HEADER = 'X-Page-Cache'
+
+# Кэшируемые маршруты и виды сущностей, от которых зависит их содержимое.
+PAGE_DEPENDENCIES = {
+    'index': versioned_cache.KINDS,
+    'places': (versioned_cache.PLACE,),
+    'place': (versioned_cache.PLACE, versioned_cache.REVIEW, versioned_cache.EVENT, versioned_cache.GOURMAND),
+    'reviews': (versioned_cache.REVIEW, versioned_cache.PLACE, versioned_cache.GOURMAND),
+    'events': (versioned_cache.EVENT, versioned_cache.PLACE),
+    'gourmands': (versioned_cache.GOURMAND,),
+    'gourmand': (versioned_cache.GOURMAND, versioned_cache.REVIEW, versioned_cache.PLACE),
+    'search': (versioned_cache.PLACE, versioned_cache.REVIEW, versioned_cache.EVENT),
+    'places_api': (versioned_cache.PLACE,),
+    'reviews_api': (versioned_cache.REVIEW, versioned_cache.PLACE, versioned_cache.GOURMAND),
+    'events_api': (versioned_cache.EVENT, versioned_cache.PLACE),
+    'gourmands_api': (versioned_cache.GOURMAND,),
+}
+
+
+class AnonymousPageCacheMiddleware:
+    """
+    Кэширует публичные страницы для анонимных посетителей и отвечает 304 на If-None-Match.
+
+    Страница не кэшируется и не отдаётся из кэша, если в сессии есть сообщения
+    (django.contrib.messages), если страница выдала CSRF-токен (формы) или
+    изменила сессию, а также для ответов, отличных от 200.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        kinds = self._dependencies(request)
+        if kinds is None:
+            return self.get_response(request)
+
+        digest = self._digest(request, kinds)
+        etag = f'"{digest}"'
+        # 304, если у браузера актуальная копия.
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return self._finish(not_modified, etag, 'NOT-MODIFIED')
+
+        key = f"page:{digest}"
+        cached = cache.get(key)
+        if cached is not None:
+            content, content_type = cached
+            return self._finish(HttpResponse(content, content_type=content_type), etag, 'HIT')
+
+        response = self.get_response(request)
+        if not self._is_cacheable(request, response):
+            return response
+        if request.method == 'GET':
+            cache.set(key, (response.content, response['Content-Type']), PAGE_CACHE_TIMEOUT)
+        return self._finish(response, etag, 'MISS')
+
+    def _dependencies(self, request):
+        # Виды сущностей страницы или None, если запрос не подходит для кэша.
+        if request.method not in ('GET', 'HEAD'):
+            return None
+        if request.user.is_authenticated or self._has_messages(request):
+            return None
+        try:
+            url_name = resolve(request.path_info).url_name
+        except Resolver404:
+            return None
+        return PAGE_DEPENDENCIES.get(url_name)
+
+    @staticmethod
+    def _has_messages(request):
+        # Сообщения показываются один раз, поэтому страницу с ними нельзя ни отдавать из кэша, ни сохранять.
+        if 'messages' in request.COOKIES:
+            return True
+        return settings.SESSION_COOKIE_NAME in request.COOKIES and '_messages' in request.session
+
+    @staticmethod
+    def _digest(request, kinds):
+        # ETag и ключ страницы зависят от адреса, параметров запроса (в порядке сортировки) и версий наборов сущностей.
+        query = sorted(request.GET.lists())
+        versions = versioned_cache.collection_versions(kinds)
+        source = repr((request.path, query, sorted(versions.items())))
+        return hashlib.md5(source.encode()).hexdigest()
+
+    @staticmethod
+    def _is_cacheable(request, response):
+        if response.status_code != 200 or response.streaming or response.cookies:
+            return False
+        # Страница с формой выдала CSRF-токен: он привязан к посетителю.
+        if request.META.get('CSRF_COOKIE_NEEDS_UPDATE'):
+            return False
+        # Сообщения, добавленные во время обработки, и изменения сессии относятся к конкретному посетителю.
+        storage = getattr(request, '_messages', None)
+        if storage is not None and storage.added_new:
+            return False
+        return not request.session.modified
+
+    @staticmethod
+    def _finish(response, etag, outcome):
+        response['ETag'] = etag
+        response[PAGE_CACHE_HEADER] = outcome
+        # Браузер проверяет копию при каждом переходе, прокси не отдают её авторизованным посетителям.
+        patch_cache_control(response, no_cache=True)
+        patch_vary_headers(response, ('Cookie',))
+        return response
@@ -0,0 +1,67 @@
+# Generated by Django 5.1.5 on 2026-10-18 17:13
+
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+def fill_rating_totals(apps, schema_editor):
+    # Заполняем вклады отзывов и суммы заведений по той же формуле, что и Review.update_place_rating.
+    Place = apps.get_model('landing', 'Place')
+    Review = apps.get_model('landing', 'Review')
+    totals = {}
+    reviews = []
+    rows = Review.objects.values_list(
+        'id', 'place_id', 'gourmand_rating', 'positive_rating', 'negative_rating',
+        'gourmand__gourmand_profile__rating',
+    )
+    for review_id, place_id, gourmand_rating, positive, negative, author_rating in rows:
+        weight = 0.0
+        if gourmand_rating is not None and author_rating is not None:
+            weight = float(author_rating) * max(0.1, positive - negative + 1)
+        weighted = weight * gourmand_rating if weight else 0.0
+        place_totals = totals.setdefault(place_id, [0.0, 0.0])
+        place_totals[0] += weighted
+        place_totals[1] += weight
+        reviews.append(Review(id=review_id, rating_weight=weight, rating_weighted=weighted))
+    Review.objects.bulk_update(reviews, ['rating_weight', 'rating_weighted'], batch_size=2000)
+    places = []
+    for place_id, (weighted_sum, weight_total) in totals.items():
+        rating = Decimal('0.0')
+        if weight_total > 1e-9:
+            rating = Decimal(str(weighted_sum / weight_total)).quantize(Decimal('0.1'))
+        places.append(Place(
+            id=place_id, rating_weighted_sum=weighted_sum, rating_weight_total=weight_total, rating=rating,
+        ))
+    Place.objects.bulk_update(places, ['rating_weighted_sum', 'rating_weight_total', 'rating'], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('landing', '0011_user_date_joined_alter_user_role'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='place',
+            name='rating_weight_total',
+            field=models.FloatField(default=0.0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='place',
+            name='rating_weighted_sum',
+            field=models.FloatField(default=0.0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='rating_weight',
+            field=models.FloatField(default=0.0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='rating_weighted',
+            field=models.FloatField(default=0.0, editable=False),
+        ),
+        migrations.RunPython(fill_rating_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.5 on 2026-10-18 17:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('landing', '0012_place_rating_totals_review_rating_weight'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RatingQueueEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('place', 'Заведение'), ('gourmand', 'Гурман')], max_length=10)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'unique_together': {('kind', 'object_id')},
+            },
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.1.5 on 2026-10-18 17:21
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def fill_counters(apps, schema_editor):
+    # Заполняем счётчики сгруппированными запросами по отзывам и ответам NPS.
+    Place = apps.get_model('landing', 'Place')
+    GourmandProfile = apps.get_model('landing', 'GourmandProfile')
+    Review = apps.get_model('landing', 'Review')
+    NPSResponse = apps.get_model('landing', 'NPSResponse')
+    places = {place.id: place for place in Place.objects.only('id')}
+    for place_id, review_count in Review.objects.values('place_id').annotate(n=Count('id')).values_list('place_id', 'n'):
+        places[place_id].review_count = review_count
+    nps_rows = NPSResponse.objects.values('review__place_id').annotate(
+        total=Count('id'),
+        promoters=Count('id', filter=Q(score__gte=9)),
+        detractors=Count('id', filter=Q(score__lte=6)),
+    ).values_list('review__place_id', 'total', 'promoters', 'detractors')
+    for place_id, total, promoters, detractors in nps_rows:
+        place = places[place_id]
+        place.nps_count, place.promoter_count, place.detractor_count = total, promoters, detractors
+    Place.objects.bulk_update(
+        places.values(), ['review_count', 'nps_count', 'promoter_count', 'detractor_count'], batch_size=2000
+    )
+    review_counts = dict(Review.objects.values('gourmand_id').annotate(n=Count('id')).values_list('gourmand_id', 'n'))
+    profiles = list(GourmandProfile.objects.only('id', 'user_id'))
+    for profile in profiles:
+        profile.review_count = review_counts.get(profile.user_id, 0)
+    GourmandProfile.objects.bulk_update(profiles, ['review_count'], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('landing', '0013_ratingqueueentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gourmandprofile',
+            name='review_count',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='place',
+            name='detractor_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='place',
+            name='nps_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='place',
+            name='promoter_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='place',
+            name='review_count',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.5 on 2026-10-18 17:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('landing', '0014_place_review_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OwnerDashboardSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('1m', '1 месяц'), ('3m', '3 месяца'), ('6m', '6 месяцев')], max_length=2)),
+                ('data', models.JSONField(default=dict)),
+                ('place_version', models.CharField(blank=True, max_length=64)),
+                ('computed_at', models.DateTimeField()),
+                ('place', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='dashboard_snapshots', to='landing.place')),
+            ],
+            options={
+                'unique_together': {('place', 'period')},
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.5 on 2026-10-18 17:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('landing', '0015_owner_dashboard_snapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReviewSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('1m', '1 месяц'), ('3m', '3 месяца'), ('6m', '6 месяцев')], max_length=2)),
+                ('content_hash', models.CharField(max_length=64)),
+                ('summary', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('place', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='review_summaries', to='landing.place')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'unique_together': {('place', 'period', 'content_hash')},
+            },
+        ),
+    ]
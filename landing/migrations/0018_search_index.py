@@ -0,0 +1,39 @@
+# Generated by Django 5.1.5 on 2026-10-18 19:05
+
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    # Таблица FTS5 есть только в SQLite; на других СУБД поиск работает без индекса.
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    from landing.search import SEARCH_TABLE, rebuild_index, PLACE, REVIEW, EVENT
+    # Текст хранится уже приведённым к основам слов, поэтому unicode61 только разбивает его на слова.
+    # prefix='2 3' — индексы префиксов для поиска по началу основы.
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+        f"title, body, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    )
+    rebuild_index({
+        PLACE: apps.get_model('landing', 'Place').objects.all(),
+        REVIEW: apps.get_model('landing', 'Review').objects.all(),
+        EVENT: apps.get_model('landing', 'Event').objects.all(),
+    })
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    from landing.search import SEARCH_TABLE
+    schema_editor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('landing', '0017_summary_job'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
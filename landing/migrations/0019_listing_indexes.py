@@ -0,0 +1,64 @@
+# Generated by Django 5.1.5 on 2026-10-18 18:13
+
+from django.db import migrations, models
+
+
+def analyze(apps, schema_editor):
+    # Статистика для планировщика: без неё SQLite выбирает индекс по любому равенству
+    # (например, User.role, которое отбирает почти всех пользователей), а не индекс сортировки.
+    schema_editor.execute('ANALYZE')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('landing', '0018_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['place', 'event_date', 'id'], name='event_place_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['event_date', 'id'], name='event_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['name', 'id'], name='event_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gourmandprofile',
+            index=models.Index(fields=['rating', 'id'], name='gourmand_rating_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='npsresponse',
+            index=models.Index(fields=['review', 'created_at', 'score'], name='nps_review_date_score_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='place',
+            index=models.Index(fields=['rating', 'id'], name='place_rating_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='place',
+            index=models.Index(fields=['name', 'id'], name='place_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['place', 'review_date', 'id'], name='review_place_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['place', 'name', 'id'], name='review_place_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['review_date', 'id'], name='review_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['name', 'id'], name='review_name_idx'),
+        ),
+        migrations.RunPython(analyze, migrations.RunPython.noop),
+    ]
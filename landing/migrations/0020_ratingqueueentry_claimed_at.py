@@ -0,0 +1,18 @@
+# Generated by Django 5.1.5 on 2026-10-18 18:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('landing', '0019_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ratingqueueentry',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
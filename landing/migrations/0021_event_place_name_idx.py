@@ -0,0 +1,17 @@
+# Generated by Django 5.1.5 on 2026-10-18 18:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('landing', '0020_ratingqueueentry_claimed_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['place', 'name', 'id'], name='event_place_name_idx'),
+        ),
+    ]
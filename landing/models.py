@@ -3,19 +3,80 @@ from django.contrib.auth.base_user import AbstractBaseUser, BaseUserManager
 # Импорт миксина PermissionsMixin для работы с правами доступа.
 from django.contrib.auth.models import PermissionsMixin
 # Импорт базовых моделей и полей из Django для создания структуры базы данных.
-from django.db import models
+from django.db import models, transaction
 # Импорт валидатора для проверки расширений файлов.
 from django.core.validators import FileExtensionValidator
-# Импорт функции Sum для агрегации данных (например, подсчёт рейтингов).
-from django.db.models import Sum
+# Импорт функции Sum для агрегации данных (например, подсчёт рейтингов) и F для атомарных обновлений.
+from django.db.models import Sum, F
+# Импорт Greatest, чтобы счётчики не уходили в минус при сдвиге.
+from django.db.models.functions import Greatest
 # Импорт утилиты slugify для генерации slug на основе текста.
 from django.utils.text import slugify
 # Импорт pytils_slugify для транслитерации кириллических символов в slug.
 from pytils.translit import slugify as pytils_slugify  # Для транслитерации кириллицы
+# Импорт functools.partial, чтобы передать сохранение объекта в выделитель slug.
+from functools import partial
 # Импорт Decimal для работы с десятичными числами (например, рейтингами).
 from decimal import Decimal
 # Импорт настроек Django для доступа к модели пользователя.
 from django.conf import settings
+# Импорт выделения уникальных slug одним запросом (без проверки exists() на каждый кандидат).
+from landing.slugs import save_with_slug
+# Импорт выбора обложки карточки (первого изображения).
+from landing.covers import cover_image_url
+# Импорт версионированного кэша производных данных (сброс версий при записи).
+from landing import cache as versioned_cache
+
+
+# Минимальный модификатор веса отзыва (если дизлайков больше, чем лайков).
+MIN_VOTE_MODIFIER = 0.1
+# Порог суммы весов, ниже которого рейтинг считается нулевым (защита от накопленной погрешности float).
+RATING_WEIGHT_EPSILON = 1e-9
+
+
+# Функция review_weight вычисляет вес отзыва в рейтинге заведения.
+def review_weight(author_rating, positive_rating, negative_rating):
+    # Отзывы авторов без профиля гурмана не учитываются.
+    if author_rating is None:
+        return 0.0
+    # Модификатор веса на основе лайков и дизлайков, минимум MIN_VOTE_MODIFIER.
+    modifier = max(MIN_VOTE_MODIFIER, positive_rating - negative_rating + 1)
+    # Итоговый вес: рейтинг гурмана * модификатор.
+    return float(author_rating) * modifier
+
+
+# Функция rating_from_totals превращает накопленные суммы в рейтинг с одним знаком после запятой.
+def rating_from_totals(weighted_sum, weight_total):
+    if weight_total > RATING_WEIGHT_EPSILON:
+        return Decimal(str(weighted_sum / weight_total)).quantize(Decimal('0.1'))
+    return Decimal('0.0')
+
+
+# Функция gourmand_rating_from_votes вычисляет рейтинг гурмана по сумме реакций на его отзывы:
+# доля положительных реакций, умноженная на 5, с одним знаком после запятой.
+def gourmand_rating_from_votes(total_positive, total_negative):
+    total_reactions = total_positive + total_negative
+    if total_reactions > 0:
+        return Decimal(total_positive / total_reactions * 5).quantize(Decimal('0.1'))
+    return Decimal('0.0')
+
+
+# Функция shift_counters атомарно сдвигает счётчики строк выборки F-выражениями, не опуская их ниже нуля.
+# deltas — {имя поля: приращение}; нулевые приращения пропускаются.
+def shift_counters(queryset, **deltas):
+    deltas = {name: delta for name, delta in deltas.items() if delta}
+    if deltas:
+        queryset.update(**{name: Greatest(F(name) + delta, 0) for name, delta in deltas.items()})
+
+
+# Функция nps_counter_deltas возвращает приращения NPS-счётчиков заведения для одного ответа с оценкой score.
+# sign=1 — ответ добавлен, sign=-1 — ответ убран.
+def nps_counter_deltas(score, sign=1):
+    return {
+        'nps_count': sign,
+        'promoter_count': sign if score >= NPSResponse.PROMOTER_MIN_SCORE else 0,
+        'detractor_count': sign if score <= NPSResponse.DETRACTOR_MAX_SCORE else 0,
+    }
 
 
 # Класс UserManager — кастомный менеджер для модели User, управляет созданием пользователей.
@@ -76,27 +137,24 @@ class User(AbstractBaseUser, PermissionsMixin):
     # Указываем обязательные поля при создании пользователя (кроме email).
     REQUIRED_FIELDS = ["first_name", "last_name"]
 
+    # Метод slug_base возвращает базовый slug до добавления суффикса уникальности.
+    def slug_base(self):
+        # Формируем базовый slug из имени и фамилии или email, если имя/фамилия пусты.
+        base_slug = (
+            f"{self.first_name}-{self.last_name}"
+            if self.first_name and self.last_name
+            else self.email.split('@')[0]
+        )
+        # Транслитерируем базовый slug для поддержки кириллицы.
+        # Если транслитерация не удалась, используем дефолтный формат.
+        return pytils_slugify(base_slug) or f"user-{self.id or 'new'}"
+
     # Метод save переопределяет сохранение объекта для генерации slug.
     def save(self, *args, **kwargs):
-        # Проверяем, что slug ещё не сгенерирован.
+        # Если slug ещё не сгенерирован, выделяем свободный и сохраняем с повтором при конфликте.
         if not self.slug:
-            # Формируем базовый slug из имени и фамилии или email, если имя/фамилия пусты.
-            base_slug = (
-                f"{self.first_name}-{self.last_name}"
-                if self.first_name and self.last_name
-                else self.email.split('@')[0]
-            )
-            # Транслитерируем базовый slug для поддержки кириллицы.
-            self.slug = pytils_slugify(base_slug)
-            # Если транслитерация не удалась, используем дефолтный формат.
-            if not self.slug:
-                self.slug = f"user-{self.id or 'new'}"
-            original_slug = self.slug
-            counter = 1
-            # Проверяем уникальность slug и добавляем суффикс, если он уже существует.
-            while User.objects.filter(slug=self.slug).exclude(id=self.id).exists():
-                self.slug = f"{original_slug}-{counter}"
-                counter += 1
+            save_with_slug(self, self.slug_base(), partial(super().save, *args, **kwargs))
+            return
         # Вызываем родительский метод save для сохранения объекта.
         super().save(*args, **kwargs)
 
@@ -123,11 +181,25 @@ class GourmandProfile(models.Model):
     image = models.ImageField(upload_to='gourmand_images/', blank=True, null=True)
     # Описание профиля, текстовое поле, может быть пустым.
     description = models.TextField(blank=True, null=True)
+    # Количество отзывов гурмана; поддерживается при записи отзывов, индекс — для сортировки.
+    review_count = models.PositiveIntegerField(default=0, editable=False, db_index=True)
+
+    # Метакласс Meta задаёт индекс под сортировку списка гурманов по рейтингу (курсор по рейтингу и id).
+    class Meta:
+        indexes = [
+            models.Index(fields=['rating', 'id'], name='gourmand_rating_idx'),
+        ]
 
     # Метод __str__ возвращает строковое представление профиля (имя и фамилия пользователя).
     def __str__(self):
         return f"{self.user.first_name} {self.user.last_name}"
 
+    # Метод apply_review_count_delta атомарно сдвигает счётчик отзывов гурмана (user_id — id пользователя).
+    @classmethod
+    def apply_review_count_delta(cls, user_id, delta):
+        shift_counters(cls.objects.filter(user_id=user_id), review_count=delta)
+        versioned_cache.invalidate(versioned_cache.GOURMAND, user_id)
+
     # Метод update_rating обновляет рейтинг профиля на основе отзывов.
     def update_rating(self):
         # Используем агрегацию для подсчёта суммы positive_rating и negative_rating из отзывов пользователя.
@@ -135,20 +207,15 @@ class GourmandProfile(models.Model):
             total_positive=Sum('positive_rating'),
             total_negative=Sum('negative_rating')
         )
-        # Получаем значения или 0, если агрегация вернула None.
-        total_positive = reviews_stats['total_positive'] or 0
-        total_negative = reviews_stats['total_negative'] or 0
-        # Общее количество реакций.
-        total_reactions = total_positive + total_negative
-
-        # Вычисляем рейтинг: доля положительных реакций умножается на 5.
-        if total_reactions > 0:
-            self.rating = (total_positive / total_reactions) * 5
-        else:
-            self.rating = 0.0
+        # Вычисляем рейтинг по сумме реакций (0, если агрегация вернула None).
+        self.rating = gourmand_rating_from_votes(
+            reviews_stats['total_positive'] or 0,
+            reviews_stats['total_negative'] or 0,
+        )
 
         # Обновляем рейтинг напрямую в базе, чтобы избежать рекурсии при вызове save().
         GourmandProfile.objects.filter(id=self.id).update(rating=self.rating)
+        versioned_cache.invalidate(versioned_cache.GOURMAND, self.user_id)
 
 
 # Класс Place — модель заведения с информацией и рейтингом.
@@ -177,65 +244,80 @@ class Place(models.Model):
     )
     # Уникальный URL-дружественный идентификатор, генерируется автоматически.
     slug = models.SlugField(max_length=100, blank=True, unique=True, verbose_name="Слаг")
+    # Накопленная сумма оценок отзывов, умноженных на их вес (числитель средневзвешенного рейтинга).
+    rating_weighted_sum = models.FloatField(default=0.0, editable=False)
+    # Накопленная сумма весов отзывов (знаменатель средневзвешенного рейтинга).
+    rating_weight_total = models.FloatField(default=0.0, editable=False)
+    # Количество отзывов о заведении; поддерживается при записи отзывов, индекс — для сортировки.
+    review_count = models.PositiveIntegerField(default=0, editable=False, db_index=True)
+    # Количество ответов NPS, промоутеров и детракторов; поддерживаются при записи ответов NPS.
+    nps_count = models.PositiveIntegerField(default=0, editable=False)
+    promoter_count = models.PositiveIntegerField(default=0, editable=False)
+    detractor_count = models.PositiveIntegerField(default=0, editable=False)
+
+    # Метакласс Meta задаёт индексы под сортировки списка заведений (курсор по столбцу сортировки и id).
+    class Meta:
+        indexes = [
+            models.Index(fields=['rating', 'id'], name='place_rating_idx'),
+            models.Index(fields=['name', 'id'], name='place_name_idx'),
+        ]
+
+    # Метод slug_base возвращает базовый slug до добавления суффикса уникальности.
+    def slug_base(self):
+        # Пробуем транслитерировать название с помощью pytils.
+        base_slug = pytils_slugify(self.name) if self.name else ''
+        # Если name пустое или содержит только спецсимволы, используем дефолтный формат.
+        return base_slug or f"place-{self.id or 'new'}"
 
     # Метод save переопределяет сохранение объекта для генерации slug.
     def save(self, *args, **kwargs):
-        # Проверяем, что slug ещё не сгенерирован.
+        # Если slug ещё не сгенерирован, выделяем свободный и сохраняем с повтором при конфликте.
         if not self.slug:
-            # Пробуем транслитерировать название с помощью pytils.
-            base_slug = pytils_slugify(self.name) if self.name else f"place-{self.id or 'new'}"
-            # Если транслитерация не удалась, используем дефолтный формат.
-            if not base_slug:  # Если name пустое или содержит только спецсимволы
-                base_slug = f"place-{self.id or 'new'}"
-            self.slug = base_slug
-            original_slug = self.slug
-            counter = 1
-            # Проверяем уникальность slug и добавляем суффикс, если он уже существует.
-            while Place.objects.filter(slug=self.slug).exclude(id=self.id).exists():
-                self.slug = f"{original_slug}-{counter}"
-                counter += 1
-        # Вызываем родительский метод save для сохранения объекта.
-        super().save(*args, **kwargs)
+            save_with_slug(self, self.slug_base(), partial(super().save, *args, **kwargs))
+        else:
+            # Вызываем родительский метод save для сохранения объекта.
+            super().save(*args, **kwargs)
+        # Данные заведения изменились — сбрасываем его закэшированные производные данные.
+        versioned_cache.invalidate(versioned_cache.PLACE, self.id)
 
     # Метод __str__ возвращает строковое представление объекта (название).
     def __str__(self):
         return self.name
 
-    # Метод update_rating обновляет рейтинг заведения на основе отзывов.
-    def update_rating(self):
-        # Получаем все отзывы для этого места.
-        reviews = self.reviews.all()
-        if reviews.exists():
-            # Фильтруем отзывы с валидным gourmand_rating и профилем.
-            valid_reviews = [
-                review for review in reviews
-                if review.gourmand_rating is not None and hasattr(review.gourmand, 'gourmand_profile')
-            ]
-            if valid_reviews:
-                # Вычисляем вес каждого отзыва: рейтинг гурмана * (positive - negative + 1).
-                total_weighted_rating = 0
-                total_weight = 0
-                for review in valid_reviews:
-                    # Модификатор веса на основе лайков и дизлайков, минимум 0.1.
-                    modifier = review.positive_rating - review.negative_rating + 1
-                    modifier = max(0.1, modifier)  # Минимальный модификатор 0.1
-                    # Итоговый вес: рейтинг гурмана * модификатор.
-                    weight = float(review.gourmand.gourmand_profile.rating) * modifier
-                    total_weighted_rating += review.gourmand_rating * weight
-                    total_weight += weight
-
-                # Считаем средневзвешенный рейтинг.
-                if total_weight > 0:
-                    average_rating = total_weighted_rating / total_weight
-                    self.rating = Decimal(str(average_rating)).quantize(Decimal('0.1'))
-                else:
-                    self.rating = Decimal('0.0')
-            else:
-                self.rating = Decimal('0.0')
-        else:
-            self.rating = Decimal('0.0')
-        # Сохраняем обновлённый рейтинг.
-        self.save()
+    # Свойство cover_image_url возвращает адрес обложки (первого изображения) или None.
+    # В списках берётся из аннотации with_cover_image без дополнительных запросов.
+    @property
+    def cover_image_url(self):
+        return cover_image_url(self)
+
+    # Метод apply_rating_delta атомарно сдвигает накопленные суммы рейтинга заведения и пересчитывает рейтинг.
+    # Работает за O(1) — без загрузки отзывов и без повторной проверки slug в save().
+    @classmethod
+    def apply_rating_delta(cls, place_id, weighted_delta, weight_delta):
+        with transaction.atomic():
+            places = cls.objects.filter(id=place_id)
+            # Сдвигаем суммы F-выражениями, чтобы параллельные обновления не терялись.
+            places.update(
+                rating_weighted_sum=F('rating_weighted_sum') + weighted_delta,
+                rating_weight_total=F('rating_weight_total') + weight_delta,
+            )
+            row = places.values_list('rating_weighted_sum', 'rating_weight_total', 'rating').first()
+            # Заведение могло быть удалено (например, каскадно вместе с отзывами).
+            if row is not None:
+                rating = rating_from_totals(*row[:2])
+                places.update(rating=rating)
+                if rating != row[2]:
+                    # Рейтинг — вес подсказки заведения; update() не вызывает post_save.
+                    from landing import suggest
+                    suggest.record_weight_changes(suggest.PLACE, [place_id])
+        versioned_cache.invalidate(versioned_cache.PLACE, place_id)
+
+    # Метод apply_counter_delta атомарно сдвигает счётчики отзывов и NPS заведения.
+    # deltas — {имя счётчика: приращение}, например review_count=1.
+    @classmethod
+    def apply_counter_delta(cls, place_id, **deltas):
+        shift_counters(cls.objects.filter(id=place_id), **deltas)
+        versioned_cache.invalidate(versioned_cache.PLACE, place_id)
 
 
 # Класс PlaceImage — модель для хранения изображений заведения.
@@ -296,37 +378,143 @@ class Review(models.Model):
     place = models.ForeignKey('Place', on_delete=models.CASCADE, related_name='reviews')
     # Уникальный URL-дружественный идентификатор, генерируется автоматически.
     slug = models.SlugField(max_length=100, blank=True, unique=True, verbose_name="Слаг")
+    # Вес, с которым отзыв сейчас учтён в рейтинге заведения.
+    rating_weight = models.FloatField(default=0.0, editable=False)
+    # Вклад отзыва в числитель рейтинга заведения (вес * оценка гурмана).
+    rating_weighted = models.FloatField(default=0.0, editable=False)
+
+    # Метакласс Meta задаёт индексы под сортировки списка отзывов (курсор по столбцу сортировки и id)
+    # и отзывы заведения за период (фильтр по заведению и диапазону дат).
+    class Meta:
+        indexes = [
+            models.Index(fields=['place', 'review_date', 'id'], name='review_place_date_idx'),
+            models.Index(fields=['place', 'name', 'id'], name='review_place_name_idx'),
+            models.Index(fields=['review_date', 'id'], name='review_date_idx'),
+            models.Index(fields=['name', 'id'], name='review_name_idx'),
+        ]
+
+    # Поля, которые меняются только атомарными UPDATE (голоса — cast_vote, вклад — update_place_rating).
+    # У экземпляра, загруженного до голоса, они устарели, поэтому при редактировании отзыва не записываются.
+    DERIVED_FIELDS = ('positive_rating', 'negative_rating', 'rating_weight', 'rating_weighted')
+    # Поля, от которых зависят вклад отзыва в рейтинг и счётчики заведения и автора.
+    RATING_FIELDS = ('gourmand_rating', 'positive_rating', 'negative_rating', 'place', 'place_id', 'gourmand', 'gourmand_id')
 
     # Метод save переопределяет сохранение объекта для генерации slug и обновления рейтингов.
+    # Новый отзыв записывается одним INSERT: slug и вклад в рейтинг вычисляются заранее.
     def save(self, *args, **kwargs):
-        # Сохраняем объект один раз для получения id.
-        super().save(*args, **kwargs)
-
-        # Генерируем slug, если его нет.
-        if not self.slug:
-            # Формируем базовый slug из названия и id.
-            base_slug = f"{self.name}-{self.id}" if self.name else f"review-{self.id}"
-            self.slug = pytils_slugify(base_slug)
+        adding = self._state.adding
+        # Запоминаем, с каким вкладом и в какое заведение отзыв был учтён до сохранения.
+        previous = None
+        if adding:
+            # Вклад нового отзыва пишем той же вставкой, без отдельного UPDATE.
+            self.rating_weight, self.rating_weighted = self.rating_contribution()
+        else:
+            previous = Review.objects.filter(pk=self.pk).values(
+                'place_id', 'gourmand_id', 'rating_weighted', 'rating_weight'
+            ).first()
+            if previous and not args and kwargs.get('update_fields') is None:
+                kwargs['update_fields'] = [
+                    field.name for field in self._meta.concrete_fields
+                    if not field.primary_key and field.name not in self.DERIVED_FIELDS
+                ]
+
+        with transaction.atomic():
+            # Генерируем slug до вставки, если его нет (повтор при конфликте уникальности).
             if not self.slug:
-                self.slug = f"review-{self.id}"
-            original_slug = self.slug
-            counter = 1
-            # Проверяем уникальность slug и добавляем суффикс, если он уже существует.
-            while Review.objects.filter(slug=self.slug).exclude(id=self.id).exists():
-                self.slug = f"{original_slug}-{counter}"
-                counter += 1
-            # Сохраняем ещё раз только если изменился slug.
-            super().save(update_fields=['slug'])
-
-        # Обновляем рейтинги места и профиля гурмана после сохранения.
-        self.place.update_rating()
-        if hasattr(self.gourmand, 'gourmand_profile'):
-            self.gourmand.gourmand_profile.update_rating()
+                save_with_slug(self, self.slug_base(), partial(super().save, *args, **kwargs))
+            else:
+                super().save(*args, **kwargs)
+            if not adding:
+                # Вклад в рейтинг считается по текущим счётчикам голосов, а не по загруженным с экземпляром.
+                self.refresh_from_db(fields=['positive_rating', 'negative_rating'])
+                # Сохранены только поля, не влияющие на рейтинг (например, slug): пересчитывать нечего.
+                if kwargs.get('update_fields') is not None and not set(kwargs['update_fields']) & set(self.RATING_FIELDS):
+                    return
+
+            if adding:
+                # Новый отзыв: добавляем его вклад к заведению (O(1)).
+                if self.rating_weight:
+                    Place.apply_rating_delta(self.place_id, self.rating_weighted, self.rating_weight)
+                # Счётчики отзывов заведения и автора.
+                Place.apply_counter_delta(self.place_id, review_count=1)
+                GourmandProfile.apply_review_count_delta(self.gourmand_id, 1)
+                # У нового отзыва ещё нет голосов, поэтому на рейтинг автора он не влияет и в очередь не ставится.
+            else:
+                # Обновляем рейтинг места на разницу вкладов (O(1)).
+                self.update_place_rating(previous)
+                if previous:
+                    self.move_counters(previous)
+                # Рейтинг автора пересчитывается фоновым обработчиком очереди (process_rating_queue).
+                RatingQueueEntry.mark(gourmand_ids=[self.gourmand_id])
+
+    # Метод slug_base возвращает базовый slug из названия до добавления суффикса уникальности.
+    # Slug выделяется до вставки, когда id ещё нет, поэтому новые отзывы получают slug «название»,
+    # «название-1», … вместо прежнего «название-id». Уже выданные slug не меняются, и старые адреса работают.
+    def slug_base(self):
+        base_slug = pytils_slugify(self.name) if self.name else ''
+        return base_slug or f"review-{self.id or 'new'}"
+
+    # Метод move_counters переносит счётчики, если отзыв перенесён в другое заведение или к другому автору.
+    # previous — сохранённые в базе place_id и gourmand_id до изменения.
+    def move_counters(self, previous):
+        if previous['place_id'] != self.place_id:
+            # Ответ NPS принадлежит отзыву, поэтому переезжает вместе с ним.
+            nps_score = NPSResponse.objects.filter(review_id=self.pk).values_list('score', flat=True).first()
+            old_deltas = {'review_count': -1}
+            new_deltas = {'review_count': 1}
+            if nps_score is not None:
+                old_deltas.update(nps_counter_deltas(nps_score, -1))
+                new_deltas.update(nps_counter_deltas(nps_score))
+            Place.apply_counter_delta(previous['place_id'], **old_deltas)
+            Place.apply_counter_delta(self.place_id, **new_deltas)
+        if previous['gourmand_id'] != self.gourmand_id:
+            GourmandProfile.apply_review_count_delta(previous['gourmand_id'], -1)
+            GourmandProfile.apply_review_count_delta(self.gourmand_id, 1)
+
+    # Метод rating_contribution возвращает вклад отзыва в рейтинг заведения: (вес, вес * оценка).
+    def rating_contribution(self):
+        # Отзыв без оценки гурмана в рейтинге заведения не участвует.
+        if self.gourmand_rating is None:
+            return 0.0, 0.0
+        # Рейтинг автора (None, если у него нет профиля гурмана).
+        author_rating = GourmandProfile.objects.filter(user_id=self.gourmand_id).values_list(
+            'rating', flat=True
+        ).first()
+        weight = review_weight(author_rating, self.positive_rating, self.negative_rating)
+        return weight, (weight * self.gourmand_rating if weight else 0.0)
+
+    # Метод update_place_rating пересчитывает вклад отзыва и применяет к заведению только разницу.
+    # previous — вклад, учтённый ранее; если не передан, берётся сохранённый в базе.
+    def update_place_rating(self, previous=None):
+        if previous is None:
+            previous = Review.objects.filter(pk=self.pk).values(
+                'place_id', 'rating_weighted', 'rating_weight'
+            ).first()
+        weight, weighted = self.rating_contribution()
+
+        with transaction.atomic():
+            # Сохраняем новый вклад отзыва.
+            Review.objects.filter(pk=self.pk).update(rating_weight=weight, rating_weighted=weighted)
+            self.rating_weight, self.rating_weighted = weight, weighted
+            if previous and previous['place_id'] != self.place_id:
+                # Отзыв перенесён в другое заведение: убираем старый вклад оттуда целиком.
+                Place.apply_rating_delta(previous['place_id'], -previous['rating_weighted'], -previous['rating_weight'])
+                previous = None
+            old_weighted = previous['rating_weighted'] if previous else 0.0
+            old_weight = previous['rating_weight'] if previous else 0.0
+            if weighted != old_weighted or weight != old_weight:
+                Place.apply_rating_delta(self.place_id, weighted - old_weighted, weight - old_weight)
 
     # Метод __str__ возвращает строковое представление отзыва.
     def __str__(self):
         return f"{self.name} от {self.gourmand} о {self.place}"
 
+    # Свойство cover_image_url возвращает адрес обложки (первого изображения) или None.
+    # В списках берётся из аннотации with_cover_image без дополнительных запросов.
+    @property
+    def cover_image_url(self):
+        return cover_image_url(self)
+
 
 # Класс ReviewImage — модель для хранения изображений отзывов.
 class ReviewImage(models.Model):
@@ -404,32 +592,41 @@ class Event(models.Model):
     # Уникальный URL-дружественный идентификатор, генерируется автоматически.
     slug = models.SlugField(max_length=100, blank=True, unique=True, verbose_name="Слаг")
 
+    # Метакласс Meta задаёт индексы под сортировки списка мероприятий, в том числе мероприятий одного заведения.
+    class Meta:
+        indexes = [
+            models.Index(fields=['place', 'event_date', 'id'], name='event_place_date_idx'),
+            models.Index(fields=['place', 'name', 'id'], name='event_place_name_idx'),
+            models.Index(fields=['event_date', 'id'], name='event_date_idx'),
+            models.Index(fields=['name', 'id'], name='event_name_idx'),
+        ]
+
+    # Метод slug_base возвращает базовый slug до добавления суффикса уникальности.
+    def slug_base(self):
+        base_slug = pytils_slugify(self.name) if self.name else ''
+        return base_slug or f"event-{self.id or 'new'}"
+
     # Метод save переопределяет сохранение объекта для генерации slug.
     def save(self, *args, **kwargs):
-        # Сначала сохраняем объект, чтобы получить id.
+        # Если мероприятие не еженедельное, сбрасываем день недели.
+        if not self.is_weekly:
+            self.day_of_week = None
+        # Если slug ещё не сгенерирован, выделяем его до вставки и сохраняем одной записью.
         if not self.slug:
-            super().save(*args, **kwargs)  # Первое сохранение
-            self.slug = pytils_slugify(self.name) if self.name else f"event-{self.id}"
-            if not self.slug:
-                self.slug = f"event-{self.id}"
-            original_slug = self.slug
-            counter = 1
-            # Проверяем уникальность slug и добавляем суффикс, если он уже существует.
-            while Event.objects.filter(slug=self.slug).exclude(id=self.id).exists():
-                self.slug = f"{original_slug}-{counter}"
-                counter += 1
-            # Сохраняем ещё раз с обновлённым slug.
-            super().save(*args, **kwargs)
-        else:
-            # Если мероприятие не еженедельное, сбрасываем день недели.
-            if not self.is_weekly:
-                self.day_of_week = None
-            super().save(*args, **kwargs)
+            save_with_slug(self, self.slug_base(), partial(super().save, *args, **kwargs))
+            return
+        super().save(*args, **kwargs)
 
     # Метод __str__ возвращает строковое представление объекта (название).
     def __str__(self):
         return self.name
 
+    # Свойство cover_image_url возвращает адрес обложки (первого изображения) или None.
+    # В списках берётся из аннотации with_cover_image без дополнительных запросов.
+    @property
+    def cover_image_url(self):
+        return cover_image_url(self)
+
     # Свойство is_recurring проверяет, является ли мероприятие повторяющимся.
     @property
     def is_recurring(self):
@@ -468,6 +665,10 @@ class NPSResponse(models.Model):
         ('price', 'Цена'),
         ('cleanliness', 'Чистота'),
     ]
+    # Минимальная оценка "промоутера" (9-10).
+    PROMOTER_MIN_SCORE = 9
+    # Максимальная оценка "детрактора" (0-6).
+    DETRACTOR_MAX_SCORE = 6
 
     # Связь один-к-одному с отзывом, удаление отзыва удаляет ответ NPS.
     review = models.OneToOneField(Review, on_delete=models.CASCADE, related_name='nps')
@@ -478,6 +679,36 @@ class NPSResponse(models.Model):
     # Дата создания ответа, устанавливается автоматически.
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # Метакласс Meta задаёт покрывающий индекс для NPS-метрик: счётчики по окнам дат и оценкам
+    # для отзывов заведения читаются из индекса, без обращения к строкам таблицы (index-only scan в PostgreSQL).
+    # Отдельные индексы по created_at и score не заведены: все запросы выбирают ответы по отзывам
+    # заведения, а даты и оценки проверяются в условной агрегации (COUNT ... FILTER), не в WHERE,
+    # поэтому одиночные индексы планировщик не использует (см. explain_hot_queries --only nps).
+    class Meta:
+        indexes = [
+            models.Index(fields=['review', 'created_at', 'score'], name='nps_review_date_score_idx'),
+        ]
+
+    # Метод save переопределяет сохранение, чтобы поддерживать NPS-счётчики заведения.
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            # Оценка и заведение, с которыми ответ был учтён до сохранения.
+            previous = None
+            if not self._state.adding:
+                previous = NPSResponse.objects.filter(pk=self.pk).values('score', 'review__place_id').first()
+            super().save(*args, **kwargs)
+
+            deltas = nps_counter_deltas(self.score)
+            place_id = self.review.place_id
+            if previous:
+                old_deltas = nps_counter_deltas(previous['score'], -1)
+                if previous['review__place_id'] == place_id:
+                    # То же заведение: применяем только разницу (при неизменной оценке — ничего).
+                    deltas = {name: deltas[name] + old_deltas[name] for name in deltas}
+                else:
+                    Place.apply_counter_delta(previous['review__place_id'], **old_deltas)
+            Place.apply_counter_delta(place_id, **deltas)
+
     # Метод __str__ возвращает строковое представление объекта (оценка и место).
     def __str__(self):
         return f"NPS {self.score} для {self.review.place}"
@@ -492,4 +723,149 @@ class NPSTag(models.Model):
 
     # Метод __str__ возвращает строковое представление объекта (метка).
     def __str__(self):
-        return self.label
\ No newline at end of file
+        return self.label
+
+
+# Класс RatingQueueEntry — очередь ("грязное" множество) сущностей, рейтинг которых нужно пересчитать.
+# Каждая сущность хранится не более одного раза, поэтому частые изменения схлопываются в один пересчёт.
+class RatingQueueEntry(models.Model):
+    # Константа KIND_CHOICES — виды сущностей в очереди.
+    KIND_PLACE = 'place'
+    KIND_GOURMAND = 'gourmand'
+    KIND_CHOICES = (
+        (KIND_PLACE, 'Заведение'),
+        (KIND_GOURMAND, 'Гурман'),
+    )
+    # Вид сущности.
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    # ID сущности: Place.id для заведений, User.id для гурманов.
+    object_id = models.PositiveBigIntegerField()
+    # Время постановки в очередь.
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Время, когда запись забрал обработчик; запись удаляется только после пересчёта (см. landing/ratings.py).
+    claimed_at = models.DateTimeField(null=True, blank=True)
+
+    # Метакласс Meta задаёт уникальность пары (вид, id) — это и делает очередь множеством.
+    class Meta:
+        unique_together = ('kind', 'object_id')
+
+    # Метод mark ставит заведения и гурманов в очередь. Уже стоящая запись снова становится свободной:
+    # если её пересчёт уже идёт, он мог прочитать данные до этого изменения.
+    @classmethod
+    def mark(cls, place_ids=(), gourmand_ids=()):
+        entries = [cls(kind=cls.KIND_PLACE, object_id=place_id) for place_id in set(place_ids) if place_id]
+        entries += [cls(kind=cls.KIND_GOURMAND, object_id=user_id) for user_id in set(gourmand_ids) if user_id]
+        if entries:
+            cls.objects.bulk_create(
+                entries, update_conflicts=True, unique_fields=['kind', 'object_id'], update_fields=['claimed_at'],
+            )
+
+    # Метод __str__ возвращает строковое представление записи очереди.
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.object_id}"
+
+
+# Класс OwnerDashboardSnapshot — готовые цифры профиля владельца для одного заведения и периода анализа.
+# Снимок пересобирается командой refresh_owner_dashboards или при открытии профиля, если данные заведения
+# изменились и снимок старше допустимого (см. landing/dashboards.py).
+class OwnerDashboardSnapshot(models.Model):
+    # Константа PERIOD_CHOICES — периоды анализа отзывов в профиле владельца.
+    PERIOD_CHOICES = (
+        ('1m', '1 месяц'),
+        ('3m', '3 месяца'),
+        ('6m', '6 месяцев'),
+    )
+    # Длительность периодов в днях.
+    PERIOD_DAYS = {'1m': 30, '3m': 90, '6m': 180}
+
+    # Связь с заведением, удаление заведения удаляет его снимки.
+    place = models.ForeignKey(Place, on_delete=models.CASCADE, related_name='dashboard_snapshots')
+    # Период анализа отзывов.
+    period = models.CharField(max_length=2, choices=PERIOD_CHOICES)
+    # Посчитанные метрики (NPS, теги, динамика) в виде, который ожидает шаблон профиля.
+    data = models.JSONField(default=dict)
+    # Версия данных заведения (см. landing/cache.py), для которой посчитан снимок.
+    place_version = models.CharField(max_length=64, blank=True)
+    # Время расчёта снимка.
+    computed_at = models.DateTimeField()
+
+    # Метакласс Meta задаёт уникальность пары (заведение, период).
+    class Meta:
+        unique_together = ('place', 'period')
+
+    # Метод __str__ возвращает строковое представление снимка.
+    def __str__(self):
+        return f"{self.place} ({self.period})"
+
+
+# Класс ReviewSummary — сохранённая сводка отзывов заведения за период, полученная от языковой модели.
+# Ключ — заведение, период и хэш подготовленного текста отзывов: одинаковый набор отзывов
+# не отправляется в модель повторно (см. landing/summaries.py).
+class ReviewSummary(models.Model):
+    # Связь с заведением, удаление заведения удаляет его сводки.
+    place = models.ForeignKey(Place, on_delete=models.CASCADE, related_name='review_summaries')
+    # Период анализа отзывов.
+    period = models.CharField(max_length=2, choices=OwnerDashboardSnapshot.PERIOD_CHOICES)
+    # SHA-256 текста отзывов, по которому составлена сводка.
+    content_hash = models.CharField(max_length=64)
+    # Текст сводки.
+    summary = models.TextField()
+    # Дата создания сводки, устанавливается автоматически.
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    # Метакласс Meta задаёт уникальность тройки (заведение, период, хэш) и порядок от новых к старым.
+    class Meta:
+        unique_together = ('place', 'period', 'content_hash')
+        ordering = ['-created_at']
+
+    # Метод __str__ возвращает строковое представление сводки.
+    def __str__(self):
+        return f"{self.place} ({self.period}, {self.created_at:%d.%m.%Y})"
+
+
+# Класс SummaryJob — задание на сводку отзывов заведения за период для фонового обработчика.
+# Для пары (заведение, период) одновременно существует не больше одного ожидающего
+# или выполняющегося задания, повторные запросы владельца получают его же (см. landing/jobs.py).
+class SummaryJob(models.Model):
+    # Константа STATUS_CHOICES — состояния задания.
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = (
+        (STATUS_QUEUED, 'В очереди'),
+        (STATUS_RUNNING, 'Выполняется'),
+        (STATUS_DONE, 'Готово'),
+        (STATUS_FAILED, 'Ошибка'),
+    )
+    # Незавершённые состояния.
+    ACTIVE_STATUSES = (STATUS_QUEUED, STATUS_RUNNING)
+
+    # Связь с заведением, удаление заведения удаляет его задания.
+    place = models.ForeignKey(Place, on_delete=models.CASCADE, related_name='summary_jobs')
+    # Период анализа отзывов.
+    period = models.CharField(max_length=2, choices=OwnerDashboardSnapshot.PERIOD_CHOICES)
+    # Состояние задания.
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_QUEUED, db_index=True)
+    # Полученная сводка, заполняется после успешного выполнения.
+    summary = models.ForeignKey(ReviewSummary, on_delete=models.SET_NULL, null=True, blank=True, related_name='jobs')
+    # Текст ошибки, если задание не выполнено.
+    error = models.TextField(blank=True)
+    # Время постановки в очередь, начала и окончания выполнения.
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    # Метакласс Meta запрещает второе незавершённое задание для той же пары (заведение, период).
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['place', 'period'],
+                condition=models.Q(status__in=('queued', 'running')),
+                name='unique_active_summary_job',
+            ),
+        ]
+
+    # Метод __str__ возвращает строковое представление задания.
+    def __str__(self):
+        return f"{self.place} ({self.period}): {self.get_status_display()}"
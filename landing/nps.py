@@ -0,0 +1,247 @@
+# nps.py
+# Этот файл содержит сервис NPS-метрик (Net Promoter Score) по заведениям.
+# Вместо отдельного count() на каждый показатель и каждое заведение все цифры
+# считаются двумя сгруппированными запросами с условной агрегацией (Count(filter=Q(...))).
+# Сервис используют и профиль владельца, и страница заведения.
+
+# Импортируем dataclass и field для описания объектов с результатами.
+from dataclasses import dataclass, field
+
+# Импортируем relativedelta для вычисления начала прошлого месяца.
+from dateutil.relativedelta import relativedelta
+# Импортируем Count и Q для условной агрегации в ORM.
+from django.db.models import Count, Q
+# Импортируем утилиты для работы с часовыми поясами.
+from django.utils import timezone
+
+# Импортируем модель ответов NPS.
+from landing.models import NPSResponse
+# Импортируем версионированный кэш: метрики заведения сбрасываются при записи его отзывов и ответов NPS.
+from landing import cache as versioned_cache
+
+# Минимальная оценка "промоутера" (9-10).
+PROMOTER_MIN_SCORE = NPSResponse.PROMOTER_MIN_SCORE
+# Максимальная оценка "детрактора" (0-6).
+DETRACTOR_MAX_SCORE = NPSResponse.DETRACTOR_MAX_SCORE
+# Количество тегов в топе за всё время.
+TOP_TAGS_LIMIT = 3
+
+
+def calculate_nps(promoters, detractors, total, default=0):
+    """
+    Вычисляет NPS: процент промоутеров минус процент детракторов.
+
+    Args:
+        promoters: Количество промоутеров.
+        detractors: Количество детракторов.
+        total: Общее количество ответов.
+        default: Значение, которое возвращается, если ответов нет.
+
+    Returns:
+        NPS в процентах или default, если total равен 0.
+    """
+    if total > 0:
+        return (promoters / total * 100) - (detractors / total * 100)
+    return default
+
+
+@dataclass(frozen=True)
+class Period:
+    """
+    Временное окно для подсчёта метрик: [start, end], любая граница может отсутствовать.
+    """
+    start: object = None
+    end: object = None
+
+    # Условие фильтрации ответов NPS по окну.
+    def as_q(self):
+        q = Q()
+        if self.start is not None:
+            q &= Q(created_at__gte=self.start)
+        if self.end is not None:
+            q &= Q(created_at__lte=self.end)
+        return q
+
+
+def month_periods(today=None):
+    """
+    Возвращает окна текущего и прошлого календарного месяца.
+
+    Args:
+        today: Текущий момент (по умолчанию timezone.now()).
+
+    Returns:
+        Словарь {'current': Period, 'last': Period}.
+    """
+    today = today or timezone.now()
+    current_month_start = today.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    last_month_start = current_month_start - relativedelta(months=1)
+    # Конец прошлого месяца — за микросекунду до начала текущего.
+    last_month_end = current_month_start - timezone.timedelta(microseconds=1)
+    return {
+        'current': Period(start=current_month_start),
+        'last': Period(start=last_month_start, end=last_month_end),
+    }
+
+
+@dataclass
+class NPSCounts:
+    """
+    Счётчики ответов NPS за одно окно.
+    """
+    total: int = 0
+    promoters: int = 0
+    detractors: int = 0
+
+    # NPS за окно (None, если ответов нет).
+    @property
+    def nps(self):
+        return calculate_nps(self.promoters, self.detractors, self.total, default=None)
+
+    # Счётчики за всё время из поддерживаемых полей заведения (без запросов к ответам NPS).
+    @classmethod
+    def for_place(cls, place):
+        return cls(place.nps_count, place.promoter_count, place.detractor_count)
+
+
+@dataclass
+class PlaceMetrics:
+    """
+    NPS-метрики одного заведения: за всё время и по запрошенным окнам.
+    """
+    place_id: int
+    # Счётчики за всё время.
+    overall: NPSCounts = field(default_factory=NPSCounts)
+    # Упоминания тегов за всё время: {метка тега: количество}.
+    tags: dict = field(default_factory=dict)
+    # Счётчики по окнам: {имя окна: NPSCounts}.
+    periods: dict = field(default_factory=dict)
+    # Упоминания тегов по окнам: {имя окна: {метка тега: количество}}.
+    period_tags: dict = field(default_factory=dict)
+
+    # Общее количество ответов.
+    @property
+    def total(self):
+        return self.overall.total
+
+    # Общий NPS (0, если ответов нет).
+    @property
+    def nps(self):
+        return self.overall.nps or 0
+
+    # NPS за окно с именем name (None, если ответов нет).
+    def period_nps(self, name):
+        return self.periods[name].nps
+
+    # Топ тегов за всё время в формате, который ожидают шаблоны (tags__label / tag_count).
+    @property
+    def top_tags(self):
+        ordered = sorted(self.tags.items(), key=lambda item: (-item[1], item[0]))[:TOP_TAGS_LIMIT]
+        return [{'tags__label': label, 'tag_count': count} for label, count in ordered]
+
+    # Динамика тегов между двумя окнами; поиск по словарю вместо линейного перебора списков.
+    def tag_dynamics(self, current='current', last='last'):
+        current_tags = self.period_tags.get(current, {})
+        last_tags = self.period_tags.get(last, {})
+        dynamics = {}
+        for label in current_tags.keys() | last_tags.keys():
+            current_count = current_tags.get(label, 0)
+            last_count = last_tags.get(label, 0)
+            dynamics[label] = {
+                'current': current_count,
+                'last': last_count,
+                'change': current_count - last_count,
+            }
+        return dynamics
+
+
+def metrics_for_places(place_ids, periods):
+    """
+    Считает NPS-метрики сразу для набора заведений.
+
+    Выполняет ровно два запроса: один группирует ответы по заведению,
+    второй — по заведению и тегу. Окна из periods считаются условной
+    агрегацией внутри тех же запросов.
+
+    Args:
+        place_ids: Идентификаторы заведений.
+        periods: Словарь {имя окна: Period}, например результат month_periods().
+
+    Returns:
+        Словарь {place_id: PlaceMetrics}; для заведений без ответов — объект с нулями.
+    """
+    place_ids = list(place_ids)
+    results = {
+        place_id: PlaceMetrics(
+            place_id=place_id,
+            periods={name: NPSCounts() for name in periods},
+            period_tags={name: {} for name in periods},
+        )
+        for place_id in place_ids
+    }
+    if not place_ids:
+        return results
+
+    promoter_q = Q(score__gte=PROMOTER_MIN_SCORE)
+    detractor_q = Q(score__lte=DETRACTOR_MAX_SCORE)
+    responses = NPSResponse.objects.filter(review__place_id__in=place_ids)
+
+    # Первый запрос: счётчики по заведениям за всё время и по каждому окну.
+    counters = {
+        'total': Count('id'),
+        'promoters': Count('id', filter=promoter_q),
+        'detractors': Count('id', filter=detractor_q),
+    }
+    for name, period in periods.items():
+        period_q = period.as_q()
+        counters[f'{name}__total'] = Count('id', filter=period_q)
+        counters[f'{name}__promoters'] = Count('id', filter=period_q & promoter_q)
+        counters[f'{name}__detractors'] = Count('id', filter=period_q & detractor_q)
+    for row in responses.values('review__place_id').annotate(**counters).order_by():
+        metrics = results[row['review__place_id']]
+        metrics.overall = NPSCounts(row['total'], row['promoters'], row['detractors'])
+        for name in periods:
+            metrics.periods[name] = NPSCounts(
+                row[f'{name}__total'], row[f'{name}__promoters'], row[f'{name}__detractors']
+            )
+
+    # Второй запрос: упоминания тегов по заведениям за всё время и по каждому окну.
+    tag_counters = {'total': Count('id')}
+    for name, period in periods.items():
+        tag_counters[f'{name}__total'] = Count('id', filter=period.as_q())
+    tag_rows = responses.filter(tags__isnull=False).values(
+        'review__place_id', 'tags__label'
+    ).annotate(**tag_counters).order_by()
+    for row in tag_rows:
+        metrics = results[row['review__place_id']]
+        label = row['tags__label']
+        metrics.tags[label] = row['total']
+        for name in periods:
+            if row[f'{name}__total']:
+                metrics.period_tags[name][label] = row[f'{name}__total']
+
+    return results
+
+
+def cached_metrics_for_places(place_ids, periods):
+    """
+    То же, что metrics_for_places, но через версионированный кэш заведений.
+
+    Досчитываются только заведения, чьих метрик нет в кэше для текущей версии
+    и текущих окон; запись отзыва или ответа NPS сбрасывает версию заведения.
+
+    Args:
+        place_ids: Идентификаторы заведений.
+        periods: Словарь {имя окна: Period}, например результат month_periods().
+
+    Returns:
+        Словарь {place_id: PlaceMetrics}.
+    """
+    # Окна входят в ключ, поэтому со сменой месяца метрики считаются заново.
+    name = 'nps-metrics:' + ','.join(
+        f"{period_name}={period.start and period.start.isoformat()}~{period.end and period.end.isoformat()}"
+        for period_name, period in sorted(periods.items())
+    )
+    return versioned_cache.get_many(
+        versioned_cache.PLACE, place_ids, name, lambda missing: metrics_for_places(missing, periods)
+    )
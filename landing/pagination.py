@@ -0,0 +1,349 @@
+# pagination.py
+# Этот файл содержит курсорную (keyset) пагинацию списков заведений, отзывов, мероприятий и гурманов.
+# Paginator выполняет COUNT(*) и OFFSET: глубокие страницы, которые обходят боты через ?page=,
+# читают и отбрасывают все предыдущие строки. Курсор хранит значения столбцов сортировки
+# последней строки страницы, и следующая страница читается условием «после этой строки»
+# по индексу — одинаково быстро на любой глубине. Общее число объектов (для надписи
+# «≈ N») берётся из кэша и пересчитывается при изменении набора сущностей.
+
+# Импортируем hashlib для короткого ключа кэша по параметрам фильтра.
+import hashlib
+# Импортируем copy для варианта порядка без NULL в первом столбце.
+from copy import copy
+# Импортируем Decimal и datetime для сериализации значений сортировки в курсоре.
+from datetime import date, datetime
+from decimal import Decimal
+
+# Импортируем кэш Django для приблизительного числа объектов.
+from django.core.cache import cache
+# Импортируем signing: курсор подписан, клиент не может подставить произвольные значения.
+from django.core import signing
+from django.db.models import F, Q
+
+# Версии наборов сущностей: кэшированное число объектов устаревает при их изменении.
+from landing.cache import collection_versions
+
+# Соль подписи курсоров.
+CURSOR_SALT = 'landing.pagination.cursor'
+# Направления чтения от курсора: следующая и предыдущая страницы.
+NEXT = 'n'
+PREVIOUS = 'p'
+# Время жизни кэшированного числа объектов (секунды); после изменений набора оно пересчитывается раньше.
+COUNT_TIMEOUT = 10 * 60
+# Префикс ключей кэшированного числа объектов.
+COUNT_PREFIX = 'count'
+
+
+class InvalidCursor(ValueError):
+    """
+    Курсор повреждён, подписан другим ключом или выдан для другой сортировки.
+    """
+
+
+def _resolve_field(model, path):
+    # Поле модели по пути с '__' (например, user__date_joined).
+    *relations, name = path.split('__')
+    for relation in relations:
+        model = model._meta.get_field(relation).related_model
+    return model._meta.get_field(name)
+
+
+def _value(obj, path):
+    # Значение столбца сортировки у объекта (связанные объекты уже загружены select_related).
+    for name in path.split('__'):
+        obj = getattr(obj, name)
+    return obj
+
+
+def _dump_value(value):
+    # JSON-представление значения для курсора; обратно приводится полем модели (to_python).
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+class Ordering:
+    """
+    Порядок сортировки списка для курсорной пагинации.
+
+    Последний столбец должен быть уникальным (обычно id): он однозначно задаёт
+    место строки среди строк с одинаковыми значениями остальных столбцов.
+    Пустые значения (NULL) всегда идут в конце, в любом направлении.
+    """
+
+    def __init__(self, model, *fields):
+        """
+        Args:
+            model: Модель списка.
+            fields: Столбцы сортировки как в order_by ('-rating', 'id').
+        """
+        self.fields = fields
+        self.columns = []  # Кортежи (путь, по убыванию, допускает NULL, поле модели).
+        for field in fields:
+            path = field.lstrip('-')
+            model_field = _resolve_field(model, path)
+            self.columns.append((path, field.startswith('-'), model_field.null, model_field))
+
+    def order_by(self, direction=NEXT):
+        # Выражения сортировки; при чтении назад направления меняются, а NULL переходят в начало.
+        expressions = []
+        for path, descending, nullable, _ in self.columns:
+            if direction == PREVIOUS:
+                descending = not descending
+            nulls = {'nulls_first': True} if direction == PREVIOUS else {'nulls_last': True}
+            expression = F(path).desc if descending else F(path).asc
+            expressions.append(expression(**nulls) if nullable else expression())
+        return expressions
+
+    def without_nulls(self):
+        # Тот же порядок для строк с непустым первым столбцом: в условии курсора нет ветви IS NULL,
+        # и по первому столбцу добавляется ограничение диапазона (см. seek).
+        ordering = copy(self)
+        path, descending, _, model_field = self.columns[0]
+        ordering.columns = [(path, descending, False, model_field)] + self.columns[1:]
+        return ordering
+
+    def values(self, obj):
+        # Значения столбцов сортировки у объекта.
+        return [_value(obj, path) for path, *_ in self.columns]
+
+    def seek(self, values, direction=NEXT):
+        """
+        Условие «строки после (или до) строки со значениями values» в этом порядке.
+
+        Для столбцов (a, b, id) это (a > x) OR (a = x AND b > y) OR (a = x AND b = y AND id > z)
+        с учётом направления каждого столбца и NULL в конце.
+        """
+        condition = None
+        equal = Q()
+        for (path, descending, nullable, _), value in zip(self.columns, values):
+            step = self._beyond(path, value, descending, nullable) if direction == NEXT \
+                else self._before(path, value, descending, nullable)
+            if step is not None:
+                condition = equal & step if condition is None else condition | equal & step
+            equal &= Q(**{f'{path}__isnull': True}) if value is None else Q(**{path: value})
+        if condition is None:
+            return Q(pk__in=[])
+        # Ограничение по первому столбцу дублирует условие, но без OR: по нему СУБД читает диапазон
+        # индекса от курсора, а не просматривает индекс с начала, отбрасывая строки до курсора.
+        path, descending, nullable, _ = self.columns[0]
+        if values[0] is not None and not nullable:
+            ascending_scan = descending != (direction == NEXT)
+            condition &= Q(**{f'{path}__{"gte" if ascending_scan else "lte"}': values[0]})
+        return condition
+
+    @staticmethod
+    def _beyond(path, value, descending, nullable):
+        # Строки, идущие после value по одному столбцу; после NULL ничего нет (NULL — в конце).
+        if value is None:
+            return None
+        step = Q(**{f'{path}__{"lt" if descending else "gt"}': value})
+        return step | Q(**{f'{path}__isnull': True}) if nullable else step
+
+    @staticmethod
+    def _before(path, value, descending, nullable):
+        # Строки, идущие до value по одному столбцу; до NULL идут все непустые значения.
+        if value is None:
+            return Q(**{f'{path}__isnull': False})
+        return Q(**{f'{path}__{"gt" if descending else "lt"}': value})
+
+    def encode(self, obj, direction):
+        # Подписанный курсор на место объекта в списке; без объекта — на конец списка (последняя страница).
+        values = None if obj is None else [_dump_value(value) for value in self.values(obj)]
+        return signing.dumps({'o': self.fields, 'd': direction, 'v': values}, salt=CURSOR_SALT, compress=True)
+
+    def decode(self, cursor):
+        # Направление и значения столбцов из курсора; InvalidCursor, если курсор не подходит.
+        try:
+            payload = signing.loads(cursor, salt=CURSOR_SALT)
+        except signing.BadSignature as exc:
+            raise InvalidCursor('Неверная подпись курсора') from exc
+        if not isinstance(payload, dict) or payload.get('o') != list(self.fields) or payload.get('d') not in (NEXT, PREVIOUS):
+            raise InvalidCursor('Курсор выдан для другого списка или сортировки')
+        if payload.get('v') is None:
+            if payload['d'] != PREVIOUS:
+                raise InvalidCursor('Курсор без значений указывает только на последнюю страницу')
+            return PREVIOUS, None
+        if not isinstance(payload['v'], list) or len(payload['v']) != len(self.columns):
+            raise InvalidCursor('Курсор выдан для другого списка или сортировки')
+        try:
+            values = [
+                None if raw is None else model_field.to_python(raw)
+                for (*_, model_field), raw in zip(self.columns, payload['v'])
+            ]
+        except Exception as exc:
+            raise InvalidCursor('Неверные значения курсора') from exc
+        return payload['d'], values
+
+
+class CursorPage:
+    """
+    Страница списка, прочитанная от курсора.
+
+    Поддерживает перебор и len(), как страница Paginator; вместо номеров страниц —
+    курсоры соседних страниц и приблизительное общее число объектов.
+    """
+
+    def __init__(self, object_list, next_cursor, previous_cursor, last_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.last_cursor = last_cursor
+        self.count = None  # Приблизительное общее число объектов (заполняет вызывающий код).
+        self.first_query = self.previous_query = self.next_query = self.last_query = None
+
+    def set_links(self, params):
+        """
+        Заполняет строки запроса ссылок на первую, соседние и последнюю страницы.
+
+        Args:
+            params: Параметры текущего запроса (request.GET); фильтры и сортировка сохраняются.
+        """
+        def query(cursor):
+            link = params.copy()
+            for name in ('cursor', 'page'):
+                link.pop(name, None)
+            if cursor:
+                link['cursor'] = cursor
+            return f"?{link.urlencode()}"
+
+        if self.has_previous:
+            self.first_query = query(None)
+            self.previous_query = query(self.previous_cursor)
+        if self.has_next:
+            self.next_query = query(self.next_cursor)
+            self.last_query = query(self.last_cursor)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+
+def page_queryset(queryset, ordering, direction=NEXT, values=None):
+    """
+    Возвращает выборку строк после (или до) курсора в порядке чтения, без ограничения числа строк.
+
+    Args:
+        queryset: Выборка списка.
+        ordering: Порядок сортировки (Ordering).
+        direction: Направление чтения (NEXT или PREVIOUS).
+        values: Значения столбцов сортировки строки курсора; None — от начала (или конца) списка.
+
+    Returns:
+        Упорядоченная выборка.
+    """
+    queryset = queryset.order_by(*ordering.order_by(direction))
+    if values is not None:
+        queryset = queryset.filter(ordering.seek(values, direction))
+    return queryset
+
+
+def read_rows(queryset, ordering, limit, direction=NEXT, values=None):
+    """
+    Читает до limit строк после (или до) курсора в порядке чтения.
+
+    Если первый столбец сортировки допускает NULL, строки после непустого значения читаются двумя
+    запросами: сначала непустые значения диапазоном индекса, затем, если строк не хватило, строки с NULL.
+    Одно условие «больше значения или NULL» СУБД читает не диапазоном индекса, а объединением (OR) и сортировкой.
+
+    Args:
+        queryset: Выборка списка.
+        ordering: Порядок сортировки (Ordering).
+        limit: Наибольшее число строк.
+        direction: Направление чтения (NEXT или PREVIOUS).
+        values: Значения столбцов сортировки строки курсора; None — от начала (или конца) списка.
+
+    Returns:
+        Список строк.
+    """
+    path, _, nullable, _ = ordering.columns[0]
+    # Назад от непустого значения строк с NULL нет (они в конце списка), от NULL — условие уже без OR по NULL.
+    if not nullable or direction != NEXT or values is None or values[0] is None:
+        return list(page_queryset(queryset, ordering, direction, values)[:limit])
+    rows = list(page_queryset(queryset.filter(**{f'{path}__isnull': False}), ordering.without_nulls(), direction, values)[:limit])
+    if len(rows) < limit:
+        rows.extend(page_queryset(queryset.filter(**{f'{path}__isnull': True}), ordering)[:limit - len(rows)])
+    return rows
+
+
+def paginate(queryset, ordering, cursor=None, per_page=12):
+    """
+    Читает одну страницу списка от курсора (без COUNT и OFFSET).
+
+    Args:
+        queryset: Выборка списка (фильтры применены, сортировка будет заменена).
+        ordering: Порядок сортировки (Ordering).
+        cursor: Курсор из next_cursor/previous_cursor предыдущей страницы; None — первая страница.
+        per_page: Число объектов на странице.
+
+    Returns:
+        Страница CursorPage (без общего числа объектов).
+
+    Raises:
+        InvalidCursor: Курсор повреждён или выдан для другой сортировки.
+    """
+    direction, values = ordering.decode(cursor) if cursor else (NEXT, None)
+    # Лишняя строка показывает, есть ли объекты дальше в направлении чтения.
+    rows = read_rows(queryset, ordering, per_page + 1, direction, values)
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+    if direction == PREVIOUS:
+        if not rows and values is not None:
+            # Перед курсором объектов не осталось (их удалили) — показываем первую страницу.
+            return paginate(queryset, ordering, None, per_page)
+        rows.reverse()
+        # Страница прочитана назад: после неё объекты есть, если чтение началось не с конца списка.
+        has_previous, has_next = more, values is not None
+    else:
+        has_previous, has_next = values is not None, more
+    return CursorPage(
+        rows,
+        next_cursor=ordering.encode(rows[-1], NEXT) if rows and has_next else None,
+        previous_cursor=ordering.encode(rows[0], PREVIOUS) if rows and has_previous else None,
+        last_cursor=ordering.encode(None, PREVIOUS),
+    )
+
+
+def cached_count(queryset, kinds, *vary_on, timeout=COUNT_TIMEOUT):
+    """
+    Возвращает число объектов выборки из кэша (приблизительное для интерфейса).
+
+    Значение пересчитывается, когда меняется версия набора любой из сущностей kinds,
+    и не реже чем раз в timeout секунд.
+
+    Args:
+        queryset: Выборка списка.
+        kinds: Виды сущностей, от которых зависит число (PLACE, REVIEW, EVENT, GOURMAND).
+        vary_on: Параметры фильтра выборки (например, слаг заведения или поисковый запрос).
+        timeout: Время жизни значения в кэше (секунды).
+
+    Returns:
+        Число объектов.
+    """
+    versions = collection_versions(kinds)
+    source = repr((queryset.model._meta.label, sorted(versions.items()), vary_on))
+    key = f"{COUNT_PREFIX}:{hashlib.md5(source.encode()).hexdigest()}"
+    count = cache.get(key)
+    if count is None:
+        count = queryset.order_by().count()
+        cache.set(key, count, timeout)
+    return count
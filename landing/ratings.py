@@ -0,0 +1,334 @@
+# ratings.py
+# Этот файл содержит пересчёт рейтингов заведений и гурманов.
+# В обычной работе рейтинг заведения обновляется на разницу вкладов при сохранении
+# или удалении отзыва (см. Review.update_place_rating и Place.apply_rating_delta);
+# здесь суммы строятся с нуля, чтобы восстановить их или проверить расхождение (drift).
+# Здесь же обрабатывается очередь пересчёта (RatingQueueEntry): рейтинги гурманов
+# и каскадное обновление весов их отзывов во всех заведениях.
+
+# Импортируем time для замера длительности массового пересчёта.
+import time
+# Импортируем timedelta для срока аренды записей очереди.
+from datetime import timedelta
+# Импортируем dataclass для описания найденного расхождения и итогов обработки очереди.
+from dataclasses import dataclass, field
+# Импортируем Decimal для сравнения рейтингов с точностью хранения в базе.
+from decimal import Decimal
+
+# Импортируем transaction для атомарной записи исправлений.
+from django.db import transaction
+# Импортируем Q для выборки свободных записей очереди, Sum для сгруппированного подсчёта реакций на отзывы.
+from django.db.models import Q, Sum
+# Импортируем timezone для отметки времени захвата записей очереди.
+from django.utils import timezone
+
+# Импортируем версионированный кэш для сброса производных данных исправленных сущностей.
+from landing import cache as versioned_cache
+# Импортируем подсказки поиска: рейтинг задаёт порядок подсказок заведений и гурманов.
+from landing import suggest
+# Импортируем модели и общие функции расчёта веса и рейтинга.
+from landing.models import (
+    Place, Review, GourmandProfile, RatingQueueEntry,
+    review_weight, rating_from_totals, gourmand_rating_from_votes,
+)
+
+# Допустимая погрешность накопленных сумм (float накапливает ошибку округления).
+DRIFT_TOLERANCE = 1e-6
+# Размер пачки при чтении отзывов и массовом обновлении.
+BATCH_SIZE = 2000
+# Число заведений в одной транзакции исправления (вместе с ними блокируются их отзывы).
+PLACE_BATCH_SIZE = 200
+# Срок, после которого записи очереди, забранные обработчиком, снова доступны другим.
+RATING_QUEUE_LEASE = timedelta(minutes=10)
+
+
+@dataclass
+class PlaceRatingDrift:
+    """
+    Расхождение между сохранёнными и пересчитанными суммами рейтинга заведения.
+    """
+    place_id: int
+    stored_weighted_sum: float
+    stored_weight_total: float
+    expected_weighted_sum: float
+    expected_weight_total: float
+    stored_rating: object
+    expected_rating: object
+
+
+def rebuild_place_ratings(place_ids=None, fix=True):
+    """
+    Пересчитывает вклады отзывов и суммы рейтинга заведений с нуля.
+
+    Отзывы читаются потоковым запросом вместе с рейтингом автора, изменения
+    записываются через bulk_update. При исправлении заведения обрабатываются
+    пачками по id, каждая в своей транзакции.
+
+    Args:
+        place_ids: Идентификаторы заведений (по умолчанию — все заведения).
+        fix: Если True, расхождения записываются в базу; иначе только возвращаются.
+
+    Returns:
+        Список PlaceRatingDrift для заведений, у которых суммы или рейтинг разошлись.
+    """
+    places = Place.objects.all()
+    if place_ids is not None:
+        places = places.filter(id__in=place_ids)
+
+    if not fix:
+        reviews = Review.objects.all()
+        if place_ids is not None:
+            reviews = reviews.filter(place_id__in=place_ids)
+        return _place_rating_drifts(places, reviews)[0]
+
+    drifts = []
+    last_id = 0
+    while True:
+        batch_ids = list(places.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:PLACE_BATCH_SIZE])
+        if not batch_ids:
+            return drifts
+        drifts += _fix_place_ratings(batch_ids)
+        last_id = batch_ids[-1]
+
+
+def _fix_place_ratings(place_ids):
+    # Пересчитывает и записывает суммы пачки заведений в одной транзакции; возвращает расхождения.
+    places = Place.objects.filter(id__in=place_ids)
+    reviews = Review.objects.filter(place_id__in=place_ids)
+    with transaction.atomic():
+        # Суммы записываются целиком, поэтому чтение и запись идут под блокировкой строк:
+        # сдвиг apply_rating_delta из параллельной транзакции дождётся фиксации и ляжет поверх,
+        # а не будет затёрт. Блокируется только пачка заведений и их отзывы, так что остальные
+        # отзывы и голоса не ждут конца полного пересчёта. Порядок блокировок — отзывы,
+        # затем заведения, как в Review.save.
+        # На SQLite select_for_update ничего не делает: запись и так сериализует BEGIN IMMEDIATE.
+        list(reviews.select_for_update().order_by('id').values_list('id', flat=True))
+        list(places.select_for_update().order_by('id').values_list('id', flat=True))
+        drifts, changed_reviews = _place_rating_drifts(places, reviews)
+        Review.objects.bulk_update(changed_reviews, ['rating_weight', 'rating_weighted'], batch_size=BATCH_SIZE)
+        Place.objects.bulk_update(
+            [
+                Place(
+                    id=drift.place_id,
+                    rating_weighted_sum=drift.expected_weighted_sum,
+                    rating_weight_total=drift.expected_weight_total,
+                    rating=drift.expected_rating,
+                )
+                for drift in drifts
+            ],
+            ['rating_weighted_sum', 'rating_weight_total', 'rating'],
+            batch_size=BATCH_SIZE,
+        )
+        versioned_cache.invalidate(versioned_cache.PLACE, *(drift.place_id for drift in drifts))
+        suggest.record_weight_changes(
+            suggest.PLACE, [drift.place_id for drift in drifts if drift.stored_rating != drift.expected_rating],
+        )
+    return drifts
+
+
+def _place_rating_drifts(places, reviews):
+    # Пересчитывает суммы заведений по отзывам: (расхождения, отзывы с изменившимся вкладом).
+    # Пересчитанные суммы по заведениям: {place_id: [weighted_sum, weight_total]}.
+    expected = {place_id: [0.0, 0.0] for place_id in places.values_list('id', flat=True)}
+    # Отзывы, у которых сохранённый вклад отличается от пересчитанного.
+    changed_reviews = []
+    rows = reviews.values_list(
+        'id', 'place_id', 'gourmand_rating', 'positive_rating', 'negative_rating',
+        'gourmand__gourmand_profile__rating', 'rating_weight', 'rating_weighted',
+    ).order_by().iterator(chunk_size=BATCH_SIZE)
+    for review_id, place_id, gourmand_rating, positive, negative, author_rating, stored_weight, stored_weighted in rows:
+        weight = 0.0
+        if gourmand_rating is not None:
+            weight = review_weight(author_rating, positive, negative)
+        weighted = weight * gourmand_rating if weight else 0.0
+        totals = expected.setdefault(place_id, [0.0, 0.0])
+        totals[0] += weighted
+        totals[1] += weight
+        if abs(weight - stored_weight) > DRIFT_TOLERANCE or abs(weighted - stored_weighted) > DRIFT_TOLERANCE:
+            changed_reviews.append(Review(id=review_id, rating_weight=weight, rating_weighted=weighted))
+
+    drifts = []
+    for place_id, weighted_sum, weight_total, rating in places.values_list(
+        'id', 'rating_weighted_sum', 'rating_weight_total', 'rating'
+    ):
+        expected_sum, expected_total = expected[place_id]
+        expected_rating = rating_from_totals(expected_sum, expected_total)
+        if (abs(weighted_sum - expected_sum) > DRIFT_TOLERANCE
+                or abs(weight_total - expected_total) > DRIFT_TOLERANCE
+                or rating != expected_rating):
+            drifts.append(PlaceRatingDrift(
+                place_id=place_id,
+                stored_weighted_sum=weighted_sum,
+                stored_weight_total=weight_total,
+                expected_weighted_sum=expected_sum,
+                expected_weight_total=expected_total,
+                stored_rating=rating,
+                expected_rating=expected_rating,
+            ))
+    return drifts, changed_reviews
+
+
+@dataclass
+class GourmandRatingResult:
+    """
+    Итоги массового пересчёта рейтингов гурманов.
+    """
+    # Количество проверенных профилей.
+    total: int = 0
+    # Идентификаторы пользователей, у которых рейтинг изменился.
+    changed_user_ids: list = field(default_factory=list)
+    # Длительность пересчёта в секундах.
+    elapsed: float = 0.0
+
+
+def recompute_gourmand_ratings(user_ids=None, fix=True):
+    """
+    Пересчитывает рейтинги гурманов одним сгруппированным запросом.
+
+    Реакции на отзывы суммируются одним GROUP BY по автору отзыва, текущие
+    рейтинги читаются одним запросом, изменившиеся записываются через bulk_update.
+
+    Args:
+        user_ids: Идентификаторы пользователей-гурманов (по умолчанию — все профили).
+        fix: Если True, изменившиеся рейтинги записываются в базу; иначе только возвращаются.
+
+    Returns:
+        GourmandRatingResult с количеством проверенных и изменившихся профилей.
+    """
+    started = time.monotonic()
+    profiles = GourmandProfile.objects.all()
+    reviews = Review.objects.all()
+    if user_ids is not None:
+        profiles = profiles.filter(user_id__in=user_ids)
+        reviews = reviews.filter(gourmand_id__in=user_ids)
+
+    # Суммы реакций по авторам: {user_id: (positive, negative)}.
+    totals = {
+        user_id: (positive or 0, negative or 0)
+        for user_id, positive, negative in reviews.values('gourmand_id').annotate(
+            total_positive=Sum('positive_rating'),
+            total_negative=Sum('negative_rating'),
+        ).values_list('gourmand_id', 'total_positive', 'total_negative').order_by()
+    }
+
+    result = GourmandRatingResult()
+    changed_profiles = []
+    for profile_id, user_id, rating in profiles.values_list('id', 'user_id', 'rating').iterator(chunk_size=BATCH_SIZE):
+        result.total += 1
+        new_rating = gourmand_rating_from_votes(*totals.get(user_id, (0, 0)))
+        if Decimal(rating) != new_rating:
+            changed_profiles.append(GourmandProfile(id=profile_id, rating=new_rating))
+            result.changed_user_ids.append(user_id)
+
+    if fix and changed_profiles:
+        GourmandProfile.objects.bulk_update(changed_profiles, ['rating'], batch_size=BATCH_SIZE)
+        versioned_cache.invalidate(versioned_cache.GOURMAND, *result.changed_user_ids)
+        suggest.record_weight_changes(suggest.GOURMAND, result.changed_user_ids)
+    result.elapsed = time.monotonic() - started
+    return result
+
+
+@dataclass
+class RatingQueueResult:
+    """
+    Итоги обработки одной пачки очереди пересчёта рейтингов.
+    """
+    gourmands: int = 0
+    changed_gourmands: int = 0
+    places: int = 0
+    cascaded_places: int = 0
+
+
+@dataclass
+class RatingQueueClaim:
+    """
+    Пачка записей очереди, забранная обработчиком.
+    """
+    # Идентификаторы записей очереди.
+    entry_ids: list
+    # Время захвата: по нему обработчик отличает свои записи от повторно поставленных в очередь.
+    claimed_at: object
+    place_ids: set
+    gourmand_ids: set
+
+
+def claim_rating_queue(batch_size=500):
+    """
+    Забирает из очереди пачку свободных записей, отмечая время захвата.
+
+    Записи удаляются только после пересчёта (complete_rating_claim). Записи обработчика,
+    который не завершил работу (убит, перезапущен), снова забираются через RATING_QUEUE_LEASE.
+
+    Args:
+        batch_size: Максимальное количество записей в пачке.
+
+    Returns:
+        RatingQueueClaim с id заведений и пользователей-гурманов.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        # skip_locked: параллельные обработчики на PostgreSQL не ждут друг друга и не берут одну запись дважды.
+        entries = list(
+            RatingQueueEntry.objects.select_for_update(skip_locked=True).filter(
+                Q(claimed_at__isnull=True) | Q(claimed_at__lt=now - RATING_QUEUE_LEASE),
+            ).order_by('id').values_list('id', 'kind', 'object_id')[:batch_size]
+        )
+        entry_ids = [entry_id for entry_id, _, _ in entries]
+        RatingQueueEntry.objects.filter(id__in=entry_ids).update(claimed_at=now)
+    return RatingQueueClaim(
+        entry_ids=entry_ids,
+        claimed_at=now,
+        place_ids={object_id for _, kind, object_id in entries if kind == RatingQueueEntry.KIND_PLACE},
+        gourmand_ids={object_id for _, kind, object_id in entries if kind == RatingQueueEntry.KIND_GOURMAND},
+    )
+
+
+def complete_rating_claim(claim):
+    # Удаляет обработанные записи. Записи, поставленные в очередь заново во время пересчёта,
+    # уже освобождены (RatingQueueEntry.mark) и остаются до следующей пачки.
+    RatingQueueEntry.objects.filter(id__in=claim.entry_ids, claimed_at=claim.claimed_at).delete()
+
+
+def release_rating_claim(claim):
+    # Возвращает записи в очередь без ожидания срока аренды.
+    RatingQueueEntry.objects.filter(id__in=claim.entry_ids, claimed_at=claim.claimed_at).update(claimed_at=None)
+
+
+def process_rating_queue(batch_size=500):
+    """
+    Обрабатывает одну пачку очереди пересчёта рейтингов.
+
+    Сначала пересчитываются рейтинги гурманов. Если рейтинг гурмана изменился,
+    меняется вес всех его отзывов, поэтому все заведения, где он оставлял отзывы,
+    добавляются к пачке. Затем каждое заведение пачки пересчитывается ровно один раз.
+
+    Args:
+        batch_size: Максимальное количество записей очереди за один вызов.
+
+    Returns:
+        RatingQueueResult с количеством обработанных сущностей.
+    """
+    claim = claim_rating_queue(batch_size)
+    place_ids = set(claim.place_ids)
+    result = RatingQueueResult(gourmands=len(claim.gourmand_ids))
+    try:
+        # Рейтинги гурманов пачки пересчитываются одним сгруппированным запросом.
+        changed_gourmands = []
+        if claim.gourmand_ids:
+            changed_gourmands = recompute_gourmand_ratings(user_ids=claim.gourmand_ids).changed_user_ids
+        result.changed_gourmands = len(changed_gourmands)
+
+        # Каскад: заведения, в которых изменился вес отзывов гурманов с новым рейтингом.
+        cascaded = set(
+            Review.objects.filter(gourmand_id__in=changed_gourmands).values_list('place_id', flat=True).distinct()
+        ) - place_ids
+        result.cascaded_places = len(cascaded)
+        place_ids |= cascaded
+        result.places = len(place_ids)
+        if place_ids:
+            rebuild_place_ratings(place_ids=place_ids, fix=True)
+    except Exception:
+        release_rating_claim(claim)
+        raise
+    complete_rating_claim(claim)
+    return result
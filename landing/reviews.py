@@ -0,0 +1,36 @@
+# reviews.py
+# Этот файл содержит создание отзыва вместе со связанными объектами.
+# Отзыв, ответ NPS, теги и изображения записываются в одной транзакции
+# минимальным числом вставок: slug вычисляется до вставки отзыва (один INSERT),
+# изображения и связи с тегами добавляются через bulk_create.
+
+# Импортируем transaction, чтобы все записи фиксировались одним коммитом.
+from django.db import transaction
+
+# Импортируем модели отзывов, изображений и NPS.
+from landing.models import ReviewImage, NPSResponse
+
+
+def create_review(review, nps_score, nps_tags=(), images=()):
+    """
+    Сохраняет новый отзыв с ответом NPS, тегами и изображениями.
+
+    Args:
+        review: Несохранённый объект Review с заполненными автором и заведением.
+        nps_score: Оценка NPS (0-10).
+        nps_tags: Теги NPS (объекты NPSTag).
+        images: Загруженные файлы изображений отзыва.
+
+    Returns:
+        Сохранённый отзыв.
+    """
+    with transaction.atomic():
+        # Один INSERT: slug и вклад в рейтинг заведения вычисляются в Review.save до вставки.
+        review.save()
+        nps = NPSResponse.objects.create(review=review, score=nps_score)
+        # Связи с тегами — одной вставкой в промежуточную таблицу, без предварительного SELECT из tags.set().
+        NPSTagLink = NPSResponse.tags.through
+        NPSTagLink.objects.bulk_create([NPSTagLink(npsresponse=nps, npstag=tag) for tag in nps_tags])
+        # Изображения — одной вставкой; файлы сохраняются в хранилище при подготовке INSERT.
+        ReviewImage.objects.bulk_create([ReviewImage(review=review, image=image) for image in images])
+    return review
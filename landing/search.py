@@ -0,0 +1,332 @@
+# search.py
+# Этот файл содержит полнотекстовый поиск по заведениям, отзывам и мероприятиям.
+# На SQLite документы хранятся в таблице FTS5 landing_search: текст приводится к нижнему регистру
+# и к основам слов русским стеммером (stemmer.py), поэтому поиск не зависит от регистра кириллицы
+# и от формы слова, а результаты упорядочены по релевантности (bm25, совпадение в названии весит больше).
+# Индекс обновляется сигналами при сохранении и удалении объектов (signals.py) в той же транзакции;
+# после массовой загрузки данных его пересобирает команда rebuild_search_index.
+# На других СУБД используется запасной поиск через icontains без индекса.
+
+# Импортируем re для разбиения текста на слова.
+import re
+# Импортируем reduce и or_ для объединения условий запасного поиска.
+from functools import reduce
+from operator import or_
+
+# Импортируем connection и transaction для запросов к таблице FTS5 и проверки СУБД.
+from django.db import connection, transaction
+# Импортируем Q для условий запасного поиска.
+from django.db.models import Q
+
+# Импортируем модели, по которым ведётся поиск.
+from landing.models import Place, Review, Event
+# Импортируем стеммер для нормализации текста документов и запросов.
+from landing.stemmer import stem
+
+# Имя таблицы FTS5.
+SEARCH_TABLE = 'landing_search'
+# Виды документов.
+PLACE = 'place'
+REVIEW = 'review'
+EVENT = 'event'
+KINDS = (PLACE, REVIEW, EVENT)
+# Модели видов документов.
+KIND_MODELS = {PLACE: Place, REVIEW: Review, EVENT: Event}
+MODEL_KINDS = {model: kind for kind, model in KIND_MODELS.items()}
+# rowid документа — id объекта * KIND_SLOTS + код вида, поэтому замена и удаление идут по первичному ключу.
+KIND_CODES = {PLACE: 1, REVIEW: 2, EVENT: 3}
+KIND_SLOTS = 4
+# Поля названия и текста документа для каждого вида.
+SEARCH_FIELDS = {
+    PLACE: ('name', ('description', 'location')),
+    REVIEW: ('name', ('description',)),
+    EVENT: ('name', ('description',)),
+}
+# Веса столбцов в bm25: совпадение в названии важнее совпадения в тексте.
+TITLE_WEIGHT = 10.0
+BODY_WEIGHT = 1.0
+# Наибольшее число id одного вида для фильтра списка (search_ids).
+MAX_RESULTS = 1000
+# Слова запроса сверх этого числа отбрасываются.
+MAX_QUERY_TERMS = 8
+# Размер пачки при пересборке индекса.
+BATCH_SIZE = 1000
+# Слово: буквы и цифры (в том числе кириллица).
+WORD_RE = re.compile(r'\w+')
+
+
+def is_supported():
+    """
+    Проверяет, доступен ли индекс FTS5 (база данных — SQLite).
+
+    Returns:
+        True для SQLite.
+    """
+    return connection.vendor == 'sqlite'
+
+
+def analyze(text):
+    """
+    Приводит текст к виду, в котором он хранится в индексе: основы слов через пробел.
+
+    Args:
+        text: Исходный текст.
+
+    Returns:
+        Строка основ слов в нижнем регистре.
+    """
+    return ' '.join(stem(word) for word in WORD_RE.findall(text or ''))
+
+
+def match_expression(query):
+    """
+    Строит выражение MATCH для FTS5: все слова запроса, каждое как префикс основы.
+
+    Args:
+        query: Поисковый запрос пользователя.
+
+    Returns:
+        Выражение MATCH или None, если в запросе нет слов.
+    """
+    stems = list(dict.fromkeys(analyze(query).split()))[:MAX_QUERY_TERMS]
+    if not stems:
+        return None
+    # Основы состоят только из букв и цифр, кавычки нужны, чтобы FTS5 не принял их за операторы.
+    return ' '.join(f'"{term}"*' for term in stems)
+
+
+def _rowid(kind, obj_id):
+    return obj_id * KIND_SLOTS + KIND_CODES[kind]
+
+
+def _decode(rowid):
+    kind = next(kind for kind, code in KIND_CODES.items() if code == rowid % KIND_SLOTS)
+    return kind, rowid // KIND_SLOTS
+
+
+def _document(kind, values):
+    # values — (id, название, поля текста...) в порядке SEARCH_FIELDS.
+    obj_id, title, *body = values
+    return _rowid(kind, obj_id), analyze(title), analyze(' '.join(part or '' for part in body))
+
+
+def _fields(kind):
+    title, body = SEARCH_FIELDS[kind]
+    return ('id', title, *body)
+
+
+def index_objects(kind, objects):
+    """
+    Добавляет объекты в индекс или обновляет их документы.
+
+    Args:
+        kind: Вид документов (PLACE, REVIEW, EVENT).
+        objects: Экземпляры моделей этого вида.
+    """
+    if not is_supported():
+        return
+    rows = [_document(kind, [getattr(obj, field) for field in _fields(kind)]) for obj in objects]
+    if rows:
+        with connection.cursor() as cursor:
+            cursor.executemany(f'INSERT OR REPLACE INTO {SEARCH_TABLE} (rowid, title, body) VALUES (%s, %s, %s)', rows)
+
+
+def remove_objects(kind, obj_ids):
+    """
+    Удаляет документы объектов из индекса.
+
+    Args:
+        kind: Вид документов (PLACE, REVIEW, EVENT).
+        obj_ids: Идентификаторы объектов.
+    """
+    if not is_supported():
+        return
+    rowids = [_rowid(kind, obj_id) for obj_id in obj_ids]
+    if rowids:
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({", ".join(["%s"] * len(rowids))})', rowids)
+
+
+def rebuild_index(querysets=None):
+    """
+    Пересобирает индекс целиком.
+
+    Args:
+        querysets: Словарь {вид: выборка} (по умолчанию все объекты; миграция передаёт исторические модели).
+
+    Returns:
+        Словарь {вид: количество проиндексированных документов}.
+    """
+    if not is_supported():
+        return {}
+    querysets = querysets or {kind: KIND_MODELS[kind].objects.all() for kind in KINDS}
+    counts = {}
+    # Одна транзакция: поиск видит прежний индекс до конца пересборки, а SQLite не фиксирует каждую вставку отдельно.
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+        for kind, queryset in querysets.items():
+            counts[kind] = 0
+            batch = []
+            # values_list и iterator: объекты моделей не создаются, в памяти только одна пачка.
+            for values in queryset.values_list(*_fields(kind)).iterator(chunk_size=BATCH_SIZE):
+                batch.append(_document(kind, values))
+                if len(batch) >= BATCH_SIZE:
+                    cursor.executemany(f'INSERT INTO {SEARCH_TABLE} (rowid, title, body) VALUES (%s, %s, %s)', batch)
+                    counts[kind] += len(batch)
+                    batch = []
+            if batch:
+                cursor.executemany(f'INSERT INTO {SEARCH_TABLE} (rowid, title, body) VALUES (%s, %s, %s)', batch)
+                counts[kind] += len(batch)
+        # Слияние сегментов индекса ускоряет последующие запросы.
+        cursor.execute(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('optimize')")
+    return counts
+
+
+def _kind_filter(kinds):
+    # Вид документа — остаток от деления rowid; для всех видов условие не нужно (%% — знак % в запросе с параметрами).
+    if set(kinds) == set(KINDS):
+        return ''
+    return f' AND rowid %% {KIND_SLOTS} IN ({", ".join(str(KIND_CODES[kind]) for kind in kinds)})'
+
+
+class SearchResults:
+    """
+    Результаты поиска, упорядоченные по релевантности, с ленивой загрузкой страницы.
+
+    Поддерживает count() и срезы, поэтому подходит для django.core.paginator.Paginator:
+    из индекса читается только запрошенная страница, объекты загружаются одним запросом на вид.
+
+    Args:
+        query: Поисковый запрос пользователя.
+        kinds: Виды документов (по умолчанию все).
+    """
+
+    def __init__(self, query, kinds=None):
+        self.query = query
+        self.kinds = tuple(kinds or KINDS)
+        self.expression = match_expression(query)
+        self._count = None
+
+    def count(self):
+        if self._count is None:
+            if self.expression is None:
+                self._count = 0
+            elif is_supported():
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        f'SELECT count(*) FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s{_kind_filter(self.kinds)}',
+                        [self.expression],
+                    )
+                    self._count = cursor.fetchone()[0]
+            else:
+                self._count = sum(_fallback_queryset(kind, self.query).count() for kind in self.kinds)
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, item):
+        if not isinstance(item, slice):
+            return self[item:item + 1][0]
+        offset = item.start or 0
+        limit = (item.stop if item.stop is not None else self.count()) - offset
+        if self.expression is None or limit <= 0:
+            return []
+        keys = self._keys(offset, limit) if is_supported() else self._fallback_keys(offset, limit)
+        return _load(keys)
+
+    def _keys(self, offset, limit):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s{_kind_filter(self.kinds)} '
+                f'ORDER BY bm25({SEARCH_TABLE}, {TITLE_WEIGHT}, {BODY_WEIGHT}) LIMIT %s OFFSET %s',
+                [self.expression, limit, offset],
+            )
+            return [_decode(rowid) for rowid, in cursor.fetchall()]
+
+    def _fallback_keys(self, offset, limit):
+        # Без индекса релевантности нет: виды идут подряд, внутри вида — по id.
+        keys = []
+        for kind in self.kinds:
+            queryset = _fallback_queryset(kind, self.query)
+            count = queryset.count()
+            if offset >= count:
+                offset -= count
+                continue
+            ids = list(queryset.order_by('id').values_list('id', flat=True)[offset:offset + limit - len(keys)])
+            keys.extend((kind, obj_id) for obj_id in ids)
+            offset = 0
+            if len(keys) >= limit:
+                break
+        return keys
+
+
+def _fallback_queryset(kind, query):
+    # Запасной поиск: каждое слово запроса — в названии или тексте.
+    title, body = SEARCH_FIELDS[kind]
+    queryset = KIND_MODELS[kind].objects.all()
+    for word in WORD_RE.findall(query)[:MAX_QUERY_TERMS]:
+        queryset = queryset.filter(reduce(or_, (Q(**{f'{field}__icontains': word}) for field in (title, *body))))
+    return queryset
+
+
+def _load(keys):
+    # Объекты страницы: один запрос на вид, порядок — как в индексе.
+    ids_by_kind = {}
+    for kind, obj_id in keys:
+        ids_by_kind.setdefault(kind, []).append(obj_id)
+    related = {PLACE: (), REVIEW: ('place',), EVENT: ('place',)}
+    objects = {
+        kind: KIND_MODELS[kind].objects.select_related(*related[kind]).in_bulk(ids)
+        for kind, ids in ids_by_kind.items()
+    }
+    # Документ мог пережить объект (удаление в обход сигналов) — такие пропускаем до пересборки индекса.
+    return [
+        SearchHit(kind, objects[kind][obj_id])
+        for kind, obj_id in keys if obj_id in objects[kind]
+    ]
+
+
+class SearchHit:
+    """
+    Найденный объект вместе с видом (для шаблона общего поиска).
+
+    Args:
+        kind: Вид документа (PLACE, REVIEW, EVENT).
+        obj: Экземпляр модели.
+    """
+
+    URL_NAMES = {PLACE: 'place', REVIEW: 'review', EVENT: 'event'}
+    KIND_LABELS = {PLACE: 'Заведение', REVIEW: 'Отзыв', EVENT: 'Мероприятие'}
+
+    def __init__(self, kind, obj):
+        self.kind = kind
+        self.obj = obj
+
+    @property
+    def label(self):
+        return self.KIND_LABELS[self.kind]
+
+    @property
+    def url_name(self):
+        return self.URL_NAMES[self.kind]
+
+
+def search_ids(query, kind, limit):
+    """
+    Возвращает id объектов одного вида, подходящих под запрос, по убыванию релевантности.
+
+    Args:
+        query: Поисковый запрос пользователя.
+        kind: Вид документов (PLACE, REVIEW, EVENT).
+        limit: Наибольшее число id.
+
+    Returns:
+        Список id.
+    """
+    results = SearchResults(query, kinds=[kind])
+    if results.expression is None:
+        return []
+    if not is_supported():
+        return list(_fallback_queryset(kind, query).order_by('id').values_list('id', flat=True)[:limit])
+    return [obj_id for _, obj_id in results._keys(0, limit)]
@@ -1,9 +1,13 @@
 # Этот файл содержит сигналы Django, которые автоматически выполняются при определённых событиях с моделями.
 # Здесь мы обрабатываем события создания и сохранения пользователя (User), чтобы управлять связанными профилями.
 
-from django.db.models.signals import post_save  # Импортируем сигнал post_save, который срабатывает после сохранения объекта.
+from django.db.models.signals import post_save, post_delete  # Импортируем сигналы, которые срабатывают после сохранения и удаления объекта.
 from django.dispatch import receiver  # Импортируем декоратор receiver для привязки функций к сигналам.
-from .models import User, GourmandProfile, OwnerProfile  # Импортируем модели, с которыми будем работать.
+from .models import User, GourmandProfile, OwnerProfile, Place, Review, RatingQueueEntry, NPSResponse, \
+    nps_counter_deltas, Event, PlaceImage, ReviewImage, EventImage  # Импортируем модели, с которыми будем работать.
+from landing import cache as versioned_cache  # Импортируем версионированный кэш для сброса карточек.
+from landing import search  # Импортируем поисковый индекс для синхронизации документов.
+from landing import suggest  # Импортируем индекс подсказок для обновления названий.
 
 
 # Декоратор receiver связывает функцию с сигналом post_save для модели User.
@@ -46,4 +50,175 @@ def save_user_profile(sender, instance, **kwargs):
     elif instance.role == 'owner' and hasattr(instance, 'ownerprofile'):
         # Если пользователь — владелец и у него есть профиль владельца (ownerprofile),
         # сохраняем профиль, чтобы обновить связанные данные.
-        instance.ownerprofile.save()
\ No newline at end of file
+        instance.ownerprofile.save()
+
+
+# Декоратор receiver связывает функцию с сигналом post_delete для модели Review.
+# Срабатывает после удаления отзыва, в том числе каскадного.
+@receiver(post_delete, sender=Review)
+def remove_review_rating(sender, instance, **kwargs):
+    """
+    Убирает вклад удалённого отзыва из накопленного рейтинга и счётчиков заведения и автора
+    и ставит автора в очередь на пересчёт рейтинга (голоса за отзыв пропали вместе с ним).
+
+    Args:
+        sender: Класс модели, отправивший сигнал (в данном случае Review).
+        instance: Экземпляр модели Review, который был удалён.
+        **kwargs: Дополнительные аргументы, переданные сигналу.
+    """
+    if instance.rating_weight or instance.rating_weighted:  # Отзывы с нулевым вкладом рейтинг не меняют.
+        # Если заведение удаляется каскадно, обновление просто не затронет ни одной строки.
+        Place.apply_rating_delta(instance.place_id, -instance.rating_weighted, -instance.rating_weight)
+    Place.apply_counter_delta(instance.place_id, review_count=-1)
+    GourmandProfile.apply_review_count_delta(instance.gourmand_id, -1)
+    RatingQueueEntry.mark(gourmand_ids=[instance.gourmand_id])
+
+
+# Декоратор receiver связывает функцию с сигналом post_delete для модели NPSResponse.
+# Срабатывает после удаления ответа NPS, в том числе каскадного вместе с отзывом.
+@receiver(post_delete, sender=NPSResponse)
+def remove_nps_counters(sender, instance, **kwargs):
+    """
+    Убирает удалённый ответ NPS из счётчиков заведения.
+
+    Args:
+        sender: Класс модели, отправивший сигнал (в данном случае NPSResponse).
+        instance: Экземпляр модели NPSResponse, который был удалён.
+        **kwargs: Дополнительные аргументы, переданные сигналу.
+    """
+    # Ответ удаляется раньше своего отзыва, поэтому заведение ещё можно найти по отзыву.
+    place_id = Review.objects.filter(pk=instance.review_id).values_list('place_id', flat=True).first()
+    if place_id is not None:
+        Place.apply_counter_delta(place_id, **nps_counter_deltas(instance.score, -1))
+
+
+# Декораторы receiver связывают функцию с сигналами сохранения и удаления моделей, показанных в карточках списков.
+# Заведение при сохранении сбрасывает свою версию само (Place.save), здесь — только удаление.
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+@receiver(post_delete, sender=Place)
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=GourmandProfile)
+@receiver(post_delete, sender=GourmandProfile)
+def invalidate_card(sender, instance, **kwargs):
+    """
+    Сбрасывает версию сущности, чтобы её закэшированная карточка перестала читаться.
+
+    Args:
+        sender: Класс модели, отправивший сигнал.
+        instance: Сохранённый или удалённый экземпляр.
+        **kwargs: Дополнительные аргументы, переданные сигналу.
+    """
+    if sender is Review:
+        versioned_cache.invalidate(versioned_cache.REVIEW, instance.pk)
+    elif sender is Event:
+        versioned_cache.invalidate(versioned_cache.EVENT, instance.pk)
+    elif sender is Place:
+        versioned_cache.invalidate(versioned_cache.PLACE, instance.pk)
+    elif sender is User:
+        # Версии гурманов привязаны к id пользователя (имя и slug показаны в карточке).
+        versioned_cache.invalidate(versioned_cache.GOURMAND, instance.pk)
+    elif sender is GourmandProfile:
+        versioned_cache.invalidate(versioned_cache.GOURMAND, instance.user_id)
+
+
+# Декораторы receiver связывают функцию с сигналами изображений: от первого изображения зависит обложка карточки.
+@receiver(post_save, sender=PlaceImage)
+@receiver(post_delete, sender=PlaceImage)
+@receiver(post_save, sender=ReviewImage)
+@receiver(post_delete, sender=ReviewImage)
+@receiver(post_save, sender=EventImage)
+@receiver(post_delete, sender=EventImage)
+def invalidate_card_cover(sender, instance, **kwargs):
+    """
+    Сбрасывает версию сущности, у которой добавилось или удалилось изображение.
+
+    Args:
+        sender: Класс модели изображения, отправивший сигнал.
+        instance: Сохранённое или удалённое изображение.
+        **kwargs: Дополнительные аргументы, переданные сигналу.
+    """
+    if sender is PlaceImage:
+        versioned_cache.invalidate(versioned_cache.PLACE, instance.place_id)
+    elif sender is ReviewImage:
+        versioned_cache.invalidate(versioned_cache.REVIEW, instance.review_id)
+    else:
+        versioned_cache.invalidate(versioned_cache.EVENT, instance.event_id)
+
+
+# Декораторы receiver связывают функцию с сигналами сохранения заведений, отзывов и мероприятий.
+@receiver(post_save, sender=Place)
+@receiver(post_save, sender=Review)
+@receiver(post_save, sender=Event)
+def index_search_document(sender, instance, update_fields=None, **kwargs):
+    """
+    Обновляет документ объекта в поисковом индексе (в той же транзакции, что и сохранение).
+
+    Args:
+        sender: Класс модели, отправивший сигнал.
+        instance: Сохранённый объект.
+        update_fields: Сохранённые поля (None — все).
+        **kwargs: Дополнительные аргументы, переданные сигналу.
+    """
+    kind = search.MODEL_KINDS[sender]
+    title, body = search.SEARCH_FIELDS[kind]
+    # Сохранение только служебных полей (счётчики, рейтинг, slug) текст документа не меняет.
+    if update_fields is not None and not set(update_fields) & {title, *body}:
+        return
+    search.index_objects(kind, [instance])
+
+
+# Декораторы receiver связывают функцию с сигналами удаления заведений, отзывов и мероприятий (в том числе каскадного).
+@receiver(post_delete, sender=Place)
+@receiver(post_delete, sender=Review)
+@receiver(post_delete, sender=Event)
+def remove_search_document(sender, instance, **kwargs):
+    """
+    Удаляет документ объекта из поискового индекса.
+
+    Args:
+        sender: Класс модели, отправивший сигнал.
+        instance: Удалённый объект.
+        **kwargs: Дополнительные аргументы, переданные сигналу.
+    """
+    search.remove_objects(search.MODEL_KINDS[sender], [instance.pk])
+
+
+# Декораторы receiver связывают функцию с сигналами сохранения объектов, названия которых подсказываются при поиске.
+@receiver(post_save, sender=Place)
+@receiver(post_save, sender=Event)
+@receiver(post_save, sender=User)
+def update_suggestion(sender, instance, update_fields=None, **kwargs):
+    """
+    Обновляет подсказку объекта в индексе процесса и в журнале изменений для остальных воркеров.
+
+    Args:
+        sender: Класс модели, отправивший сигнал.
+        instance: Сохранённый объект.
+        update_fields: Сохранённые поля (None — все).
+        **kwargs: Дополнительные аргументы, переданные сигналу.
+    """
+    # Сохранение полей, которых нет в подсказке (вход пользователя, счётчики), индекс не меняет.
+    if update_fields is not None and not set(update_fields) & {'name', 'slug', 'rating', 'first_name', 'last_name', 'role'}:
+        return
+    kind = suggest.GOURMAND if sender is User else suggest.PLACE if sender is Place else suggest.EVENT
+    suggest.record_change(kind, instance.pk, suggest.entry_for(instance))
+
+
+# Декораторы receiver связывают функцию с сигналами удаления объектов, названия которых подсказываются при поиске.
+@receiver(post_delete, sender=Place)
+@receiver(post_delete, sender=Event)
+@receiver(post_delete, sender=User)
+def remove_suggestion(sender, instance, **kwargs):
+    """
+    Убирает подсказку удалённого объекта.
+
+    Args:
+        sender: Класс модели, отправивший сигнал.
+        instance: Удалённый объект.
+        **kwargs: Дополнительные аргументы, переданные сигналу.
+    """
+    kind = suggest.GOURMAND if sender is User else suggest.PLACE if sender is Place else suggest.EVENT
+    suggest.record_change(kind, instance.pk)
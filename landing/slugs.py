@@ -0,0 +1,72 @@
+# slugs.py
+# Этот файл содержит выделение уникальных slug для моделей User, Place, Review и Event.
+# Вместо проверки exists() для каждого кандидата (один запрос на каждое совпадение)
+# все занятые slug с нужным префиксом читаются одним запросом, а свободный суффикс
+# подбирается в памяти. Гонку двух одновременных сохранений ловит уникальный индекс:
+# при IntegrityError slug выделяется заново.
+
+# Импортируем IntegrityError и transaction для повторной попытки при конфликте уникальности.
+from django.db import IntegrityError, transaction
+
+# Количество попыток сохранить объект, если slug успели занять параллельно.
+SLUG_SAVE_ATTEMPTS = 5
+
+
+def allocate_slug(model, base_slug, exclude_pk=None, field_name='slug'):
+    """
+    Подбирает свободный slug вида base_slug, base_slug-1, base_slug-2, ...
+
+    Args:
+        model: Класс модели с уникальным полем slug.
+        base_slug: Базовый slug (уже транслитерированный).
+        exclude_pk: Первичный ключ объекта, чей собственный slug не считается занятым.
+        field_name: Имя поля slug.
+
+    Returns:
+        Первый незанятый slug; выполняет ровно один запрос к базе.
+    """
+    max_length = model._meta.get_field(field_name).max_length
+    base_slug = base_slug[:max_length]
+    # Все занятые slug, начинающиеся с базового, — одним запросом.
+    taken = model._default_manager.filter(**{f'{field_name}__startswith': base_slug})
+    if exclude_pk is not None:
+        taken = taken.exclude(pk=exclude_pk)
+    taken = set(taken.values_list(field_name, flat=True))
+
+    slug = base_slug
+    counter = 1
+    while slug in taken:
+        suffix = f"-{counter}"
+        # Обрезаем базу, чтобы slug с суффиксом поместился в поле.
+        slug = f"{base_slug[:max_length - len(suffix)]}{suffix}"
+        counter += 1
+    return slug
+
+
+def save_with_slug(instance, base_slug, save, field_name='slug'):
+    """
+    Выделяет объекту свободный slug и сохраняет его, повторяя попытку при конфликте.
+
+    Args:
+        instance: Объект модели, которому нужен slug.
+        base_slug: Базовый slug (уже транслитерированный).
+        save: Функция без аргументов, которая записывает объект (или только его slug) в базу.
+        field_name: Имя поля slug.
+
+    Raises:
+        IntegrityError: Если конфликт вызван не slug или попытки исчерпаны.
+    """
+    model = type(instance)
+    for attempt in range(SLUG_SAVE_ATTEMPTS):
+        setattr(instance, field_name, allocate_slug(model, base_slug, instance.pk, field_name))
+        try:
+            # Точка сохранения, чтобы ошибка не ломала внешнюю транзакцию.
+            with transaction.atomic():
+                save()
+            return
+        except IntegrityError:
+            slug = getattr(instance, field_name)
+            slug_taken = model._default_manager.filter(**{field_name: slug}).exclude(pk=instance.pk).exists()
+            # Повторяем только если slug успел занять другой объект.
+            if not slug_taken or attempt == SLUG_SAVE_ATTEMPTS - 1:
+                raise
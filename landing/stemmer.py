@@ -0,0 +1,134 @@
+# stemmer.py
+# Этот файл содержит стеммер русского языка (алгоритм Snowball / Портера для русского).
+# Поисковый индекс (search.py) хранит и ищет основы слов, поэтому запрос «уютное кафе»
+# находит «уютный», «уютных» и «кафе». Стеммер написан на чистом Python, чтобы поиск
+# не требовал внешних пакетов; слова не на кириллице возвращаются без изменений.
+
+# Импортируем lru_cache: в текстах одни и те же слова повторяются, основа считается один раз.
+from functools import lru_cache
+
+# Гласные русского алфавита (ё заменяется на е до разбора).
+VOWELS = 'аеиоуыэюя'
+
+# Окончания, перед которыми должна стоять «а» или «я» (группа 1), и окончания без этого условия (группа 2).
+PERFECTIVE_GERUND = (('в', 'вши', 'вшись'), ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'))
+ADJECTIVE = (
+    'ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем', 'им', 'ым', 'ом',
+    'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую', 'юю', 'ая', 'яя', 'ою', 'ею',
+)
+PARTICIPLE = (('ем', 'нн', 'вш', 'ющ', 'щ'), ('ивш', 'ывш', 'ующ'))
+REFLEXIVE = ('ся', 'сь')
+VERB = (
+    ('ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но', 'ет', 'ют', 'ны', 'ть', 'ешь', 'нно'),
+    ('ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей', 'уй', 'ил', 'ыл', 'им', 'ым', 'ен',
+     'ило', 'ыло', 'ено', 'ят', 'ует', 'уют', 'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю'),
+)
+NOUN = (
+    'а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии', 'и', 'ией', 'ей', 'ой', 'ий', 'й',
+    'иям', 'ям', 'ием', 'ем', 'ам', 'ом', 'о', 'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия', 'ья', 'я',
+)
+SUPERLATIVE = ('ейше', 'ейш')
+DERIVATIONAL = ('ость', 'ост')
+
+
+def _longest_first(endings):
+    return tuple(sorted(endings, key=len, reverse=True))
+
+
+# Окончания упорядочиваются от длинных к коротким: _strip снимает первое подходящее.
+PERFECTIVE_GERUND = tuple(_longest_first(group) for group in PERFECTIVE_GERUND)
+PARTICIPLE = tuple(_longest_first(group) for group in PARTICIPLE)
+VERB = tuple(_longest_first(group) for group in VERB)
+ADJECTIVE, NOUN, REFLEXIVE, SUPERLATIVE, DERIVATIONAL = (
+    _longest_first(endings) for endings in (ADJECTIVE, NOUN, REFLEXIVE, SUPERLATIVE, DERIVATIONAL)
+)
+
+
+def _regions(word):
+    # RV — после первой гласной; R1 — после первой согласной, идущей за гласной; R2 — то же внутри R1.
+    rv = r1 = r2 = len(word)
+    for index, char in enumerate(word):
+        if char in VOWELS:
+            rv = index + 1
+            break
+    for index in range(1, len(word)):
+        if word[index] not in VOWELS and word[index - 1] in VOWELS:
+            r1 = index + 1
+            break
+    for index in range(r1 + 1, len(word)):
+        if word[index] not in VOWELS and word[index - 1] in VOWELS:
+            r2 = index + 1
+            break
+    return rv, r1, r2
+
+
+def _strip(word, start, endings, after_a=False):
+    # Снимает самое длинное из окончаний, лежащее в области с позиции start; None, если ни одно не подошло.
+    # Окончания в константах упорядочены от длинных к коротким (_longest_first).
+    for ending in endings:
+        cut = len(word) - len(ending)
+        if cut < start or not word.endswith(ending):
+            continue
+        if after_a and (cut - 1 < start or word[cut - 1] not in 'ая'):
+            continue
+        return word[:cut]
+    return None
+
+
+def _strip_grouped(word, start, groups):
+    # Окончания группы 1 снимаются только после «а»/«я», группы 2 — всегда; берётся более длинное.
+    candidates = [
+        stripped for stripped in (_strip(word, start, groups[0], after_a=True), _strip(word, start, groups[1]))
+        if stripped is not None
+    ]
+    return min(candidates, key=len) if candidates else None
+
+
+@lru_cache(maxsize=100_000)
+def stem(word):
+    """
+    Возвращает основу русского слова.
+
+    Args:
+        word: Слово в любом регистре.
+
+    Returns:
+        Основа в нижнем регистре (ё заменена на е).
+    """
+    word = word.lower().replace('ё', 'е')
+    rv, _, r2 = _regions(word)
+    if rv >= len(word):
+        return word
+
+    # Шаг 1: деепричастие либо возвратная частица и затем прилагательное, глагол или существительное.
+    stripped = _strip_grouped(word, rv, PERFECTIVE_GERUND)
+    if stripped is not None:
+        word = stripped
+    else:
+        word = _strip(word, rv, REFLEXIVE) or word
+        adjective = _strip(word, rv, ADJECTIVE)
+        if adjective is not None:
+            # Причастие — прилагательное с суффиксом причастия перед окончанием.
+            word = _strip_grouped(adjective, rv, PARTICIPLE) or adjective
+        else:
+            word = _strip_grouped(word, rv, VERB) or _strip(word, rv, NOUN) or word
+
+    # Шаг 2: конечная «и».
+    if len(word) > rv and word.endswith('и'):
+        word = word[:-1]
+
+    # Шаг 3: словообразовательный суффикс в R2.
+    word = _strip(word, r2, DERIVATIONAL) or word
+
+    # Шаг 4: двойная «н», превосходная степень или мягкий знак.
+    if len(word) - 2 >= rv and word.endswith('нн'):
+        word = word[:-1]
+    else:
+        superlative = _strip(word, rv, SUPERLATIVE)
+        if superlative is not None:
+            word = superlative
+            if len(word) - 2 >= rv and word.endswith('нн'):
+                word = word[:-1]
+        elif len(word) > rv and word.endswith('ь'):
+            word = word[:-1]
+    return word
@@ -0,0 +1,440 @@
+# suggest.py
+# Этот файл содержит подсказки для поиска по мере ввода (/api/suggest/).
+# Названия заведений, мероприятий и имена гурманов хранятся в памяти процесса в префиксном индексе:
+# отсортированный массив ключей, в котором все ключи с общим префиксом лежат подряд и находятся
+# двоичным поиском (как уровень префиксного дерева, но без узла на каждый символ). Ключи — названия
+# с каждого слова в нижнем регистре и их транслитерация (pytils), поэтому «kofe» находит «Кофе».
+# Подсказка отвечает без обращения к базе. Изменения названий применяются сигналами, а рейтингов
+# (веса подсказок) — record_weight_changes: процесс, записавший изменение, обновляет свой индекс сразу,
+# а остальные воркеры раз в SUGGEST_SYNC_INTERVAL секунд читают журнал изменений из общего кэша
+# и перечитывают из базы только изменившиеся объекты.
+
+# Импортируем bisect для двоичного поиска и вставки ключей.
+import bisect
+# Импортируем heapq для выбора лучших подсказок без полной сортировки.
+import heapq
+# Импортируем logging для записи переполнения индекса.
+import logging
+# Импортируем re для разбиения названий на слова.
+import re
+# Импортируем threading для защиты индекса при обращении из нескольких потоков.
+import threading
+# Импортируем time для периода синхронизации между воркерами.
+import time
+# Импортируем namedtuple для компактных записей индекса.
+from collections import namedtuple
+
+# Импортируем настройки для пределов индекса.
+from django.conf import settings
+# Импортируем общий кэш Django для журнала изменений.
+from django.core.cache import cache
+# Импортируем transaction, чтобы изменения весов записывались после фиксации.
+from django.db import transaction
+# Импортируем reverse для адресов подсказок.
+from django.urls import reverse
+# Импортируем транслитерацию кириллицы.
+from pytils.translit import translify
+
+# Импортируем модели, названия которых подсказываются.
+from landing.models import Place, Event, User
+
+logger = logging.getLogger(__name__)
+
+# Виды подсказок и адреса их страниц.
+PLACE = 'place'
+EVENT = 'event'
+GOURMAND = 'gourmand'
+URL_NAMES = {PLACE: 'place', EVENT: 'event', GOURMAND: 'gourmand'}
+# Минимальная длина запроса и число подсказок по умолчанию и наибольшее.
+MIN_QUERY_LENGTH = 2
+DEFAULT_LIMIT = 8
+MAX_LIMIT = 20
+# Для коротких префиксов подходящих ключей тысячи, поэтому их лучшие подсказки запоминаются до изменения индекса.
+SHORT_PREFIX_LENGTH = 3
+# Из длинного названия ключи строятся только от первых слов.
+MAX_WORDS_PER_NAME = 6
+# Ключи журнала изменений в общем кэше и срок их хранения (секунды).
+VERSION_KEY = 'suggest:version'
+CHANGE_KEY = 'suggest:change:{}'
+CHANGE_TIMEOUT = 60 * 60 * 24
+# Если воркер отстал больше чем на столько изменений, индекс пересобирается целиком.
+MAX_CHANGES_TO_REPLAY = 500
+WORD_RE = re.compile(r'\w+')
+
+# Запись индекса: вид, id объекта, показываемое название, slug для адреса и вес для порядка подсказок.
+Entry = namedtuple('Entry', 'kind obj_id name slug weight')
+
+
+def normalize(text):
+    """
+    Приводит текст к виду ключа индекса: нижний регистр, «ё» как «е», слова через пробел.
+
+    Args:
+        text: Название или запрос.
+
+    Returns:
+        Нормализованная строка.
+    """
+    return ' '.join(WORD_RE.findall(text.lower().replace('ё', 'е')))
+
+
+def keys_for(name):
+    """
+    Возвращает ключи названия: хвосты с начала каждого слова, на кириллице и в транслитерации.
+
+    Args:
+        name: Название.
+
+    Returns:
+        Множество ключей.
+    """
+    words = normalize(name).split()[:MAX_WORDS_PER_NAME]
+    keys = set()
+    for index in range(len(words)):
+        tail = ' '.join(words[index:])
+        keys.add(tail)
+        try:
+            keys.add(translify(tail).lower())
+        except ValueError:
+            # translify не знает некоторые символы (например, иероглифы) — оставляем только исходный ключ.
+            pass
+    return keys
+
+
+def _source_querysets():
+    # Объекты подсказок: (вид, выборка значений id, название, slug, вес).
+    return {
+        PLACE: Place.objects.values_list('id', 'name', 'slug', 'rating'),
+        EVENT: Event.objects.values_list('id', 'name', 'slug'),
+        GOURMAND: User.objects.filter(role='gourmand').values_list(
+            'id', 'first_name', 'last_name', 'slug', 'gourmand_profile__rating',
+        ),
+    }
+
+
+def _entry(kind, row):
+    if kind == PLACE:
+        obj_id, name, slug, rating = row
+        return Entry(kind, obj_id, name, slug, float(rating or 0))
+    if kind == EVENT:
+        obj_id, name, slug = row
+        return Entry(kind, obj_id, name, slug, 0.0)
+    obj_id, first_name, last_name, slug, rating = row
+    return Entry(kind, obj_id, f"{first_name} {last_name}".strip(), slug, float(rating or 0))
+
+
+def _best(entries, limit):
+    # Порядок подсказок: вес, затем более короткое название (точнее совпадает с запросом).
+    return heapq.nsmallest(limit, entries, key=lambda entry: (-entry.weight, len(entry.name), entry.name))
+
+
+class PrefixIndex:
+    """
+    Префиксный индекс подсказок в памяти процесса.
+
+    Ключи хранятся в отсортированном списке пар (ключ, (вид, id)); поиск по префиксу — двоичный поиск
+    начала диапазона и просмотр подряд идущих ключей. Число записей ограничено max_entries:
+    при пересборке в индекс попадают записи с наибольшим весом, новые записи сверх предела не добавляются.
+
+    Args:
+        max_entries: Наибольшее число записей (по умолчанию SUGGEST_MAX_ENTRIES).
+    """
+
+    def __init__(self, max_entries=None):
+        self.max_entries = settings.SUGGEST_MAX_ENTRIES if max_entries is None else max_entries
+        self._keys = []
+        self._entries = {}
+        # Лучшие подсказки коротких префиксов: {префикс: {виды: [Entry, ...]}}.
+        self._short = {}
+        self._lock = threading.RLock()
+        # Последняя применённая версия журнала изменений и момент последней проверки.
+        self.version = None
+        self._checked_at = 0.0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, entry):
+        """
+        Добавляет запись или заменяет запись того же объекта.
+
+        Args:
+            entry: Entry.
+
+        Returns:
+            True, если запись в индексе; False, если индекс заполнен.
+        """
+        ref = (entry.kind, entry.obj_id)
+        with self._lock:
+            if ref not in self._entries and len(self._entries) >= self.max_entries:
+                logger.warning(f"SUGGEST: Index is full ({self.max_entries} entries), {ref} not added")
+                return False
+            self.remove(*ref)
+            self._entries[ref] = entry
+            for key in keys_for(entry.name):
+                bisect.insort(self._keys, (key, ref))
+                self._forget_short(key)
+            return True
+
+    def remove(self, kind, obj_id):
+        """
+        Удаляет запись объекта, если она есть.
+
+        Args:
+            kind: Вид подсказки.
+            obj_id: id объекта.
+        """
+        ref = (kind, obj_id)
+        with self._lock:
+            entry = self._entries.pop(ref, None)
+            if entry is None:
+                return
+            for key in keys_for(entry.name):
+                index = bisect.bisect_left(self._keys, (key, ref))
+                if index < len(self._keys) and self._keys[index] == (key, ref):
+                    del self._keys[index]
+                self._forget_short(key)
+
+    def _forget_short(self, key):
+        # Запомненные подсказки префиксов ключа устарели.
+        for length in range(MIN_QUERY_LENGTH, SHORT_PREFIX_LENGTH + 1):
+            self._short.pop(key[:length], None)
+
+    def load(self, entries):
+        """
+        Заменяет содержимое индекса записями с наибольшим весом (не больше max_entries).
+
+        Args:
+            entries: Итерируемое Entry.
+        """
+        entries = heapq.nlargest(self.max_entries, entries, key=lambda entry: entry.weight)
+        keys = sorted(
+            (key, (entry.kind, entry.obj_id))
+            for entry in entries for key in keys_for(entry.name)
+        )
+        # Подсказки коротких префиксов считаются сразу: иначе первый запрос каждого префикса просматривал бы тысячи ключей.
+        groups = {}
+        for key, ref in keys:
+            for length in range(MIN_QUERY_LENGTH, min(len(key), SHORT_PREFIX_LENGTH) + 1):
+                groups.setdefault(key[:length], set()).add(ref)
+        by_ref = {(entry.kind, entry.obj_id): entry for entry in entries}
+        short = {
+            prefix: {None: _best((by_ref[ref] for ref in refs), MAX_LIMIT)}
+            for prefix, refs in groups.items()
+        }
+        with self._lock:
+            self._entries = by_ref
+            self._keys = keys
+            self._short = short
+
+    def lookup(self, query, limit=DEFAULT_LIMIT, kinds=None):
+        """
+        Возвращает записи, у которых название или его транслитерация начинается с запроса (с любого слова).
+
+        Args:
+            query: Начало названия.
+            limit: Наибольшее число записей.
+            kinds: Виды подсказок (по умолчанию все).
+
+        Returns:
+            Список Entry по убыванию веса.
+        """
+        prefix = normalize(query)
+        if len(prefix) < MIN_QUERY_LENGTH:
+            return []
+        if len(prefix) > SHORT_PREFIX_LENGTH:
+            return self._lookup(prefix, limit, kinds)
+        kinds_key = tuple(sorted(kinds)) if kinds else None
+        with self._lock:
+            best = self._short.get(prefix, {}).get(kinds_key)
+            if best is None:
+                best = self._lookup(prefix, MAX_LIMIT, kinds)
+                self._short.setdefault(prefix, {})[kinds_key] = best
+        return best[:limit]
+
+    def _lookup(self, prefix, limit, kinds):
+        with self._lock:
+            # Ключи с префиксом лежат подряд: от первого не меньшего префикса до первого, который с него не начинается.
+            index = bisect.bisect_left(self._keys, (prefix,))
+            refs = set()
+            while index < len(self._keys) and self._keys[index][0].startswith(prefix):
+                refs.add(self._keys[index][1])
+                index += 1
+            entries = [self._entries[ref] for ref in refs if kinds is None or ref[0] in kinds]
+        return _best(entries, limit)
+
+    def stats(self):
+        """
+        Возвращает размер индекса.
+
+        Returns:
+            Словарь с числом записей, ключей и пределом записей.
+        """
+        return {'entries': len(self._entries), 'keys': len(self._keys), 'max_entries': self.max_entries}
+
+
+# Индекс процесса (None, пока не собран при первом обращении).
+_index = None
+_index_lock = threading.Lock()
+
+
+def _fetch_entries(refs_by_kind=None):
+    # Записи из базы: все объекты или только перечисленные id по видам.
+    querysets = _source_querysets()
+    for kind, queryset in querysets.items():
+        if refs_by_kind is not None:
+            if not refs_by_kind.get(kind):
+                continue
+            queryset = queryset.filter(id__in=refs_by_kind[kind])
+        for row in queryset.iterator(chunk_size=2000):
+            yield _entry(kind, row)
+
+
+def rebuild_index():
+    """
+    Пересобирает индекс процесса из базы.
+
+    Returns:
+        PrefixIndex.
+    """
+    global _index
+    index = PrefixIndex()
+    # Версия читается до чтения базы: изменение, попавшее между ними, будет применено повторно, а не потеряно.
+    index.version = cache.get(VERSION_KEY, 0)
+    index.load(_fetch_entries())
+    index._checked_at = time.monotonic()
+    with _index_lock:
+        _index = index
+    return index
+
+
+def _sync(index):
+    # Применяет изменения, сделанные другими процессами, по журналу в общем кэше.
+    current = cache.get(VERSION_KEY, 0)
+    index._checked_at = time.monotonic()
+    if current == index.version:
+        return index
+    if current < index.version or current - index.version > MAX_CHANGES_TO_REPLAY:
+        # Кэш очищен или воркер сильно отстал — дешевле пересобрать.
+        return rebuild_index()
+    changes = cache.get_many([CHANGE_KEY.format(version) for version in range(index.version + 1, current + 1)])
+    if len(changes) < current - index.version:
+        # Часть журнала вытеснена из кэша.
+        return rebuild_index()
+    refs_by_kind = {}
+    for kind, obj_id in changes.values():
+        refs_by_kind.setdefault(kind, set()).add(obj_id)
+    found = {(entry.kind, entry.obj_id): entry for entry in _fetch_entries(refs_by_kind)}
+    for kind, ids in refs_by_kind.items():
+        for obj_id in ids:
+            entry = found.get((kind, obj_id))
+            if entry is None:
+                index.remove(kind, obj_id)
+            else:
+                index.add(entry)
+    index.version = current
+    return index
+
+
+def get_index():
+    """
+    Возвращает индекс процесса, при первом обращении собирая его, а затем раз в SUGGEST_SYNC_INTERVAL секунд
+    применяя изменения других процессов.
+
+    Returns:
+        PrefixIndex.
+    """
+    if _index is None:
+        return rebuild_index()
+    if time.monotonic() - _index._checked_at > settings.SUGGEST_SYNC_INTERVAL:
+        return _sync(_index)
+    return _index
+
+
+def record_change(kind, obj_id, entry=None):
+    """
+    Применяет изменение объекта к индексу процесса и записывает его в журнал для остальных процессов.
+
+    Args:
+        kind: Вид подсказки.
+        obj_id: id объекта.
+        entry: Новая запись или None, если объект удалён или больше не подсказывается.
+    """
+    cache.add(VERSION_KEY, 0, timeout=None)
+    try:
+        version = cache.incr(VERSION_KEY)
+    except ValueError:
+        version = 1
+        cache.set(VERSION_KEY, version, timeout=None)
+    cache.set(CHANGE_KEY.format(version), (kind, obj_id), CHANGE_TIMEOUT)
+    if _index is None:
+        # Индекс процесса ещё не собран — он прочитает актуальные данные при первом обращении.
+        return
+    if entry is None:
+        _index.remove(kind, obj_id)
+    else:
+        _index.add(entry)
+    # Своё изменение считается применённым, только если журнал не ушёл вперёд из-за других процессов.
+    if _index.version == version - 1:
+        _index.version = version
+
+
+def record_weight_changes(kind, obj_ids):
+    """
+    Обновляет вес подсказок после фиксации транзакции.
+
+    Рейтинги заведений и гурманов пишутся queryset.update() и bulk_update
+    (apply_rating_delta, rebuild_place_ratings, recompute_gourmand_ratings) без post_save.
+    Поэтому изменение порядка подсказок записывается здесь.
+
+    Args:
+        kind: PLACE или GOURMAND.
+        obj_ids: id объектов, у которых изменился рейтинг.
+    """
+    obj_ids = set(obj_ids)
+    if not obj_ids:
+        return
+
+    def record():
+        found = {entry.obj_id: entry for entry in _fetch_entries({kind: obj_ids})}
+        for obj_id in obj_ids:
+            record_change(kind, obj_id, found.get(obj_id))
+    transaction.on_commit(record)
+
+
+def entry_for(instance):
+    """
+    Строит запись индекса для сохранённого объекта.
+
+    Args:
+        instance: Place, Event или User.
+
+    Returns:
+        Entry или None, если объект не подсказывается (пользователь не гурман).
+    """
+    if isinstance(instance, Place):
+        return _entry(PLACE, (instance.pk, instance.name, instance.slug, instance.rating))
+    if isinstance(instance, Event):
+        return _entry(EVENT, (instance.pk, instance.name, instance.slug))
+    if instance.role != 'gourmand':
+        return None
+    profile = getattr(instance, 'gourmand_profile', None)
+    return _entry(GOURMAND, (instance.pk, instance.first_name, instance.last_name, instance.slug, getattr(profile, 'rating', 0)))
+
+
+def suggest(query, limit=DEFAULT_LIMIT, kinds=None):
+    """
+    Возвращает подсказки для начала названия.
+
+    Args:
+        query: Введённый текст.
+        limit: Наибольшее число подсказок.
+        kinds: Виды подсказок (по умолчанию все).
+
+    Returns:
+        Список словарей с видом, названием и адресом.
+    """
+    return [
+        {'kind': entry.kind, 'name': entry.name, 'url': reverse(URL_NAMES[entry.kind], args=[entry.slug])}
+        for entry in get_index().lookup(query, limit=limit, kinds=kinds)
+    ]
@@ -0,0 +1,102 @@
+# summaries.py
+# Этот файл содержит хранилище сводок отзывов (ReviewSummary).
+# Сводка сохраняется в базе под хэшем подготовленного текста отзывов, поэтому повторный анализ
+# того же набора отзывов возвращает готовый текст без обращения к языковой модели,
+# а сводки переживают перезапуск и видны всем воркерам.
+
+# Импортируем hashlib для хэша текста отзывов.
+import hashlib
+
+# Импортируем OuterRef и Subquery для последней сводки в выборке заведений.
+from django.db.models import OuterRef, Subquery
+
+# Импортируем модель сводок.
+from landing.models import ReviewSummary
+# Импортируем запрос к языковой модели и ответ, который не является сводкой.
+from landing.utils import analyze_reviews_with_chatgpt, SUMMARY_ERROR_MESSAGE
+
+
+def content_hash(reviews_data):
+    """
+    Возвращает хэш подготовленного текста отзывов.
+
+    Args:
+        reviews_data: Текст отзывов (результат prepare_reviews_data).
+
+    Returns:
+        Шестнадцатеричный SHA-256.
+    """
+    return hashlib.sha256(reviews_data.encode()).hexdigest()
+
+
+def find_summary(place, period, reviews_data):
+    """
+    Возвращает сохранённую сводку для того же набора отзывов, не обращаясь к языковой модели.
+
+    Args:
+        place: Заведение.
+        period: Период анализа ('1m', '3m', '6m').
+        reviews_data: Текст отзывов (результат prepare_reviews_data).
+
+    Returns:
+        ReviewSummary или None, если такой набор отзывов ещё не анализировался.
+    """
+    return ReviewSummary.objects.filter(place=place, period=period, content_hash=content_hash(reviews_data)).first()
+
+
+def latest_summary(place, period):
+    """
+    Возвращает последнюю сохранённую сводку за период, даже если отзывы с тех пор изменились.
+
+    Args:
+        place: Заведение.
+        period: Период анализа ('1m', '3m', '6m').
+
+    Returns:
+        ReviewSummary или None, если сводок ещё не было.
+    """
+    return ReviewSummary.objects.filter(place=place, period=period).first()
+
+
+def summarize_reviews(place, period, reviews_data):
+    """
+    Возвращает сводку отзывов, обращаясь к языковой модели только для нового набора отзывов.
+
+    Args:
+        place: Заведение.
+        period: Период анализа ('1m', '3m', '6m').
+        reviews_data: Текст отзывов (результат prepare_reviews_data).
+
+    Returns:
+        Кортеж (ReviewSummary или None, если модель не ответила; True, если сводка только что получена).
+    """
+    stored = find_summary(place, period, reviews_data)
+    if stored is not None:
+        return stored, False
+
+    summary_text = analyze_reviews_with_chatgpt(reviews_data, place.name)
+    # Ошибку не сохраняем, чтобы следующий запрос снова обратился к модели.
+    if summary_text == SUMMARY_ERROR_MESSAGE:
+        return None, False
+    # get_or_create: параллельный запрос мог сохранить ту же сводку раньше.
+    return ReviewSummary.objects.get_or_create(
+        place=place, period=period, content_hash=content_hash(reviews_data), defaults={'summary': summary_text},
+    )
+
+
+def with_latest_summary(queryset, period):
+    """
+    Добавляет к выборке заведений текст и время последней сводки за период.
+
+    Args:
+        queryset: Выборка заведений.
+        period: Период анализа ('1m', '3m', '6m').
+
+    Returns:
+        Выборка с аннотациями latest_summary и latest_summary_at (None, если сводок нет).
+    """
+    latest = ReviewSummary.objects.filter(place=OuterRef('pk'), period=period).order_by('-created_at')
+    return queryset.annotate(
+        latest_summary=Subquery(latest.values('summary')[:1]),
+        latest_summary_at=Subquery(latest.values('created_at')[:1]),
+    )
@@ -0,0 +1,187 @@
+# summarizer.py
+# Этот файл содержит сводку отзывов по схеме map-reduce для больших наборов отзывов.
+# Отзывы делятся на части с ограничением по числу токенов, каждая часть кратко конспектируется
+# отдельным запросом (части обрабатываются параллельно), затем конспекты сводятся в итоговую сводку.
+# Конспект части хранится в общем кэше под хэшем её текста. Границы частей определяются
+# содержимым отзывов, а не их позицией, поэтому новые отзывы меняют только последнюю часть,
+# а выпавшие из периода старые — только первую; остальные конспекты берутся из кэша.
+
+# Импортируем hashlib для границ частей и ключей кэша конспектов.
+import hashlib
+# Импортируем ThreadPoolExecutor и as_completed для параллельных запросов по частям.
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Импортируем настройки для предела параллельных запросов.
+from django.conf import settings
+# Импортируем общий кэш Django для конспектов частей.
+from django.core.cache import cache
+
+# Разделитель отзывов в подготовленном тексте (см. prepare_reviews_data).
+REVIEW_SEPARATOR = "\n---\n"
+# Грубая оценка числа символов на токен для русского текста (с запасом).
+CHARS_PER_TOKEN = 2
+# Предел токенов текста отзывов в одном запросе.
+CHUNK_TOKEN_BUDGET = 2000
+# Средний размер части в отзывах: граница ставится после отзыва, хэш которого делится на это число.
+CHUNK_BOUNDARY_EVERY = 8
+# Предел токенов ответа на конспект части и на итоговую сводку.
+MAP_MAX_TOKENS = 300
+REDUCE_MAX_TOKENS = 500
+# Время жизни конспекта части в кэше (секунды).
+CHUNK_CACHE_TIMEOUT = 60 * 60 * 24 * 30
+# Версия запросов: входит в ключ кэша, чтобы после изменения текста запросов конспекты собирались заново.
+PROMPT_VERSION = 1
+# Формат итоговой сводки (общий для сводки одним запросом и сведения конспектов).
+SUMMARY_FORMAT = (
+    "Составь краткую сводку в следующем формате:\n"
+    "- Средняя NPS-оценка: [укажи среднюю оценку]\n"
+    "- Положительные моменты: [что хвалят, какие теги чаще]\n"
+    "- Отрицательные моменты: [на что жалуются, какие теги связаны]\n"
+    "- Рекомендации: [1-2 рекомендации для улучшения]\n\n"
+)
+
+
+def estimate_tokens(text):
+    """
+    Оценивает число токенов текста без токенизатора модели.
+
+    Args:
+        text: Текст запроса.
+
+    Returns:
+        Оценка сверху числа токенов.
+    """
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _is_boundary(entry):
+    # Граница после отзыва зависит только от его текста.
+    return int(hashlib.md5(entry.encode()).hexdigest(), 16) % CHUNK_BOUNDARY_EVERY == 0
+
+
+def chunk_reviews(reviews_data, token_budget=CHUNK_TOKEN_BUDGET):
+    """
+    Делит подготовленный текст отзывов на части не больше token_budget токенов.
+
+    Args:
+        reviews_data: Текст отзывов (результат prepare_reviews_data).
+        token_budget: Предел токенов одной части.
+
+    Returns:
+        Список текстов частей в исходном порядке отзывов.
+    """
+    max_chars = token_budget * CHARS_PER_TOKEN
+    chunks, current, current_tokens = [], [], 0
+    for entry in reviews_data.split(REVIEW_SEPARATOR):
+        # Отзыв, который сам не помещается в часть, обрезается.
+        if estimate_tokens(entry) > token_budget:
+            entry = entry[:max_chars - 20] + "... (обрезано)"
+        # Учитываем и разделитель, который встанет перед следующим отзывом.
+        entry_tokens = estimate_tokens(entry + REVIEW_SEPARATOR)
+        if current and current_tokens + entry_tokens > token_budget:
+            chunks.append(REVIEW_SEPARATOR.join(current))
+            current, current_tokens = [], 0
+        current.append(entry)
+        current_tokens += entry_tokens
+        if _is_boundary(entry):
+            chunks.append(REVIEW_SEPARATOR.join(current))
+            current, current_tokens = [], 0
+    if current:
+        chunks.append(REVIEW_SEPARATOR.join(current))
+    return chunks
+
+
+def _summary_prompt(place_name, reviews_data):
+    return (
+        f"Проанализируй отзывы о заведении '{place_name}' за выбранный период. "
+        "Каждый отзыв включает текст, NPS-оценку (от 1 до 10), теги (например, 'Кухня', 'Обслуживание') и рейтинги (положительный и отрицательный). "
+        f"{SUMMARY_FORMAT}"
+        f"Вот данные:\n\n{reviews_data}\n\n"
+        "Ответ должен быть на русском языке и не превышать 200 слов."
+    )
+
+
+def _map_prompt(place_name, chunk):
+    return (
+        f"Ниже часть отзывов о заведении '{place_name}'. "
+        "Каждый отзыв включает текст, NPS-оценку (от 1 до 10), теги и рейтинги. "
+        "Составь конспект этой части: количество отзывов, средняя NPS-оценка, что хвалят, на что жалуются, "
+        "какие теги встречаются чаще.\n\n"
+        f"Отзывы:\n\n{chunk}\n\n"
+        "Ответ на русском языке, не более 120 слов."
+    )
+
+
+def _reduce_prompt(place_name, notes):
+    joined = REVIEW_SEPARATOR.join(f"Часть {number}:\n{note}" for number, note in enumerate(notes, start=1))
+    return (
+        f"Ниже конспекты частей отзывов о заведении '{place_name}' за выбранный период "
+        "(в каждом — количество отзывов и средняя NPS-оценка части). "
+        "Объедини их, учитывая размер частей. "
+        f"{SUMMARY_FORMAT}"
+        f"Конспекты:\n\n{joined}\n\n"
+        "Ответ должен быть на русском языке и не превышать 200 слов."
+    )
+
+
+def _chunk_cache_key(place_name, chunk):
+    digest = hashlib.sha256(f"{PROMPT_VERSION}:{place_name}:{chunk}".encode()).hexdigest()
+    return f"summary-chunk:{digest}"
+
+
+def _map(chunks, place_name, complete):
+    # Конспекты частей: из кэша или параллельными запросами для отсутствующих.
+    keys = [_chunk_cache_key(place_name, chunk) for chunk in chunks]
+    found = cache.get_many(keys)
+    missing = [index for index, key in enumerate(keys) if key not in found]
+    if not missing:
+        return [found[key] for key in keys]
+
+    errors = []
+    with ThreadPoolExecutor(max_workers=min(settings.SUMMARY_MAP_CONCURRENCY, len(missing))) as executor:
+        futures = {
+            executor.submit(complete, _map_prompt(place_name, chunks[index]), MAP_MAX_TOKENS): index
+            for index in missing
+        }
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                note = future.result()
+            except Exception as exc:
+                errors.append(exc)
+                continue
+            # Удачные конспекты сохраняем, даже если другая часть не удалась: повтор запросит только её.
+            cache.set(keys[index], note, CHUNK_CACHE_TIMEOUT)
+            found[keys[index]] = note
+    if errors:
+        raise errors[0]
+    return [found[key] for key in keys]
+
+
+def summarize_map_reduce(reviews_data, place_name, complete):
+    """
+    Составляет сводку отзывов: одним запросом, если текст помещается, иначе по частям.
+
+    Args:
+        reviews_data: Текст отзывов (результат prepare_reviews_data).
+        place_name: Название заведения.
+        complete: Функция (prompt, max_tokens) -> текст ответа языковой модели.
+
+    Returns:
+        Текст итоговой сводки.
+    """
+    if estimate_tokens(reviews_data) <= CHUNK_TOKEN_BUDGET:
+        return complete(_summary_prompt(place_name, reviews_data), REDUCE_MAX_TOKENS)
+
+    notes = _map(chunk_reviews(reviews_data), place_name, complete)
+    # Если конспектов слишком много для одного запроса, конспектируем их ещё раз тем же способом.
+    while len(notes) > 1 and estimate_tokens(REVIEW_SEPARATOR.join(notes)) > CHUNK_TOKEN_BUDGET:
+        chunks = chunk_reviews(REVIEW_SEPARATOR.join(notes))
+        if len(chunks) >= len(notes):
+            # Конспекты длиннее MAP_MAX_TOKENS (модель не уложилась в предел): по одному в части они
+            # не сокращаются, и цикл не закончился бы. Обрезаем каждый до равной доли бюджета.
+            share = CHUNK_TOKEN_BUDGET * CHARS_PER_TOKEN // len(notes)
+            notes = [note[:share] for note in notes]
+            break
+        notes = _map(chunks, place_name, complete)
+    return complete(_reduce_prompt(place_name, notes), REDUCE_MAX_TOKENS)
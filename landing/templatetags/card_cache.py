@@ -0,0 +1,71 @@
+# card_cache.py
+# Этот файл определяет тег шаблона cachedcard для кэширования HTML карточек в списках.
+# Ключ фрагмента включает вид и id сущности, её текущую версию (см. landing/cache.py)
+# и дополнительные значения vary_on, поэтому изменение сущности сразу даёт новый ключ.
+
+# Импортируем модуль template из Django, который нужен для работы с шаблонами.
+from django import template
+# Импортируем общий кэш Django.
+from django.core.cache import cache
+
+# Импортируем версионированные ключи и счётчики попаданий.
+from landing import cache as versioned_cache
+
+# Создаём объект библиотеки шаблонов, который будет регистрировать наш тег.
+register = template.Library()
+
+# Время жизни фрагмента карточки (секунды).
+CARD_TIMEOUT = 60 * 60
+
+
+class CachedCardNode(template.Node):
+    # Узел шаблона: отдаёт фрагмент из кэша или отрисовывает и сохраняет его.
+    def __init__(self, nodelist, kind, object_id, vary_on):
+        self.nodelist = nodelist
+        self.kind = kind
+        self.object_id = object_id
+        self.vary_on = vary_on
+
+    def render(self, context):
+        kind = self.kind.resolve(context)
+        key = versioned_cache.fragment_key(
+            kind,
+            self.object_id.resolve(context),
+            [value.resolve(context) for value in self.vary_on],
+        )
+        html = cache.get(key)
+        versioned_cache.record_fragment(kind, html is not None)
+        if html is None:
+            html = self.nodelist.render(context)
+            cache.set(key, html, CARD_TIMEOUT)
+        return html
+
+
+# Регистрируем тег cachedcard с помощью декоратора @register.tag.
+@register.tag('cachedcard')
+def do_cachedcard(parser, token):
+    """
+    Кэширует содержимое блока как карточку сущности.
+
+    Args:
+        parser: Парсер шаблона.
+        token: Токен тега с аргументами.
+
+    Returns:
+        CachedCardNode с содержимым блока.
+
+    Example:
+        В шаблоне: {% cachedcard 'place' place.id user.id %} ... {% endcachedcard %}
+        Первый аргумент — вид сущности, второй — её id, остальные — значения vary_on.
+    """
+    bits = token.split_contents()
+    if len(bits) < 3:
+        raise template.TemplateSyntaxError(f"Тег '{bits[0]}' требует вид сущности и её id.")
+    nodelist = parser.parse(('endcachedcard',))
+    parser.delete_first_token()
+    return CachedCardNode(
+        nodelist,
+        parser.compile_filter(bits[1]),
+        parser.compile_filter(bits[2]),
+        [parser.compile_filter(bit) for bit in bits[3:]],
+    )
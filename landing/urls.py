@@ -21,10 +21,20 @@ urlpatterns = [
     path('reviews/', views.reviews, name='reviews'),
     path('reviews/create/', views.create_review, name='create_review'),
     path('reviews/<slug:slug>/vote/<str:vote_type>/', views.vote_review, name='vote_review'),
+    path('api/reviews/<slug:slug>/vote/<str:vote_type>/', views.vote_review_api, name='vote_review_api'),
+    path('api/cache/stats/', views.cache_stats, name='cache_stats'),
+    path('api/llm/stats/', views.llm_stats, name='llm_stats'),
     path('reviews/<slug:slug>/', views.review, name='review'),
     path('contacts/', views.contacts, name='contacts'),
+    path('search/', views.search, name='search'),
+    path('api/suggest/', views.suggest, name='suggest'),
+    path('api/places/', views.places_api, name='places_api'),
+    path('api/reviews/', views.reviews_api, name='reviews_api'),
+    path('api/events/', views.events_api, name='events_api'),
+    path('api/gourmands/', views.gourmands_api, name='gourmands_api'),
     path('gourmands/', views.gourmands, name='gourmands'),
     path('gourmands/<slug:slug>/', views.gourmand, name='gourmand'),
     path('gourmands/<slug:slug>/reviews/', views.gourmand_reviews, name='gourmand_reviews'),
     path('profile/<int:place_id>/', views.analyze_reviews, name='analyze_reviews'),
+    path('api/summary-jobs/<int:job_id>/', views.summary_job_status, name='summary_job_status'),
 ]
\ No newline at end of file
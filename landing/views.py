@@ -1,16 +1,16 @@
 from datetime import datetime # Импортируем класс datetime для работы с датами и временем
-from django.core.cache import cache # Импортируем систему кэширования Django для временного хранения данных
 from dateutil.relativedelta import relativedelta # Импортируем relativedelta для удобных манипуляций с датами (например, вычитание месяцев)
 from django.conf import settings # Импортируем объект settings для доступа к настройкам проекта Django
 from django.contrib.auth import authenticate, login, logout # Функции для аутентификации, входа и выхода пользователей
 from django.contrib.auth.decorators import login_required # Декоратор для ограничения доступа к представлениям только для авторизованных пользователей
+from django.contrib.admin.views.decorators import staff_member_required # Декоратор для ограничения доступа только для персонала
+from django.db import transaction # Транзакции для атомарной записи связанных объектов
 from django.db.models import Count, Avg # Функции агрегации Django ORM для подсчета и вычисления среднего значения
-from django.http import HttpResponseBadRequest # Класс для ответа с HTTP статусом 400 (неверный запрос)
+from django.http import HttpResponseBadRequest, JsonResponse # Ответ с HTTP статусом 400 (неверный запрос) и JSON-ответ для AJAX
 from django.shortcuts import render, get_object_or_404, redirect # Стандартные шорткаты Django: render для отображения шаблонов, get_object_or_404 для получения объекта или ошибки 404, redirect для перенаправления
 import logging # Стандартная библиотека Python для логирования событий
 from django.core.paginator import Paginator # Класс для разбиения длинных списков объектов на страницы (пагинация)
 from django.views.decorators.http import require_POST # Декоратор для ограничения доступа к представлению только POST-запросами
-from django.db.models import Q # Объект Q для создания сложных ORM-запросов с условиями ИЛИ/И
 from django.urls import reverse # Функция для получения URL по имени маршрута (name в urls.py)
 from django.contrib import messages # Функция для отправки сообщений
 
@@ -20,11 +20,23 @@ from django.utils import timezone # Утилиты Django для работы с
 from landing.forms import SignupForm, PlaceCreateForm, ReviewCreateForm, \
     EventCreateForm # Импортируем кастомные формы из приложения 'landing'
 from landing.models import Review, Event, Place, User, GourmandProfile, OwnerProfile, ReviewImage, PlaceImage, \
-    ReviewVote, EventImage, NPSResponse # Импортируем модели из приложения 'landing'
+    ReviewVote, EventImage, NPSResponse, OwnerDashboardSnapshot, SummaryJob # Импортируем модели из приложения 'landing'
 from django.core.mail import send_mail # Функция для отправки электронной почты
 from django.http import HttpResponse # Класс для простого HTTP-ответа (например, для тестовых сообщений)
 
-from landing.utils import get_reviews_for_last_month, analyze_reviews_with_chatgpt, prepare_reviews_data, get_tag_stats # Импортируем вспомогательные функции из utils.py
+from landing.utils import get_reviews_for_last_month, prepare_reviews_data, REVIEW_ITERATOR_CHUNK_SIZE, SUMMARY_ERROR_MESSAGE # Импортируем вспомогательные функции из utils.py
+from landing.nps import NPSCounts, calculate_nps, cached_metrics_for_places, month_periods # Сервис NPS-метрик по заведениям
+from landing.votes import VOTE_TYPES, cast_vote # Атомарное голосование за отзывы
+from landing.covers import with_cover_image # Обложки карточек одним подзапросом
+from landing.cache import fragment_stats # Счётчики попаданий кэша карточек
+from landing.dashboards import DEFAULT_PERIOD, snapshots_for_places # Готовые снимки профиля владельца
+from landing.summaries import find_summary, latest_summary, with_latest_summary # Сохранённые сводки отзывов
+from landing.jobs import enqueue_summary_job, job_status, with_active_summary_job, STALE_SUMMARY_NOTE # Фоновые задания на сводку отзывов
+from landing import search as search_index # Полнотекстовый поиск по заведениям, отзывам и мероприятиям
+from landing import suggest as suggest_index # Подсказки поиска из индекса в памяти процесса
+from landing.llm import get_gateway # Шлюз к языковой модели (состояние предохранителя и счётчики)
+from landing import cache as versioned_cache # Виды сущностей для версий наборов (кэшированное число объектов в списках)
+from landing.pagination import Ordering, InvalidCursor, paginate, cached_count # Курсорная пагинация списков
 
 # Представление для главной страницы (возможно, лендинга)
 def index(request):
@@ -111,21 +123,15 @@ def profile(request):
     elif user.is_owner(): # Проверяет, является ли пользователь владельцем заведения
         owner_profile_obj, _ = OwnerProfile.objects.get_or_create(user=user) # Получает или создает профиль владельца для пользователя
 
-        period = request.GET.get('period', '1m') # Получает параметр 'period' из GET-запроса (по умолчанию '1m' - 1 месяц)
+        period = request.GET.get('period', DEFAULT_PERIOD) # Получает параметр 'period' из GET-запроса (по умолчанию '1m' - 1 месяц)
         sort_by = request.GET.get('sort_by', 'name') # Получает параметр сортировки 'sort_by' (по умолчанию 'name' - по названию)
 
-        if period == '3m': # Если выбран период 3 месяца
-            days = 90 # Устанавливаем количество дней для фильтрации
-        elif period == '6m': # Если выбран период 6 месяцев
-            days = 180 # Устанавливаем количество дней
-        else: # '1m' или значение по умолчанию
-            days = 30 # Устанавливаем 30 дней
+        if period not in OwnerDashboardSnapshot.PERIOD_DAYS: # Неизвестный период заменяем периодом по умолчанию
+            period = DEFAULT_PERIOD
 
-        today = timezone.now() # Текущая дата и время с учетом часового пояса
-        current_month_start = today.replace(day=1, hour=0, minute=0, second=0, microsecond=0) # Начало текущего месяца
-        last_month_start = current_month_start - relativedelta(months=1) # Начало прошлого месяца
-        # Корректное определение конца прошлого месяца (до начала текущего месяца, не включая его)
-        last_month_end = current_month_start - timezone.timedelta(microseconds=1)
+        periods = month_periods() # Окна текущего и прошлого месяца для NPS-метрик
+        current_month_start = periods['current'].start # Начало текущего месяца
+        last_month_start = periods['last'].start # Начало прошлого месяца
 
         places_query = Place.objects.filter(owner=user) # Изначальный queryset для заведений, принадлежащих текущему владельцу
 
@@ -133,133 +139,36 @@ def profile(request):
         if sort_by == 'rating': # Если сортировка по рейтингу
             places_query = places_query.order_by('-rating') # Сортировка по убыванию рейтинга (от большего к меньшему)
         elif sort_by == 'reviews': # Если сортировка по количеству отзывов
-            # Аннотируем (добавляем вычисляемое поле) количество отзывов для каждого заведения и сортируем по нему
-            places_query = places_query.annotate(num_reviews_calculated=Count('review')).order_by('-num_reviews_calculated')
+            # Сортировка по поддерживаемому счётчику отзывов (индекс, без JOIN с отзывами)
+            places_query = places_query.order_by('-review_count')
         else: # 'name' (по умолчанию) или любое другое значение
             places_query = places_query.order_by('name') # Сортировка по названию заведения (по алфавиту)
 
         place_stats_data = {} # Словарь для хранения статистики по каждому заведению владельца
 
-        if places_query.exists(): # Если у владельца есть заведения
-            for place in places_query: # Итерация по каждому заведению
-                # Расчет общего NPS для заведения
-                total_responses = NPSResponse.objects.filter(review__place=place).count() # Общее количество NPS ответов
-                promoters = NPSResponse.objects.filter(review__place=place, score__gte=9).count() # Количество "промоутеров" (оценка 9-10)
-                detractors = NPSResponse.objects.filter(review__place=place, score__lte=6).count() # Количество "детракторов" (оценка 0-6)
-                nps = ( # Расчет NPS (Net Promoter Score)
-                    (promoters / total_responses * 100) - (detractors / total_responses * 100)
-                ) if total_responses > 0 else 0 # Расчет, если есть ответы, иначе NPS = 0
-
-                # Расчет NPS за текущий месяц
-                current_total = NPSResponse.objects.filter(
-                    review__place=place,
-                    created_at__gte=current_month_start # Ответы, созданные начиная с начала текущего месяца
-                ).count()
-                current_promoters = NPSResponse.objects.filter(
-                    review__place=place,
-                    created_at__gte=current_month_start,
-                    score__gte=9
-                ).count()
-                current_detractors = NPSResponse.objects.filter(
-                    review__place=place,
-                    created_at__gte=current_month_start,
-                    score__lte=6
-                ).count()
-                current_nps = ( # Расчет NPS за текущий месяц
-                    (current_promoters / current_total * 100) - (current_detractors / current_total * 100)
-                ) if current_total > 0 else None # None, если нет ответов в текущем месяце
-
-                # Расчет NPS за прошлый месяц
-                last_total = NPSResponse.objects.filter(
-                    review__place=place,
-                    created_at__gte=last_month_start, # Ответы, созданные начиная с начала прошлого месяца
-                    created_at__lte=last_month_end    # и до конца прошлого месяца
-                ).count()
-                last_promoters = NPSResponse.objects.filter(
-                    review__place=place,
-                    created_at__gte=last_month_start,
-                    created_at__lte=last_month_end,
-                    score__gte=9
-                ).count()
-                last_detractors = NPSResponse.objects.filter(
-                    review__place=place,
-                    created_at__gte=last_month_start,
-                    created_at__lte=last_month_end,
-                    score__lte=6
-                ).count()
-                last_nps = ( # Расчет NPS за прошлый месяц
-                    (last_promoters / last_total * 100) - (last_detractors / last_total * 100)
-                ) if last_total > 0 else None # None, если нет ответов в прошлом месяце
-
-                # Статистика по тегам (топ-3 за все время)
-                tag_stats_list = NPSResponse.objects.filter(review__place=place).values('tags__label').annotate( # Группировка по меткам тегов
-                    tag_count=Count('tags__label') # Подсчет количества каждого тега
-                ).order_by('-tag_count')[:3] # Сортировка по убыванию количества и выбор первых трех
-
-                # Статистика по тегам за текущий месяц
-                current_month_tags_list = NPSResponse.objects.filter(
-                    review__place=place,
-                    created_at__gte=current_month_start
-                ).values('tags__label').annotate(
-                    tag_count=Count('tags__label')
-                ).order_by('-tag_count')
-
-                # Статистика по тегам за прошлый месяц
-                last_month_tags_list = NPSResponse.objects.filter(
-                    review__place=place,
-                    created_at__gte=last_month_start,
-                    created_at__lte=last_month_end
-                ).values('tags__label').annotate(
-                    tag_count=Count('tags__label')
-                ).order_by('-tag_count')
-
-                tag_dynamics_dict = {} # Словарь для хранения динамики тегов (изменение количества упоминаний)
-                # Собираем все уникальные теги, которые встречались в текущем или прошлом месяце
-                all_tags_for_dynamics = set( # Используем set для автоматического удаления дубликатов
-                    [t['tags__label'] for t in current_month_tags_list if t['tags__label']] + # Теги текущего месяца (исключая None)
-                    [t['tags__label'] for t in last_month_tags_list if t['tags__label']]      # Теги прошлого месяца (исключая None)
-                )
-                for tag_label in all_tags_for_dynamics: # Для каждого уникального тега
-                    # Находим количество упоминаний в текущем месяце (0, если тег не найден)
-                    current_count = next((t['tag_count'] for t in current_month_tags_list if t['tags__label'] == tag_label), 0)
-                    # Находим количество упоминаний в прошлом месяце (0, если тег не найден)
-                    last_count = next((t['tag_count'] for t in last_month_tags_list if t['tags__label'] == tag_label), 0)
-                    tag_dynamics_dict[tag_label] = { # Сохраняем данные по тегу
-                        'current': current_count, # Количество в текущем месяце
-                        'last': last_count,       # Количество в прошлом месяце
-                        'change': current_count - last_count # Изменение (динамика)
-                    }
-
-                # Получение отзывов за выбранный период (1, 3 или 6 месяцев)
-                period_reviews_qs = get_reviews_for_last_month(place, days=days)
-                # Получение статистики по тегам для этих отзывов
-                period_tag_stats_dict = get_tag_stats(period_reviews_qs)
-
-                # ---> НАЧАЛО: ИЗВЛЕЧЕНИЕ СВОДКИ ИЗ КЭША <---
-                summary_cache_key = f"review_summary_{place.id}_{period}" # Формируем ключ для кэша (уникальный для заведения и периода)
-                summary_from_cache = cache.get(summary_cache_key) # Пытаемся получить сводку из кэша
-                logger.debug(f"PROFILE: For place {place.name} (ID: {place.id}), period {period}, trying cache key {summary_cache_key}. Found: {summary_from_cache is not None}") # Логируем попытку получения из кэша
-                # ---> КОНЕЦ: ИЗВЛЕЧЕНИЕ СВОДКИ ИЗ КЭША <---
-
-                place_stats_data[place.id] = { # Сохраняем всю собранную статистику для данного заведения
-                    'place': place, # Объект заведения
-                    'nps': nps, # Общий NPS
-                    'total_responses': total_responses, # Общее количество NPS ответов
-                    'current_nps': current_nps, # NPS за текущий месяц
-                    'last_nps': last_nps, # NPS за прошлый месяц
-                    'tag_stats': tag_stats_list, # Топ-3 тегов за все время
-                    'tag_dynamics': tag_dynamics_dict, # Динамика тегов (текущий vs прошлый месяц)
-                    'period_tag_stats': period_tag_stats_dict, # Статистика тегов за выбранный период (1/3/6 мес)
-                    'summary': summary_from_cache,  # <--- ДОБАВЛЯЕМ СВОДКУ (полученную из кэша) В КОНТЕКСТ ЗАВЕДЕНИЯ
-                }
-
-        # Расчет среднего NPS по всем заведениям владельца
-        avg_nps_total_responses = NPSResponse.objects.filter(review__place__owner=user).count() # Всего NPS ответов по всем заведениям владельца
-        avg_nps_total_promoters = NPSResponse.objects.filter(review__place__owner=user, score__gte=9).count() # Всего промоутеров
-        avg_nps_total_detractors = NPSResponse.objects.filter(review__place__owner=user, score__lte=6).count() # Всего детракторов
-        average_nps_calculated = ( # Расчет среднего NPS
-            (avg_nps_total_promoters / avg_nps_total_responses * 100) - (avg_nps_total_detractors / avg_nps_total_responses * 100)
-        ) if avg_nps_total_responses > 0 else 0 # Расчет, если есть ответы, иначе 0
+        # Заведения владельца с последней сводкой и незавершённым заданием на сводку за период, их изображения (для карусели) — двумя запросами
+        owned_places = list(with_active_summary_job(with_latest_summary(places_query, period), period).prefetch_related('images'))
+        # NPS и теги всех заведений из готовых снимков; пересобираются только отсутствующие и слишком старые
+        snapshots = snapshots_for_places([place.id for place in owned_places], period)
+
+        for place in owned_places: # Итерация по каждому заведению
+            snapshot = snapshots[place.id] # Снимок метрик заведения за выбранный период
+
+            place_stats_data[place.id] = { # Сохраняем всю собранную статистику для данного заведения
+                **snapshot.data, # NPS (общий, за текущий и прошлый месяц), топ тегов, динамика тегов и теги за период
+                'place': place, # Объект заведения
+                'computed_at': snapshot.computed_at, # Время расчёта снимка
+                'summary': place.latest_summary, # Последняя сохранённая сводка отзывов за период
+                'summary_at': place.latest_summary_at, # Время получения сводки
+                'summary_job': place.active_summary_job, # ID незавершённого задания на сводку (для опроса состояния)
+            }
+
+        # Средний NPS по всем заведениям владельца считается из счётчиков заведений, без новых запросов
+        average_nps_calculated = calculate_nps(
+            sum(place.promoter_count for place in owned_places),
+            sum(place.detractor_count for place in owned_places),
+            sum(place.nps_count for place in owned_places),
+        )
 
         context = { # Формируем контекст для передачи в шаблон
             'user': user, # Текущий пользователь
@@ -268,6 +177,8 @@ def profile(request):
             'current_month': current_month_start.strftime('%B %Y'), # Текущий месяц и год в формате "Май 2025"
             'last_month': last_month_start.strftime('%B %Y'), # Прошлый месяц и год
             'average_nps': average_nps_calculated, # Средний NPS по всем заведениям
+            # Время расчёта самого старого из показанных снимков (возраст данных на странице)
+            'snapshot_computed_at': min((snapshot.computed_at for snapshot in snapshots.values()), default=None),
             'period': period, # Выбранный период для отображения (чтобы сохранить состояние фильтра)
             'sort_by': sort_by, # Выбранный параметр сортировки (для сохранения состояния)
         }
@@ -327,25 +238,112 @@ def signout(request):
     logout(request) # Выполняет выход пользователя (удаляет сессию)
     return redirect("index") # Перенаправляет на главную страницу
 
-# Представление для отображения списка всех событий
-def events(request):
-    events_list = Event.objects.all() # Получает все объекты Event из базы данных
+# Число объектов на странице списков заведений, отзывов, мероприятий и гурманов
+LIST_PAGE_SIZE = 12
+
+# Порядки сортировки списков для курсорной пагинации (последний столбец — уникальный id)
+EVENT_ORDERINGS = {
+    'id': Ordering(Event, 'id'),
+    'date': Ordering(Event, 'event_date', 'id'), # Сначала ближайшие, мероприятия без даты — в конце
+    'name': Ordering(Event, 'name', 'id'),
+}
+PLACE_ORDERINGS = {
+    'id': Ordering(Place, 'id'),
+    'name': Ordering(Place, 'name', 'id'),
+    'rating': Ordering(Place, '-rating', '-id'), # По убыванию рейтинга
+}
+REVIEW_ORDERINGS = {
+    'id': Ordering(Review, 'id'),
+    'date': Ordering(Review, '-review_date', '-id'), # Сначала новые
+    'name': Ordering(Review, 'name', 'id'),
+}
+GOURMAND_ORDERINGS = {
+    'id': Ordering(GourmandProfile, 'id'),
+    'rating': Ordering(GourmandProfile, '-rating', '-id'), # По убыванию рейтинга
+    'experience': Ordering(GourmandProfile, 'user__date_joined', 'id'), # Сначала зарегистрированные раньше
+    'reviews': Ordering(GourmandProfile, '-review_count', '-id'), # По убыванию числа отзывов
+}
+
+
+def _list_page(params, queryset, ordering, kinds, *vary_on):
+    """
+    Читает страницу списка по курсору из параметра 'cursor' и добавляет приблизительное число объектов.
+
+    Args:
+        params: Параметры запроса (cursor, фильтры и сортировка).
+        queryset: Выборка списка с применёнными фильтрами.
+        ordering: Порядок сортировки (Ordering).
+        kinds: Виды сущностей, от которых зависит число объектов.
+        vary_on: Параметры фильтра для ключа кэшированного числа.
+
+    Returns:
+        Страница CursorPage со ссылками на соседние страницы.
+
+    Raises:
+        InvalidCursor: Курсор повреждён или выдан для другой сортировки.
+    """
+    page = paginate(queryset, ordering, params.get('cursor') or None, LIST_PAGE_SIZE)
+    page.count = cached_count(queryset, kinds, *vary_on) # Число объектов из кэша, без COUNT(*) на каждый запрос
+    page.set_links(params) # Ссылки сохраняют фильтры и сортировку
+    return page
+
+
+def _list_html_page(request, queryset, ordering, kinds, *vary_on):
+    # Для страниц сайта неверный курсор (устаревшая ссылка) означает первую страницу, а не ошибку.
+    try:
+        return _list_page(request.GET, queryset, ordering, kinds, *vary_on)
+    except InvalidCursor:
+        params = request.GET.copy() # Параметры запроса без курсора
+        params.pop('cursor', None)
+        return _list_page(params, queryset, ordering, kinds, *vary_on)
+
+
+def _list_json(request, page, serialize, **extra):
+    # Ответ JSON-страницы списка для бесконечной прокрутки; extra — дополнительные поля ответа.
+    return JsonResponse({
+        'results': [serialize(obj) for obj in page], # Объекты страницы
+        'next': page.next_query and request.path + page.next_query, # Адрес следующей страницы (None — список закончился)
+        'next_cursor': page.next_cursor, # Курсор следующей страницы
+        'previous_cursor': page.previous_cursor, # Курсор предыдущей страницы
+        'approximate_count': page.count, # Приблизительное общее число объектов
+        **extra,
+    })
+
+
+def _events_list(request):
+    # Выборка мероприятий с фильтром по заведению, порядок сортировки и параметры для шаблона
+    # Получает все события вместе с заведением и путём к обложке (без запросов на каждую карточку)
+    events_list = with_cover_image(Event.objects.select_related('place'), EventImage, 'event')
 
     # Фильтр по заведению (если параметр 'place' передан в GET-запросе)
     place_slug = request.GET.get('place')  # Получаем слаг заведения из GET-параметра
     if place_slug: # Если слаг заведения указан
         events_list = events_list.filter(place__slug=place_slug)  # Фильтруем события по слагу связанного заведения
 
-    # Сортировка (если параметр 'sort' передан в GET-запросе)
+    # Сортировка (если параметр 'sort' передан в GET-запросе); неизвестное значение — по 'id'
     sort_by = request.GET.get('sort', 'id') # По умолчанию сортировка по 'id'
-    if sort_by == 'date': # Если сортировка по дате
-        events_list = events_list.order_by('event_date')  # Сортировка по полю 'event_date' (по возрастанию)
-    elif sort_by == 'name': # Если сортировка по названию
-        events_list = events_list.order_by('name') # Сортировка по полю 'name' (по алфавиту)
+    if sort_by not in EVENT_ORDERINGS:
+        sort_by = 'id'
+    return events_list, EVENT_ORDERINGS[sort_by], place_slug, sort_by
+
+
+def _event_item(event):
+    # Мероприятие в JSON-странице списка
+    return {
+        'id': event.id,
+        'name': event.name,
+        'url': reverse('event', args=[event.slug]),
+        'event_date': event.event_date.isoformat() if event.event_date else None,
+        'place': event.place.name,
+        'cover_image': event.cover_image_url,
+    }
 
-    paginator = Paginator(events_list, 12) # Создаем объект Paginator, отображая по 12 событий на странице
-    page_number = request.GET.get('page') # Получаем номер текущей страницы из GET-запроса
-    events_page = paginator.get_page(page_number) # Получаем объект страницы с нужными событиями
+
+# Представление для отображения списка всех событий
+def events(request):
+    events_list, ordering, place_slug, sort_by = _events_list(request) # Мероприятия с фильтром и порядком сортировки
+    # Страница по курсору: условие «после последней строки» по индексу вместо OFFSET
+    events_page = _list_html_page(request, events_list, ordering, (versioned_cache.EVENT,), place_slug)
 
     places = Place.objects.all() # Получаем все заведения для использования в фильтре на странице
     return render(request, 'events/events.html', { # Отображаем шаблон списка событий
@@ -371,10 +369,10 @@ def create_event(request):
         if form.is_valid(): # Если форма валидна
             event = form.save(commit=False) # Сохраняет данные формы, но пока не коммитит в базу (commit=False)
             event.owner = request.user # Присваивает текущего пользователя как владельца события
-            event.save() # Теперь сохраняет событие в базу данных
-            if 'images' in request.FILES: # Если были загружены изображения для события
-                for image in request.FILES.getlist('images'): # Для каждого загруженного файла изображения
-                    EventImage.objects.create(event=event, image=image) # Создает объект EventImage и связывает его с событием
+            with transaction.atomic(): # Событие и изображения фиксируются вместе (карточка сбрасывается после коммита)
+                event.save() # Теперь сохраняет событие в базу данных
+                # Создает объекты EventImage для всех загруженных изображений одной вставкой
+                EventImage.objects.bulk_create([EventImage(event=event, image=image) for image in request.FILES.getlist('images')])
             return redirect("event", slug=event.slug) # Перенаправляет на страницу созданного события
         # Если форма не валидна, возвращаем ее с ошибками
         return render(request, "events/create.html", {"form": form})
@@ -383,38 +381,102 @@ def create_event(request):
     return render(request, "events/create.html", {"form": form}) # Отображаем страницу создания события с пустой формой
 
 
-# Представление для отображения списка всех заведений
-def places(request):
+# JSON-страница списка мероприятий для бесконечной прокрутки (параметры те же, что у страницы списка)
+def events_api(request):
+    events_list, ordering, place_slug, _ = _events_list(request)
+    try:
+        page = _list_page(request.GET, events_list, ordering, (versioned_cache.EVENT,), place_slug)
+    except InvalidCursor as exc: # Повреждённый или чужой курсор
+        return JsonResponse({'error': str(exc)}, status=400)
+    return _list_json(request, page, _event_item)
+
+
+def _places_list(request):
+    # Выборка заведений с поиском, порядок сортировки и параметры для шаблона
     query = request.GET.get('q', '').strip() # Получает поисковый запрос 'q' из GET-параметров, удаляет пробелы по краям, по умолчанию пустая строка
     sort_by = request.GET.get('sort', 'id') # Получает параметр сортировки, по умолчанию 'id'
+    if sort_by not in PLACE_ORDERINGS: # Неизвестная сортировка — по ID
+        sort_by = 'id'
 
-    places_list = Place.objects.all() # Изначально получаем все заведения
+    # Изначально получаем все заведения вместе с владельцем и путём к обложке (без запросов на каждую карточку)
+    places_list = with_cover_image(Place.objects.select_related('owner'), PlaceImage, 'place')
 
     # Фильтрация по поисковому запросу
+    truncated = False # Найдено больше MAX_RESULTS: в списке только самые релевантные (страница сообщает об этом)
     if query: # Если поисковый запрос не пустой
-        places_list = places_list.filter(Q(name__icontains=query)) # Фильтруем по названию (регистронезависимый поиск части строки)
-                                                                  # Q-объект здесь избыточен для одного условия, но полезен для будущих ИЛИ
+        # Ищем по поисковому индексу (название, описание, адрес; без учёта регистра и формы слова).
+        # Лишний id показывает, что совпадений больше предела.
+        place_ids = search_index.search_ids(query, search_index.PLACE, limit=search_index.MAX_RESULTS + 1)
+        truncated = len(place_ids) > search_index.MAX_RESULTS
+        places_list = places_list.filter(id__in=place_ids[:search_index.MAX_RESULTS]) # Оставляем только найденные заведения
+
+    return places_list, PLACE_ORDERINGS[sort_by], query, sort_by, truncated
+
+
+def _place_item(place):
+    # Заведение в JSON-странице списка
+    return {
+        'id': place.id,
+        'name': place.name,
+        'url': reverse('place', args=[place.slug]),
+        'rating': str(place.rating),
+        'cover_image': place.cover_image_url,
+    }
 
-    # Сортировка
-    if sort_by == 'name': # Если сортировка по названию
-        places_list = places_list.order_by('name') # Сортируем по названию (алфавитный порядок)
-    elif sort_by == 'rating': # Если сортировка по рейтингу
-        places_list = places_list.order_by('-rating') # Сортируем по убыванию рейтинга
-    else: # По умолчанию (или если sort_by == 'id')
-        places_list = places_list.order_by('id') # Сортируем по ID
-
-    # Пагинация
-    paginator = Paginator(places_list, 12) # 12 заведений на страницу
-    page_number = request.GET.get('page') # Номер текущей страницы
-    places_page = paginator.get_page(page_number) # Объект страницы с заведениями
+
+# Представление для отображения списка всех заведений
+def places(request):
+    places_list, ordering, query, sort_by, truncated = _places_list(request) # Заведения с поиском и порядком сортировки
+    # Пагинация по курсору (сортировка задаётся порядком ordering)
+    places_page = _list_html_page(request, places_list, ordering, (versioned_cache.PLACE,), query)
 
     return render(request, 'places/places.html', { # Отображаем шаблон списка заведений
         'places': places_page, # Заведения для текущей страницы
         'user': request.user, # Текущий пользователь (для отображения/скрытия элементов управления)
         'current_sort': sort_by, # Текущий параметр сортировки (для сохранения состояния)
         'query': query, # Текущий поисковый запрос (для сохранения в поле поиска)
+        'search_truncated': truncated, # Совпадений больше, чем показано (предел search_limit)
+        'search_limit': search_index.MAX_RESULTS,
+    })
+
+# JSON-страница списка заведений для бесконечной прокрутки (параметры те же, что у страницы списка)
+def places_api(request):
+    places_list, ordering, query, _, truncated = _places_list(request)
+    try:
+        page = _list_page(request.GET, places_list, ordering, (versioned_cache.PLACE,), query)
+    except InvalidCursor as exc: # Повреждённый или чужой курсор
+        return JsonResponse({'error': str(exc)}, status=400)
+    return _list_json(request, page, _place_item, truncated=truncated)
+
+# Представление общего поиска по заведениям, отзывам и мероприятиям (по релевантности)
+def search(request):
+    query = request.GET.get('q', '').strip() # Поисковый запрос
+    current_type = request.GET.get('type', '') # Вид документов ('place', 'review', 'event') или пусто — везде
+    if current_type not in search_index.KINDS: # Неизвестный вид — ищем везде
+        current_type = ''
+    results = search_index.SearchResults(query, kinds=[current_type] if current_type else None) # Ленивые результаты: из индекса читается только текущая страница
+    paginator = Paginator(results, 20) # 20 результатов на страницу
+    results_page = paginator.get_page(request.GET.get('page')) # Объект страницы с результатами
+
+    return render(request, 'landing/search.html', { # Отображаем шаблон поиска
+        'query': query, # Текущий запрос (для сохранения в поле поиска)
+        'current_type': current_type, # Текущий вид документов
+        'type_choices': search_index.SearchHit.KIND_LABELS.items(), # Варианты видов для выбора
+        'results': results_page, # Результаты текущей страницы
     })
 
+# Представление подсказок поиска по мере ввода (JSON): названия заведений, мероприятий и имена гурманов без запросов к базе
+def suggest(request):
+    query = request.GET.get('q', '').strip() # Введённый текст
+    try:
+        limit = min(int(request.GET.get('limit', suggest_index.DEFAULT_LIMIT)), suggest_index.MAX_LIMIT) # Число подсказок не больше MAX_LIMIT
+    except ValueError: # Нечисловой limit — число подсказок по умолчанию
+        limit = suggest_index.DEFAULT_LIMIT
+    kinds = [kind for kind in request.GET.getlist('type') if kind in suggest_index.URL_NAMES] or None # Виды подсказок (по умолчанию все)
+    response = JsonResponse({'query': query, 'suggestions': suggest_index.suggest(query, limit=limit, kinds=kinds)})
+    response['Cache-Control'] = 'public, max-age=60' # Браузер повторяет одни и те же префиксы при наборе и стирании
+    return response
+
 # Представление для отображения детальной информации о конкретном заведении
 def place(request, slug): # Принимает 'slug' заведения из URL
     place_obj = get_object_or_404(Place, slug=slug) # Получает заведение по слагу или 404
@@ -427,103 +489,20 @@ def place(request, slug): # Принимает 'slug' заведения из UR
 
     # Если пользователь аутентифицирован и является владельцем этого заведения
     if request.user.is_authenticated and place_obj.owner == request.user:
-        today = timezone.now() # Используем timezone.now() вместо datetime.today()
-        current_month_start = today.replace(day=1, hour=0, minute=0, second=0, microsecond=0) # Начало текущего месяца
-        last_month_start = current_month_start - relativedelta(months=1) # Начало прошлого месяца
-        last_month_end = current_month_start - timezone.timedelta(microseconds=1) # Конец прошлого месяца (точно до начала текущего)
-
-        # Расчет общего NPS для этого заведения (аналогично профилю владельца)
-        total_responses = NPSResponse.objects.filter(review__place=place_obj).count()
-        promoters = NPSResponse.objects.filter(review__place=place_obj, score__gte=9).count()
-        detractors = NPSResponse.objects.filter(review__place=place_obj, score__lte=6).count()
-        nps = (promoters / total_responses * 100 - detractors / total_responses * 100) if total_responses > 0 else 0
-
-        # NPS за текущий месяц
-        current_total = NPSResponse.objects.filter(
-            review__place=place_obj,
-            created_at__gte=current_month_start
-        ).count()
-        current_promoters = NPSResponse.objects.filter(
-            review__place=place_obj,
-            created_at__gte=current_month_start,
-            score__gte=9
-        ).count()
-        current_detractors = NPSResponse.objects.filter(
-            review__place=place_obj,
-            created_at__gte=current_month_start,
-            score__lte=6
-        ).count()
-        current_nps = (
-                    current_promoters / current_total * 100 - current_detractors / current_total * 100) if current_total > 0 else None
-
-        # NPS за прошлый месяц
-        last_total = NPSResponse.objects.filter(
-            review__place=place_obj,
-            created_at__gte=last_month_start,
-            created_at__lte=last_month_end
-        ).count()
-        last_promoters = NPSResponse.objects.filter(
-            review__place=place_obj,
-            created_at__gte=last_month_start,
-            created_at__lte=last_month_end,
-            score__gte=9
-        ).count()
-        last_detractors = NPSResponse.objects.filter(
-            review__place=place_obj,
-            created_at__gte=last_month_start,
-            created_at__lte=last_month_end,
-            score__lte=6
-        ).count()
-        last_nps = (last_promoters / last_total * 100 - last_detractors / last_total * 100) if last_total > 0 else None
-
-        # Топ-3 тегов за все время для этого заведения
-        tag_stats = NPSResponse.objects.filter(review__place=place_obj).values('tags__label').annotate(
-            tag_count=Count('tags__label')
-        ).order_by('-tag_count')[:3]
-
-        # Теги за текущий месяц
-        current_month_tags = NPSResponse.objects.filter(
-            review__place=place_obj,
-            created_at__gte=current_month_start
-        ).values('tags__label').annotate(
-            tag_count=Count('tags__label')
-        ).order_by('-tag_count')
-
-        # Теги за прошлый месяц
-        last_month_tags = NPSResponse.objects.filter(
-            review__place=place_obj,
-            created_at__gte=last_month_start,
-            created_at__lte=last_month_end
-        ).values('tags__label').annotate(
-            tag_count=Count('tags__label')
-        ).order_by('-tag_count')
-
-        tag_dynamics = {} # Словарь для динамики тегов
-        # Собираем все уникальные теги (которые были в текущем или прошлом месяце)
-        all_tags_for_dynamics_place = set( # Используем set для уникальности, другое имя переменной чтобы не пересекалось с той что в profile
-            [t['tags__label'] for t in current_month_tags if t['tags__label']] +
-            [t['tags__label'] for t in last_month_tags if t['tags__label']]
-        )
-        for tag_label in all_tags_for_dynamics_place: # Для каждого уникального тега
-            # Количество упоминаний в текущем месяце
-            current_count_place = next((t['tag_count'] for t in current_month_tags if t['tags__label'] == tag_label), 0)
-            # Количество упоминаний в прошлом месяце
-            last_count_place = next((t['tag_count'] for t in last_month_tags if t['tags__label'] == tag_label), 0)
-            tag_dynamics[tag_label] = { # Сохраняем данные
-                'current': current_count_place,
-                'last': last_count_place,
-                'change': current_count_place - last_count_place
-            }
+        periods = month_periods() # Окна текущего и прошлого месяца
+        # Те же NPS-метрики, что и в профиле владельца (из общего кэша или два сгруппированных запроса)
+        place_metrics = cached_metrics_for_places([place_obj.id], periods)[place_obj.id]
+        place_counts = NPSCounts.for_place(place_obj) # Общие NPS-счётчики из полей заведения
 
         context.update({ # Добавляем статистику владельца в общий контекст
-            'nps': nps,
-            'total_responses': total_responses,
-            'current_nps': current_nps,
-            'last_nps': last_nps,
-            'tag_stats': tag_stats,
-            'tag_dynamics': tag_dynamics,
-            'current_month': current_month_start.strftime('%Y-%m'), # Формат "Год-Месяц"
-            'last_month': last_month_start.strftime('%Y-%m'),
+            'nps': place_counts.nps or 0,
+            'total_responses': place_counts.total,
+            'current_nps': place_metrics.period_nps('current'),
+            'last_nps': place_metrics.period_nps('last'),
+            'tag_stats': place_metrics.top_tags,
+            'tag_dynamics': place_metrics.tag_dynamics(),
+            'current_month': periods['current'].start.strftime('%Y-%m'), # Формат "Год-Месяц"
+            'last_month': periods['last'].start.strftime('%Y-%m'),
         })
 
     return render(request, 'places/place.html', context) # Отображаем шаблон детальной страницы заведения
@@ -584,9 +563,10 @@ def edit_place(request, slug): # Принимает 'slug' заведения и
     form = PlaceCreateForm(instance=place) # Если GET-запрос, создаем форму, предзаполненную данными объекта 'place'
     return render(request, "places/place_edit.html", {"form": form, "place": place}) # Отображаем страницу редактирования
 
-# Представление для отображения списка всех отзывов
-def reviews(request):
-    reviews_list = Review.objects.all() # Получаем все отзывы
+def _reviews_list(request):
+    # Выборка отзывов с фильтром по заведению, порядок сортировки и параметры для шаблона
+    # Получаем все отзывы вместе с заведением, автором и путём к обложке (без запросов на каждую карточку)
+    reviews_list = with_cover_image(Review.objects.select_related('place', 'gourmand'), ReviewImage, 'review')
 
     # Фильтр по заведению (если 'place' передан в GET)
     place_id = request.GET.get('place') # Получаем ID заведения из GET
@@ -595,16 +575,29 @@ def reviews(request):
 
     # Сортировка
     sort_by = request.GET.get('sort', 'id') # По умолчанию сортировка по ID
-    if sort_by == 'date': # Если сортировка по дате
-        reviews_list = reviews_list.order_by('-review_date') # Сортируем по дате отзыва (сначала новые)
-    elif sort_by == 'name': # Если сортировка по имени (имени отзыва? или имени автора? поле 'name' в Review)
-        reviews_list = reviews_list.order_by('name') # Сортируем по полю 'name'
-    else: # По умолчанию (или sort_by == 'id')
-        reviews_list = reviews_list.order_by('id') # Сортируем по ID
+    if sort_by not in REVIEW_ORDERINGS: # Неизвестная сортировка — по ID
+        sort_by = 'id'
+    return reviews_list, REVIEW_ORDERINGS[sort_by], place_id, sort_by
+
+
+def _review_item(review):
+    # Отзыв в JSON-странице списка
+    return {
+        'id': review.id,
+        'name': review.name,
+        'url': reverse('review', args=[review.slug]),
+        'review_date': review.review_date.isoformat(),
+        'rating': review.gourmand_rating,
+        'place': review.place.name,
+        'cover_image': review.cover_image_url,
+    }
 
-    paginator = Paginator(reviews_list, 12) # 12 отзывов на страницу
-    page_number = request.GET.get('page') # Номер текущей страницы
-    reviews_page = paginator.get_page(page_number) # Объект страницы с отзывами
+
+# Представление для отображения списка всех отзывов
+def reviews(request):
+    reviews_list, ordering, place_id, sort_by = _reviews_list(request) # Отзывы с фильтром и порядком сортировки
+    # Страница по курсору: условие «после последней строки» по индексу вместо OFFSET
+    reviews_page = _list_html_page(request, reviews_list, ordering, (versioned_cache.REVIEW,), place_id)
 
     places = Place.objects.all() # Все заведения (для фильтра на странице)
     return render(request, 'review/reviews.html', { # Отображаем шаблон списка отзывов
@@ -614,6 +607,15 @@ def reviews(request):
         'current_sort': sort_by, # Текущий параметр сортировки
     })
 
+# JSON-страница списка отзывов для бесконечной прокрутки (параметры те же, что у страницы списка)
+def reviews_api(request):
+    reviews_list, ordering, place_id, _ = _reviews_list(request)
+    try:
+        page = _list_page(request.GET, reviews_list, ordering, (versioned_cache.REVIEW,), place_id)
+    except InvalidCursor as exc: # Повреждённый или чужой курсор
+        return JsonResponse({'error': str(exc)}, status=400)
+    return _list_json(request, page, _review_item)
+
 # Представление для отображения детальной информации о конкретном отзыве
 def review(request, slug): # Принимает 'slug' отзыва из URL
     review = get_object_or_404(Review, slug=slug) # Получаем отзыв по слагу или 404
@@ -645,12 +647,9 @@ def create_review(request):
     if request.method == "POST": # Если отправлена форма создания отзыва
         form = ReviewCreateForm(request.POST, request.FILES) # Создаем форму с POST-данными и файлами (изображениями)
         if form.is_valid(): # Если форма валидна
-            review = form.save(commit=False) # Сохраняем, но не коммитим
-            review.gourmand = request.user # Привязываем текущего пользователя (гурмана) как автора отзыва
-            review.save() # Теперь сохраняем отзыв в базу
-            if 'images' in request.FILES: # Если загружены изображения
-                for image in request.FILES.getlist('images'): # Для каждого изображения
-                    ReviewImage.objects.create(review=review, image=image) # Создаем объект ReviewImage
+            form.instance.gourmand = request.user # Привязываем текущего пользователя (гурмана) как автора отзыва
+            # Сохраняем отзыв, ответ NPS, теги и изображения одной транзакцией
+            review = form.save(images=request.FILES.getlist('images'))
             return redirect('review', slug=review.slug)  # Перенаправляем на страницу созданного отзыва
         else: # Если форма не валидна
             print(form.errors) # Выводим ошибки формы в консоль (для отладки)
@@ -689,32 +688,49 @@ def contacts(request):
         'YANDEX_CAPTCHA_CLIENT_KEY': settings.YANDEX_CAPTCHA_CLIENT_KEY
     })
 
-# Представление для отображения списка гурманов
-def gourmands(request):
+def _gourmands_list(request):
+    # Выборка гурманов и порядок сортировки
     # Фильтруем пользователей, чтобы получить только тех, у кого роль 'gourmand', и выбираем связанные профили GourmandProfile
     gourmands_list = GourmandProfile.objects.select_related('user').filter(user__role='gourmand')
 
-    # Сортировка
+    # Сортировка: по рейтингу, опыту (дате регистрации), поддерживаемому счётчику отзывов или ID профиля
     sort_by = request.GET.get('sort', 'id') # По умолчанию по ID
-    if sort_by == 'rating': # Если сортировка по рейтингу гурмана (если есть такое поле в GourmandProfile)
-        gourmands_list = gourmands_list.order_by('-rating')
-    elif sort_by == 'experience': # Если сортировка по опыту (дате регистрации)
-        gourmands_list = gourmands_list.order_by('user__date_joined') # Сортируем по дате регистрации пользователя (сначала старые)
-    elif sort_by == 'reviews': # Если сортировка по количеству отзывов
-        # Аннотируем количество отзывов для каждого пользователя и сортируем по убыванию
-        gourmands_list = gourmands_list.annotate(review_count=Count('user__reviews')).order_by('-review_count')
-    else: # По умолчанию (или sort_by == 'id')
-        gourmands_list = gourmands_list.order_by('id') # Сортируем по ID профиля гурмана
-
-    paginator = Paginator(gourmands_list, 12) # 12 гурманов на страницу
-    page_number = request.GET.get('page') # Номер текущей страницы
-    gourmands_page = paginator.get_page(page_number) # Объект страницы с гурманами
+    if sort_by not in GOURMAND_ORDERINGS: # Неизвестная сортировка — по ID
+        sort_by = 'id'
+    return gourmands_list, GOURMAND_ORDERINGS[sort_by], sort_by
+
+
+def _gourmand_item(profile):
+    # Гурман в JSON-странице списка
+    return {
+        'id': profile.id,
+        'name': str(profile),
+        'url': reverse('gourmand', args=[profile.user.slug]),
+        'rating': str(profile.rating),
+        'review_count': profile.review_count,
+        'image': profile.image.url if profile.image else None,
+    }
+
+
+# Представление для отображения списка гурманов
+def gourmands(request):
+    gourmands_list, ordering, sort_by = _gourmands_list(request) # Гурманы и порядок сортировки
+    gourmands_page = _list_html_page(request, gourmands_list, ordering, (versioned_cache.GOURMAND,)) # Страница по курсору
 
     return render(request, 'gourmands/gourmands.html', { # Отображаем шаблон списка гурманов
         'gourmands': gourmands_page, # Гурманы для текущей страницы
         'current_sort': sort_by, # Текущий параметр сортировки
     })
 
+# JSON-страница списка гурманов для бесконечной прокрутки (параметры те же, что у страницы списка)
+def gourmands_api(request):
+    gourmands_list, ordering, _ = _gourmands_list(request)
+    try:
+        page = _list_page(request.GET, gourmands_list, ordering, (versioned_cache.GOURMAND,))
+    except InvalidCursor as exc: # Повреждённый или чужой курсор
+        return JsonResponse({'error': str(exc)}, status=400)
+    return _list_json(request, page, _gourmand_item)
+
 # Представление для отображения детальной информации о конкретном гурмане
 def gourmand(request, slug): # Принимает 'slug' пользователя (гурмана) из URL
     # Предполагается, что у модели User есть поле slug
@@ -736,43 +752,46 @@ def vote_review(request, slug, vote_type): # Принимает 'slug' отзы
         return redirect('index') # Если нет, на главную
 
     review = get_object_or_404(Review, slug=slug)  # Получаем отзыв по слагу
-    if vote_type not in ['positive', 'negative']: # Проверяем, что тип голоса допустим
+    if vote_type not in VOTE_TYPES: # Проверяем, что тип голоса допустим
         return HttpResponseBadRequest("Недопустимый тип голоса") # Если нет, ошибка 400
 
-    if review.gourmand == request.user: # Проверяем, не пытается ли автор проголосовать за свой же отзыв
-        return redirect('review', slug=review.slug)  # Если да, просто перенаправляем обратно на страницу отзыва
-
-    # Ищем существующий голос от этого пользователя для этого отзыва
-    existing_vote = ReviewVote.objects.filter(review=review, user=request.user).first()
-
-    if existing_vote: # Если пользователь уже голосовал
-        if existing_vote.vote_type == vote_type: # Если новый голос совпадает со старым (например, дважды лайкнул)
-            return redirect('review', slug=review.slug)  # Ничего не делаем, перенаправляем обратно
-        # Если новый голос другой (например, был лайк, стал дизлайк), удаляем старый голос
-        existing_vote.delete()
-        if existing_vote.vote_type == 'positive': # Уменьшаем счетчик старого голоса в отзыве
-            review.positive_rating = max(0, review.positive_rating - 1) # Убедимся, что рейтинг не станет отрицательным
-        else:
-            review.negative_rating = max(0, review.negative_rating - 1)
-
-    # Создаем новый голос
-    ReviewVote.objects.create(review=review, user=request.user, vote_type=vote_type)
-    if vote_type == 'positive': # Увеличиваем соответствующий счетчик в отзыве
-        review.positive_rating += 1
-    else:
-        review.negative_rating += 1
-    review.save() # Сохраняем изменения в объекте отзыва (обновленные рейтинги)
+    if review.gourmand_id != request.user.id: # Автор не может голосовать за свой же отзыв
+        # Голос и счетчики меняются атомарно в одной транзакции, пересчет рейтингов — после фиксации
+        cast_vote(review, request.user, vote_type)
 
     return redirect('review', slug=review.slug)  # Перенаправляем обратно на страницу отзыва
 
+# JSON-версия голосования для AJAX: не перезагружает и не перерисовывает страницу отзыва.
+@require_POST
+@login_required
+def vote_review_api(request, slug, vote_type): # Принимает 'slug' отзыва и 'vote_type' (тип голоса) из URL
+    if not request.user.is_gourmand(): # Голосовать могут только гурманы
+        return JsonResponse({'error': 'Голосовать могут только гурманы'}, status=403)
+    if vote_type not in VOTE_TYPES: # Проверяем, что тип голоса допустим
+        return JsonResponse({'error': 'Недопустимый тип голоса'}, status=400)
+
+    review = get_object_or_404(Review, slug=slug)  # Получаем отзыв по слагу
+    if review.gourmand_id == request.user.id: # Автор не может голосовать за свой же отзыв
+        return JsonResponse({'error': 'Нельзя голосовать за свой отзыв'}, status=403)
+
+    changed = cast_vote(review, request.user, vote_type) # Записываем голос и обновляем счетчики
+    return JsonResponse({ # Возвращаем актуальные счетчики для обновления кнопок
+        'vote': vote_type,
+        'changed': changed,
+        'positive_rating': review.positive_rating,
+        'negative_rating': review.negative_rating,
+    })
+
 
 # Представление для анализа отзывов с помощью ChatGPT. Доступно только POST-запросами и авторизованным пользователям.
 @require_POST # Декоратор, разрешающий только POST-запросы
 @login_required # Декоратор, требующий аутентификации
 def analyze_reviews(request, place_id): # Принимает 'place_id' из URL
     user = request.user # Текущий авторизованный пользователь
-    period = request.GET.get('period', '1m') # Получает 'period' из GET-параметров запроса (хотя запрос POST, параметры могут быть в URL)
-    days = {'1m': 30, '3m': 90, '6m': 180}.get(period, 30) # Определяем количество дней по периоду
+    period = request.GET.get('period', DEFAULT_PERIOD) # Получает 'period' из GET-параметров запроса (хотя запрос POST, параметры могут быть в URL)
+    if period not in OwnerDashboardSnapshot.PERIOD_DAYS: # Неизвестный период заменяем периодом по умолчанию
+        period = DEFAULT_PERIOD
+    days = OwnerDashboardSnapshot.PERIOD_DAYS[period] # Определяем количество дней по периоду
     logger.info(f"ANALYZE_REVIEWS: Called for place_id: {place_id}, owner: {user.last_name}, period: {period}") # Логируем вызов функции
 
     try:
@@ -786,21 +805,58 @@ def analyze_reviews(request, place_id): # Принимает 'place_id' из URL
     # Получаем queryset отзывов за указанный период для данного заведения
     reviews_qs = get_reviews_for_last_month(place, days=days)
     # Подготавливаем данные отзывов в строковом формате для передачи в ChatGPT
-    reviews_data_str = prepare_reviews_data(reviews_qs)
+    reviews_data_str = prepare_reviews_data(reviews_qs, chunk_size=REVIEW_ITERATOR_CHUNK_SIZE)
 
     # ---> ЛОГИРОВАНИЕ ПОЛНЫХ ДАННЫХ ОТЗЫВОВ <---
     logger.info(f"ANALYZE_REVIEWS: Full reviews_data for {place.name} (ID: {place.id}):\n{reviews_data_str}") # Полные данные
     # Также можно оставить предыдущий debug-лог для краткой информации
     logger.debug(f"ANALYZE_REVIEWS: Prepared reviews data for {place.name} (length: {len(reviews_data_str)}): '{reviews_data_str[:200]}...'") # Краткая информация
 
-    # Вызываем функцию анализа отзывов с помощью ChatGPT
-    summary_text = analyze_reviews_with_chatgpt(reviews_data_str, place.name)
-    logger.info(f"ANALYZE_REVIEWS: Received summary for {place.name}: '{summary_text[:100]}...'") # Логируем полученную сводку (начало)
-
-    # Формируем ключ для кэша и сохраняем сводку в кэш на 24 часа
-    cache_key = f"review_summary_{place.id}_{period}"
-    cache.set(cache_key, summary_text, timeout=60 * 60 * 24) # timeout в секундах (24 часа)
-    logger.info(f"ANALYZE_REVIEWS: Summary for {place.name} (key: {cache_key}) saved to cache.") # Логируем сохранение в кэш
+    is_ajax = request.headers.get('X-Requested-With') == 'XMLHttpRequest' # Запрос из JavaScript ждёт JSON вместо перенаправления
+
+    # Для того же набора отзывов сводка уже есть — отдаём её сразу, без обращения к ChatGPT
+    summary = find_summary(place, period, reviews_data_str)
+    if summary is not None:
+        logger.info(f"ANALYZE_REVIEWS: Stored summary for {place.name}: '{summary.summary[:100]}...'") # Логируем сводку (начало)
+        if is_ajax:
+            return JsonResponse({'status': SummaryJob.STATUS_DONE, 'summary': summary.summary})
+    elif not get_gateway().is_available():
+        # OpenRouter недавно не отвечал (предохранитель разомкнут) — не ставим задание, а показываем прошлую сводку
+        stale = latest_summary(place, period) # Последняя сохранённая сводка за период (может отставать от отзывов)
+        logger.warning(f"ANALYZE_REVIEWS: LLM unavailable, serving {'stale' if stale else 'no'} summary for {place.name}") # Логируем отказ
+        if is_ajax:
+            return JsonResponse({
+                'status': SummaryJob.STATUS_FAILED,
+                'summary': stale.summary if stale else None,
+                'error': STALE_SUMMARY_NOTE if stale else SUMMARY_ERROR_MESSAGE,
+            }, status=503)
+        messages.warning(request, STALE_SUMMARY_NOTE if stale else SUMMARY_ERROR_MESSAGE)
+    else:
+        # Иначе ставим задание в очередь: запрос к ChatGPT выполнит обработчик run_summary_jobs, не занимая воркер
+        job, created = enqueue_summary_job(place, period)
+        logger.info(f"ANALYZE_REVIEWS: Summary job {job.pk} for {place.name} ({'queued' if created else 'already active'})") # Логируем задание
+        if is_ajax:
+            return JsonResponse(job_status(job), status=202)
+        messages.info(request, "Анализ отзывов запущен, сводка появится через несколько секунд.")
 
     # Перенаправляем обратно на страницу профиля владельца, сохраняя выбранный период в URL
-    return redirect(f"{reverse('profile')}?period={period}")
\ No newline at end of file
+    return redirect(f"{reverse('profile')}?period={period}")
+
+
+# Представление для опроса состояния задания на сводку отзывов (JSON). Доступно только владельцу заведения.
+@login_required
+def summary_job_status(request, job_id): # Принимает 'job_id' из URL
+    job = get_object_or_404(SummaryJob.objects.select_related('summary'), pk=job_id, place__owner=request.user) # Чужие задания не видны
+    return JsonResponse(job_status(job)) # Состояние, сводка (если готова) и ошибка
+
+
+# Представление для мониторинга шлюза к языковой модели (вызовы, повторы, ошибки, задержки, предохранитель). Доступно только персоналу.
+@staff_member_required
+def llm_stats(request):
+    return JsonResponse(get_gateway().stats()) # Суммарные счётчики по всем воркерам
+
+
+# Представление для мониторинга кэша карточек (попадания и промахи по видам сущностей). Доступно только персоналу.
+@staff_member_required
+def cache_stats(request):
+    return JsonResponse({'fragments': fragment_stats()}) # Суммарные счётчики по всем воркерам
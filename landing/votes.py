@@ -0,0 +1,99 @@
+# votes.py
+# Этот файл содержит логику голосования за отзывы (лайк/дизлайк).
+# Голос записывается в ReviewVote, а счётчики отзыва меняются атомарными F()-обновлениями
+# в одной транзакции, поэтому параллельные голоса не теряются.
+# Вклад отзыва в рейтинг заведения обновляется после фиксации транзакции,
+# а автор отзыва ставится в очередь на пересчёт рейтинга (RatingQueueEntry).
+
+# Импортируем transaction для атомарности и отложенного вызова после фиксации (on_commit).
+from django.db import transaction
+# Импортируем F для атомарных обновлений и Greatest, чтобы счётчик не ушёл в минус.
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+# Импортируем модели отзывов, голосов и очереди пересчёта рейтингов.
+from landing.models import Review, ReviewVote, RatingQueueEntry
+# Импортируем версионированный кэш для сброса производных данных заведения и автора.
+from landing import cache as versioned_cache
+
+# Допустимые типы голосов.
+VOTE_TYPES = ('positive', 'negative')
+
+
+def cast_vote(review, user, vote_type):
+    """
+    Записывает голос пользователя за отзыв и атомарно обновляет счётчики.
+
+    Повторный голос того же типа ничего не меняет; голос другого типа
+    переключает существующий (старый счётчик уменьшается, новый — увеличивается).
+
+    Args:
+        review: Отзыв, за который голосуют.
+        user: Голосующий пользователь.
+        vote_type: 'positive' или 'negative'.
+
+    Returns:
+        True, если голос изменил счётчики, иначе False.
+        Поля positive_rating и negative_rating у review обновляются из базы.
+    """
+    if vote_type not in VOTE_TYPES:
+        raise ValueError(f"Недопустимый тип голоса: {vote_type}")
+
+    with transaction.atomic():
+        # get_or_create сам обрабатывает гонку двух первых голосов одного пользователя (unique_together).
+        vote, created = ReviewVote.objects.select_for_update().get_or_create(
+            review=review, user=user, defaults={'vote_type': vote_type}
+        )
+        if not created and vote.vote_type == vote_type:
+            changed = False
+        else:
+            counters = {f'{vote_type}_rating': F(f'{vote_type}_rating') + 1}
+            if not created:
+                # Переключение голоса: уменьшаем старый счётчик, не опускаясь ниже нуля.
+                old_field = f'{vote.vote_type}_rating'
+                counters[old_field] = Greatest(F(old_field) - 1, 0)
+                vote.vote_type = vote_type
+                vote.save(update_fields=['vote_type'])
+            Review.objects.filter(pk=review.pk).update(**counters)
+            # Рейтинг автора зависит от голосов за его отзывы — пересчитает обработчик очереди.
+            RatingQueueEntry.mark(gourmand_ids=[review.gourmand_id])
+            schedule_rating_refresh(review.pk)
+            # Счётчики голосов видны на страницах заведения и автора.
+            versioned_cache.invalidate(versioned_cache.PLACE, review.place_id)
+            versioned_cache.invalidate(versioned_cache.GOURMAND, review.gourmand_id)
+            changed = True
+
+    review.refresh_from_db(fields=['positive_rating', 'negative_rating'])
+    return changed
+
+
+class _RatingRefresh:
+    """
+    Отложенное обновление вклада отзыва в рейтинг заведения (вызывается через on_commit).
+    """
+
+    def __init__(self, review_id):
+        self.review_id = review_id
+
+    def __call__(self):
+        review = Review.objects.filter(id=self.review_id).first()
+        if review is None:
+            return
+        # Несколько голосов за отзыв в одной транзакции дают несколько обработчиков: вклад
+        # обновляет первый, остальные видят уже сохранённый вклад и ничего не пишут.
+        if review.rating_contribution() == (review.rating_weight, review.rating_weighted):
+            return
+        # Применяем к заведению только разницу вклада отзыва.
+        review.update_place_rating()
+
+
+def schedule_rating_refresh(review_id):
+    """
+    Откладывает обновление вклада отзыва в рейтинг заведения до фиксации транзакции.
+
+    При откате транзакции Django отбрасывает её обработчики on_commit вместе с обновлением.
+
+    Args:
+        review_id: Идентификатор отзыва, у которого изменились счётчики.
+    """
+    transaction.on_commit(_RatingRefresh(review_id))